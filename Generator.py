@@ -4,19 +4,14 @@ import time
 import struct
 import numpy as np
 import argparse
+import binascii
+import math
+import random
+import selectors
 from collections import deque
 from queue import Queue, Empty
-
-def crc16_ccitt(data: bytes, poly=0x1021, crc=0xFFFF):
-    for b in data:
-        crc ^= b << 8
-        for _ in range(8):
-            if crc & 0x8000:
-                crc = (crc << 1) ^ poly
-            else:
-                crc <<= 1
-            crc &= 0xFFFF
-    return crc
+from crc16 import crc16_ccitt, CRC_INIT
+from packet_decoder import data_packet_dtype
 
 ACK_packet = 0
 ID_packet = 1
@@ -36,11 +31,245 @@ TRIGGER_ACK = 8
 FORSE_TRIGGER =	9
 #127.0.0.1:9999
 
+PERIOD_LENGTH = 200000    # vzorků na periodu testovacího signálu (pila přes celý rozsah int16)
+PACKET_SIZE = 200         # vzorků na kanál v jednom packetu
+SEQ_MODULO = 65536        # pořadí v hlavičce je 16bitové
+
+PACING_MODES = ("sleep", "hybrid", "burst")
+SPIN_THRESHOLD = 0.0002   # s, hybrid: čas před termínem, od kterého se místo sleep aktivně čeká
+BURST_SIZE = 8            # packetů na jedno probuzení v režimu burst
+MAX_LAG = 0.1             # s, větší zpoždění se nedohání (plán se posune), jinak by následovala dávka packetů
+JITTER_BINS_US = (0, 10, 50, 200, 1000, float('inf'))
+PORT_STEP = 10            # rozestup příkazových portů simulovaných zařízení (10578, 10588, ...)
+
+_SEQ_STRUCT = struct.Struct('<H')
+_CRC_STRUCT = struct.Struct('<H')
+
+
+# ---------------------- Referenční sestavení packetu ----------------------
+# Původní sestavení packetu od nuly, pouze pro kontrolu tabulky a benchmark.
+def build_data_packet(base_signal, packet_id, num_signals, period_length=PERIOD_LENGTH, packet_size=PACKET_SIZE):
+    signals = []
+    for i in range(num_signals):
+        shift = (i * period_length) // num_signals
+        start_index = (packet_id * packet_size + shift) % period_length
+        if start_index + packet_size <= period_length:
+            chunk = base_signal[start_index:start_index + packet_size]
+        else:
+            part1 = base_signal[start_index:]
+            part2 = base_signal[:packet_size - len(part1)]
+            chunk = np.concatenate((part1, part2))
+        signals.append(chunk.astype(np.int16))
+
+    signal_bytes = b''.join(s.tobytes() for s in signals)
+    error_counts = struct.pack('<' + 'B' * num_signals, *([0] * num_signals))
+    header = struct.pack('<HH', DATA_packet, packet_id % SEQ_MODULO)
+    packet = header + signal_bytes + error_counts
+    if num_signals % 2 != 0:
+        packet += b'\x00'  # padding
+    return packet + struct.pack('<H', crc16_ccitt(packet))
+
+
+# ---------------------- Předpočítané packety ----------------------
+# Signál je periodický, takže všechny různé packety (hlavička, vzorky, počty chyb, padding, místo na CRC)
+# se sestaví jednou předem - je jich period_length / gcd(period_length, packet_size), pro výchozí
+# hodnoty 1000. Při odesílání se v packetu jen přepíše pořadí a CRC.
+# CRC bez výstupního XOR je afinní: crc(init, hlavička + data) = L(crc(init, hlavička)) ^ crc(0, data),
+# kde L posune stav přes len(data) nulových bajtů. L(crc(init, hlavička)) je v tabulce pro všech 65536 pořadí
+# a crc(0, data) pro každý payload, takže CRC packetu je jeden XOR dvou čísel.
+class PacketTable:
+    def __init__(self, num_signals, period_length=PERIOD_LENGTH, packet_size=PACKET_SIZE):
+        base_signal = np.linspace(-32768, 32767, period_length, dtype=np.int16)
+        self.count = period_length // math.gcd(period_length, packet_size)
+
+        shifts = (np.arange(num_signals) * period_length) // num_signals
+        k = np.arange(self.count)
+        idx = (k[:, None, None] * packet_size + shifts[None, :, None] + np.arange(packet_size)) % period_length
+        records = np.zeros(self.count, dtype=data_packet_dtype(num_signals, packet_size))
+        records['packet_type'] = DATA_packet
+        records['samples'] = base_signal[idx]
+        raw = records.tobytes()
+        size = records.dtype.itemsize
+        self.crc_offset = size
+        self.packets = [bytearray(raw[i * size:(i + 1) * size] + b'\0\0') for i in range(self.count)]
+
+        crc_hqx = binascii.crc_hqx
+        self.payload_crc = [crc_hqx(raw[i * size + 4:(i + 1) * size], 0) for i in range(self.count)]
+        # L je lineární, stačí dvě tabulky po 256 (horní a dolní bajt stavu)
+        zeros = bytes(size - 4)
+        shift_hi = [crc_hqx(zeros, b << 8) for b in range(256)]
+        shift_lo = [crc_hqx(zeros, b) for b in range(256)]
+        header = struct.Struct('<HH')
+        self.seq_crc = []
+        for seq in range(SEQ_MODULO):
+            h = crc_hqx(header.pack(DATA_packet, seq), CRC_INIT)
+            self.seq_crc.append(shift_hi[h >> 8] ^ shift_lo[h & 0xFF])
+
+    def packet(self, packet_id):
+        # přepíše pořadí a CRC v předpočítaném packetu; vrácený bytearray platí do dalšího volání se stejným payloadem
+        k = packet_id % self.count
+        seq = packet_id % SEQ_MODULO
+        pkt = self.packets[k]
+        _SEQ_STRUCT.pack_into(pkt, 2, seq)
+        _CRC_STRUCT.pack_into(pkt, self.crc_offset, self.seq_crc[seq] ^ self.payload_crc[k])
+        return pkt
+
+# ---------------------- Časování odesílání ----------------------
+# Termíny jsou absolutní (další = předchozí + interval), takže se chyby sleep nesčítají a rychlost nedriftuje.
+#   sleep  - time.sleep do termínu; na Linuxu přesah ~50-100 us, nad ~2 kHz se zpoždění dohání dávkami
+#   hybrid - sleep do SPIN_THRESHOLD před termínem, zbytek aktivní čekání (přesné, ale jedno jádro naplno)
+#   burst  - probuzení jednou za burst intervalů a odeslání burst packetů najednou (nejméně CPU)
+# wait() vrací počet packetů k odeslání. Jitter = |skutečný - plánovaný interval mezi probuzeními|.
+class Pacer:
+    def __init__(self, interval, mode="sleep", burst=BURST_SIZE, spin=SPIN_THRESHOLD):
+        if mode not in PACING_MODES:
+            raise ValueError(f"[ERR]: unknown pacing mode {mode}, use one of {', '.join(PACING_MODES)}")
+        self.interval = interval
+        self.mode = mode
+        self.burst = burst if mode == "burst" else 1
+        self.spin = spin
+        self.reset()
+
+    def reset(self):
+        self.deadline = time.perf_counter()
+        self.last_wakeup = None
+        self.late_resets = 0
+        self.jitter = []
+
+    def wait(self):
+        n = self.burst
+        remaining = self.deadline - time.perf_counter()
+        if self.mode == "hybrid":
+            if remaining > self.spin:
+                time.sleep(remaining - self.spin)
+            while time.perf_counter() < self.deadline:
+                pass
+        elif remaining > 0:
+            time.sleep(remaining)
+
+        now = time.perf_counter()
+        if now - self.deadline > MAX_LAG:
+            self.deadline = now
+            self.last_wakeup = None
+            self.late_resets += 1
+        if self.last_wakeup is not None:
+            self.jitter.append(abs(now - self.last_wakeup - self.expected))
+        self.last_wakeup = now
+        self.expected = n * self.interval
+        self.deadline += self.expected
+        return n
+
+    def report(self):
+        # souhrn jitteru od posledního volání: p50/p99/max a histogram v us
+        jitter = np.array(self.jitter) * 1e6
+        self.jitter = []
+        if not len(jitter):
+            return "jitter -"
+        counts, _ = np.histogram(jitter, JITTER_BINS_US)
+        bins = ", ".join(f"<{int(b)}: {c}" for b, c in zip(JITTER_BINS_US[1:-1], counts)) + f", >=1000: {counts[-1]}"
+        return (f"jitter p50 {np.percentile(jitter, 50):6.1f} p99 {np.percentile(jitter, 99):7.1f} "
+                f"max {jitter.max():8.1f} us [{bins}]" + (f", late resets {self.late_resets}" if self.late_resets else ""))
+
+
+# ---------------------- Poškozování provozu ----------------------
+# Deterministická (seed) simulace sítě mezi sestavením a odesláním packetu: náhodná ztráta, ztráta v dávkách,
+# přeházení (packet se pozdrží o 1..reorder_depth dalších packetů), duplikace, poškození (chybné CRC) a nenulové
+# počty chybných vzorků (platné CRC). Rozhodnutí závisí jen na seedu a pořadí volání process(), ne na čase,
+# takže stejné nastavení dá vždy stejný proud packetů.
+class Impairment:
+    def __init__(self, num_signals, seed=0, drop=0.0, loss_burst_rate=0.0, loss_burst_length=8,
+                 reorder=0.0, reorder_depth=4, duplicate=0.0, corrupt=0.0, sample_errors=0.0,
+                 samples_per_packet=PACKET_SIZE):
+        self.rng = random.Random(seed)
+        self.num_signals = num_signals
+        self.drop = drop
+        self.loss_burst_rate = loss_burst_rate
+        self.loss_burst_length = loss_burst_length
+        self.reorder = reorder
+        self.reorder_depth = max(1, reorder_depth)
+        self.duplicate = duplicate
+        self.corrupt = corrupt
+        self.sample_errors = sample_errors
+        self.errors_offset = 4 + 2 * num_signals * samples_per_packet   # za hlavičkou a vzorky
+        self.held = []          # [zbývá packetů, index, packet]
+        self.burst_left = 0
+        self.count = 0          # index dalšího packetu (počet volání process())
+        self.max_sent = -1      # nejvyšší index už odeslaného packetu
+        self.stats = dict.fromkeys(('dropped', 'burst_dropped', 'reordered', 'duplicated', 'corrupted',
+                                    'error_packets'), 0)
+
+    def process(self, packet):
+        # vrací packety k odeslání teď (0, 1 nebo více - duplikát, uvolněné pozdržené)
+        rng = self.rng.random
+        out = []
+        stats = self.stats
+        index = self.count
+        self.count += 1
+        # pozdržené packety odpočítávají jen packety, které přišly po nich; uvolní se za aktuálním packetem
+        released = []
+        if self.held:
+            for h in self.held:
+                h[0] -= 1
+            released = [h for h in self.held if h[0] <= 0]
+            self.held = [h for h in self.held if h[0] > 0]
+        if self.burst_left:
+            self.burst_left -= 1
+            stats['burst_dropped'] += 1
+        elif self.loss_burst_rate and rng() < self.loss_burst_rate:
+            self.burst_left = self.rng.randint(1, self.loss_burst_length) - 1
+            stats['burst_dropped'] += 1
+        elif self.drop and rng() < self.drop:
+            stats['dropped'] += 1
+        else:
+            if self.sample_errors and rng() < self.sample_errors:
+                packet = bytearray(packet)
+                for ch in range(self.num_signals):
+                    packet[self.errors_offset + ch] = self.rng.randint(0, 20)
+                _CRC_STRUCT.pack_into(packet, len(packet) - 2, crc16_ccitt(bytes(packet[:-2])))
+                stats['error_packets'] += 1
+            if self.corrupt and rng() < self.corrupt:
+                packet = bytearray(packet)
+                packet[self.rng.randrange(len(packet) - 2)] ^= 1 << self.rng.randrange(8)
+                stats['corrupted'] += 1
+            if self.reorder and rng() < self.reorder:
+                self.held.append([self.rng.randint(1, self.reorder_depth), index, bytes(packet)])
+            else:
+                self._send(out, index, packet)
+                if self.duplicate and rng() < self.duplicate:
+                    out.append(packet)
+                    stats['duplicated'] += 1
+        for _, i, held_packet in released:
+            self._send(out, i, held_packet)
+        return out
+
+    def _send(self, out, index, packet):
+        # 'reordered' počítá jen packety odeslané po packetu s vyšším indexem (pozdržení všech o stejně nic nepřehází)
+        if index < self.max_sent:
+            self.stats['reordered'] += 1
+        else:
+            self.max_sent = index
+        out.append(packet)
+
+    def flush(self):
+        # pozdržené packety (při zastavení vzorkování)
+        out = []
+        for _, i, held_packet in self.held:
+            self._send(out, i, held_packet)
+        self.held = []
+        return out
+
+    def summary(self):
+        return "impaired: " + ", ".join(f"{k.replace('_', ' ')} {v}" for k, v in self.stats.items())
+
+
 class MultiSignalTestGenerator:
-    def __init__(self, ip='127.0.0.1', port=10578, interval=0.001, num_signals = 1, print_interval = 1):
+    def __init__(self, ip='127.0.0.1', port=10578, interval=0.001, num_signals = 1, print_interval = 1,
+                 pacing="sleep", burst=BURST_SIZE, device_index=0, packet_table=None, impairment=None):
         self.ip = ip
         self.port = port
         self.interval = interval
+        self.pacing = pacing
+        self.burst = burst
         self.print_interval = print_interval
         self.num_signals = num_signals
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -56,6 +285,15 @@ class MultiSignalTestGenerator:
         self.wait_for_trigger = False
         self.wait_for_response = False
         self.print_queue = Queue()
+        self.device_index = device_index   # odliší identitu (sériová čísla) simulovaných zařízení
+        self.packet_table = packet_table or PacketTable(num_signals)
+        self.shared_sender = False         # odesílání řídí společný plánovač (DeviceFarm), ne vlastní vlákno
+        # parametry Impairment (bez num_signals); seed se posune o index zařízení
+        self.impairment = None
+        if impairment:
+            params = dict(impairment)
+            params['seed'] = params.get('seed', 0) + device_index
+            self.impairment = Impairment(num_signals, **params)
 
     def start(self):
         self.running = True 
@@ -87,66 +325,69 @@ class MultiSignalTestGenerator:
                 self._response() #TODO: dořešit umístění pro edge case neustlého přijmu cmd
                 continue
 
-            if len(cmd_data) < 4:
-                continue  # Příliš krátký paket, ignoruj
+            self._handle_command(cmd_data, addr)
 
-            command_type = struct.unpack('<I', cmd_data[:4])[0]
+    def _handle_command(self, cmd_data, addr):
+        if len(cmd_data) < 4:
+            return  # Příliš krátký paket, ignoruj
 
-            if command_type == PING:
-                self.print("Přijat ping.")
-                response = struct.pack('<HHI', ACK_packet, 0, command_type)  # Packet type, error, CMD
-                self.sock.sendto(response, addr)
+        command_type = struct.unpack('<I', cmd_data[:4])[0]
 
-            elif command_type == GET_ID:
-                self._send_identification_packet(addr)
-                
-            elif command_type == REGISTER_RECEIVER:
-                self._register_receiver(cmd_data, addr)
+        if command_type == PING:
+            self.print("Přijat ping.")
+            response = struct.pack('<HHI', ACK_packet, 0, command_type)  # Packet type, error, CMD
+            self.sock.sendto(response, addr)
 
-            elif command_type == REMOVE_RECEIVER:
-                self._remove_receiver(cmd_data, addr)
+        elif command_type == GET_ID:
+            self._send_identification_packet(addr)
+            
+        elif command_type == REGISTER_RECEIVER:
+            self._register_receiver(cmd_data, addr)
 
-            elif command_type == GET_RECEIVERS:
-                self._send_receivers_list(addr)
+        elif command_type == REMOVE_RECEIVER:
+            self._remove_receiver(cmd_data, addr)
 
-            elif command_type == START_SAMPLING or command_type == START_ON_TRIGGER: 
-                command_type = struct.unpack('<I', cmd_data[:4])[0]
-                if len(cmd_data) < 8:
-                    self.print(f"⚠️ CMD {command_type} má nedostatečnou délku.")
-                    
-                _, num_packets = struct.unpack('<II', cmd_data)
-                self.print(f"Přijat příkaz: typ={command_type}, počet paketů={num_packets}")
+        elif command_type == GET_RECEIVERS:
+            self._send_receivers_list(addr)
 
-                self.num_packets_to_send = num_packets
+        elif command_type == START_SAMPLING or command_type == START_ON_TRIGGER: 
+            command_type = struct.unpack('<I', cmd_data[:4])[0]
+            if len(cmd_data) < 8:
+                self.print(f"⚠️ CMD {command_type} má nedostatečnou délku.")
                 
-                if command_type == START_SAMPLING:
-                    self._start_sampling()
-                else:
-                    self.print("[INFO] Sampling spuštěn na trigger.")   
-                    self.wait_for_trigger = True
-             
-                response = struct.pack('<HHIQ', ACK_packet, 0, command_type, self.num_packets_to_send)
-                self.sock.sendto(response, addr)
+            _, num_packets = struct.unpack('<II', cmd_data)
+            self.print(f"Přijat příkaz: typ={command_type}, počet paketů={num_packets}")
+
+            self.num_packets_to_send = num_packets
             
-            elif command_type == STOP_SAMPLING:
-                # Stop sampling
-                self.sampling = False
-                self.print(f"[INFO] Sampling zastaven, odesláno paketů: {self.packets_sent}")
+            if command_type == START_SAMPLING:
+                self._start_sampling()
+            else:
+                self.print("[INFO] Sampling spuštěn na trigger.")   
+                self.wait_for_trigger = True
+         
+            response = struct.pack('<HHIQ', ACK_packet, 0, command_type, self.num_packets_to_send)
+            self.sock.sendto(response, addr)
+        
+        elif command_type == STOP_SAMPLING:
+            # Stop sampling
+            self.sampling = False
+            self.print(f"[INFO] Sampling zastaven, odesláno paketů: {self.packets_sent}")
 
-                # Odpověď: ACK + CMD + počet odeslaných paketů
-                response = struct.pack('<HHIQ', ACK_packet, 0, command_type, self.packets_sent)
-                self.sock.sendto(response, addr)
+            # Odpověď: ACK + CMD + počet odeslaných paketů
+            response = struct.pack('<HHIQ', ACK_packet, 0, command_type, self.packets_sent)
+            self.sock.sendto(response, addr)
 
-            elif command_type == TRIGGER_ACK:
-                self.print("[INFO] Přijat Trigger ACK(CMD 8)")
-                self.wait_for_response = False
+        elif command_type == TRIGGER_ACK:
+            self.print("[INFO] Přijat Trigger ACK(CMD 8)")
+            self.wait_for_response = False
 
-            elif command_type == FORSE_TRIGGER:
-                self.wait_for_trigger == False
-                self._trigger()
+        elif command_type == FORSE_TRIGGER:
+            self.wait_for_trigger == False
+            self._trigger()
 
-            else:
-                self.print(f"Neznámý příkaz typu {command_type}")
+        else:
+            self.print(f"Neznámý příkaz typu {command_type}")
 
     def _send_identification_packet(self, addr):
         packet_type = ID_packet
@@ -154,12 +395,12 @@ class MultiSignalTestGenerator:
         hw_id = 0x1234
         hw_ver_major = 1
         hw_ver_minor = 0
-        hw_mcu_serial = 0x11223344
-        cpu_uid = (0xAABBCCDD, 0xEEFF0011, 0x22334455)
+        hw_mcu_serial = 0x11223344 + self.device_index
+        cpu_uid = (0xAABBCCDD, 0xEEFF0011, 0x22334455 + self.device_index)
         adc_hw_id = 0x5678
         adc_ver_major = 1
         adc_ver_minor = 1
-        adc_serial = 0x99AABBCC
+        adc_serial = 0x99AABBCC + self.device_index
         fw_id = 0xABCD
         fw_ver_major = 2
         fw_ver_minor = 3
@@ -278,6 +519,8 @@ class MultiSignalTestGenerator:
         self.sampling = True  # flag spuštění samplingu
 
         # Spustit odesílání dat v samostatném vlákně, pokud ještě neběží
+        if self.shared_sender:
+            return
         if self.sender_thread is None or not self.sender_thread.is_alive():
             self.sender_thread = threading.Thread(target=self._send_data_to_all_receivers, daemon=True)
             self.sender_thread.start()
@@ -314,93 +557,253 @@ class MultiSignalTestGenerator:
                 self.print("odesílání trigger packet selhalo")
         
 
+    def send_next_packet(self):
+        # jeden datový packet všem příjemcům; False = požadovaný počet packetů je odeslaný
+        packet = self.packet_table.packet(self.packet_id)
+
+        for p in (self.impairment.process(packet) if self.impairment else (packet,)):
+            for receiver in self.receivers:
+                self.sock.sendto(p, receiver)
+
+        self.packet_id += 1
+        self.packets_sent += 1
+
+        if self.num_packets_to_send != 0 and self.packets_sent >= self.num_packets_to_send:
+            self.print(f"[INFO] Všechny požadované pakety odeslány ({self.packets_sent} / {self.num_packets_to_send}).")
+            self.sampling = False  # automaticky zastavit sampling
+            return False
+        return True
+
+    def flush_impairment(self):
+        # po zastavení odešle packety pozdržené přeházením (jinak by je přijímač počítal jako ztracené)
+        if self.impairment and self.impairment.held:
+            for p in self.impairment.flush():
+                for receiver in self.receivers:
+                    self.sock.sendto(p, receiver)
+
     def _send_data_to_all_receivers(self):
         
-        period_length = 200000
-        packet_size = 200
-        base_signal = np.linspace(-32768, 32767, period_length, dtype=np.int16)
+        pacer = Pacer(self.interval, self.pacing, self.burst)
         
-        self.print("[INFO] Zahájeno odesílání dat...")
+        self.print(f"[INFO] Zahájeno odesílání dat... ({1 / self.interval:.0f} packets/s, pacing {self.pacing})")
 
-        t0 = time.monotonic()
-        t_send = t0
-        t_print = t0
-        last_sent = 0
+        t0 = time.perf_counter()
+        t_print = t0 + self.print_interval
+        t_last, last_sent = t0, 0
 
         while self.running:         
             
             if not self.sampling:
+                self.flush_impairment()
                 time.sleep(0.1)
-                t0 = time.monotonic()
-                t_send = t0
-                t_print = t0
+                pacer.reset()
+                t0 = t_last = time.perf_counter()
+                t_print = t0 + self.print_interval
                 last_sent = 0
                 continue
 
             if not self.receivers:
                 self.print("[WAIT] Žádní příjemci. Čekám...")
                 time.sleep(1)
-                t0 = time.monotonic()
-                t_send = t0
-                t_print = t0
+                pacer.reset()
+                t0 = t_last = time.perf_counter()
+                t_print = t0 + self.print_interval
                 last_sent = 0
                 continue
 
-            signals = []
-            for i in range(self.num_signals):
-                shift = (i * period_length) // self.num_signals
-                start_index = (self.packet_id*packet_size + shift) % period_length
-                if start_index + packet_size <= period_length:
-                    chunk = base_signal[start_index:start_index + packet_size]
-                else:
-                    part1 = base_signal[start_index:]
-                    part2 = base_signal[:packet_size - len(part1)]
-                    chunk = np.concatenate((part1, part2))
+            for _ in range(pacer.wait()):
+                if not self.send_next_packet():
+                    break
 
-                signals.append(chunk.astype(np.int16))
+            t = time.perf_counter()
+            if t >= t_print:
+                t_print += self.print_interval
+                rate = (self.packets_sent - last_sent) / (t - t_last)
+                self.print(f"{t-t0:10.3f}: sent {self.packets_sent:12} packets ({rate:8.0f} packets / s), {pacer.report()}"
+                           + (f", {self.impairment.summary()}" if self.impairment else ""))
+                t_last, last_sent = t, self.packets_sent
+
+
+# ---------------------- Více zařízení ----------------------
+# N nezávislých zařízení (vlastní port, identita, pořadí packetů a seznam příjemců) v jednom procesu.
+# Příkazy všech zařízení obsluhuje jedno vlákno přes selectors, data posílá jedno vlákno se společným Pacer -
+# každé probuzení pošle packet(y) všem zařízením, která právě vzorkují. Tabulka packetů je společná.
+class DeviceFarm:
+    def __init__(self, count, ip='127.0.0.1', base_port=10578, port_step=PORT_STEP, interval=0.001, num_signals=1,
+                 print_interval=1, pacing="sleep", burst=BURST_SIZE, impairment=None):
+        self.interval = interval
+        self.print_interval = print_interval
+        self.pacing = pacing
+        self.burst = burst
+        self.print_queue = Queue()
+        self.running = False
+        table = PacketTable(num_signals)
+        self.devices = []
+        for i in range(count):
+            device = MultiSignalTestGenerator(ip, base_port + i * port_step, interval, num_signals, print_interval,
+                                              pacing, burst, device_index=i, packet_table=table, impairment=impairment)
+            device.shared_sender = True
+            device.print = lambda *msg, i=i: self.print(f"[dev {i}]", *msg)
+            self.devices.append(device)
 
-            signal_bytes = b''.join(s.tobytes() for s in signals)
-            error_counts = struct.pack('<' + 'B' * self.num_signals, *([0] * self.num_signals))
-            header = struct.pack('<HH', DATA_packet, self.packet_id % 65536)
-            packet = header + signal_bytes + error_counts
+    def start(self):
+        self.running = True
+        self.listener_thread = threading.Thread(target=self._listen_for_commands, daemon=True)
+        self.sender_thread = threading.Thread(target=self._send_data, daemon=True)
+        self.listener_thread.start()
+        self.sender_thread.start()
 
-            if self.num_signals % 2 != 0:
-                packet += b'\x00'  # padding
+    def stop(self):
+        self.running = False
+        for thread in (getattr(self, 'listener_thread', None), getattr(self, 'sender_thread', None)):
+            if thread:
+                thread.join()
+        for device in self.devices:
+            device.sock.close()
+        while not self.print_queue.empty():
+            print(*self.print_queue.get())
 
-            crc = crc16_ccitt(packet)
-            packet += struct.pack('<H', crc)
+    def print(self, *msg):
+        self.print_queue.put(msg)
 
-            for receiver in self.receivers:
-                self.sock.sendto(packet, receiver)
+    def pop_msg(self, timeout=None):
+        item = self.print_queue.get(timeout=timeout)
+        self.print_queue.task_done()
+        return item
 
-            self.packet_id += 1
-            self.packets_sent += 1
+    def _listen_for_commands(self):
+        selector = selectors.DefaultSelector()
+        for device in self.devices:
+            selector.register(device.sock, selectors.EVENT_READ, device)
+        self.print(f"Čekám na příkazové pakety ({len(self.devices)} zařízení, porty "
+                   f"{self.devices[0].port}..{self.devices[-1].port})...")
+        next_response = time.monotonic() + 1.0
+        while self.running:
+            for key, _ in selector.select(timeout=0.2):
+                device = key.data
+                try:
+                    cmd_data, addr = device.sock.recvfrom(1024)
+                except (BlockingIOError, socket.timeout):
+                    continue
+                device._handle_command(cmd_data, addr)
+            if time.monotonic() >= next_response:
+                next_response += 1.0
+                for device in self.devices:
+                    device._response()   # opakování trigger packetu bez ACK
+        selector.close()
+
+    def _send_data(self):
+        pacer = Pacer(self.interval, self.pacing, self.burst)
+        t0 = t_last = time.perf_counter()
+        t_print = t0 + self.print_interval
+        last_ids = [d.packet_id for d in self.devices]
 
-            if self.num_packets_to_send != 0 and self.packets_sent >= self.num_packets_to_send:
-                self.print(f"[INFO] Všechny požadované pakety odeslány ({self.packets_sent} / {self.num_packets_to_send}).")
-                self.sampling = False  # automaticky zastavit sampling
+        while self.running:
+            active = [d for d in self.devices if d.sampling and d.receivers]
+            for device in self.devices:
+                if not device.sampling:
+                    device.flush_impairment()
+            if not active:
+                time.sleep(0.01)
+                pacer.reset()
+                t0 = t_last = time.perf_counter()
+                t_print = t0 + self.print_interval
+                last_ids = [d.packet_id for d in self.devices]
+                continue
+
+            for _ in range(pacer.wait()):
+                for device in active:
+                    if device.sampling:
+                        device.send_next_packet()
 
-            t = time.monotonic()
-            t_send += self.interval
-            pause = t_send - t
+            t = time.perf_counter()
             if t >= t_print:
                 t_print += self.print_interval
-                self.print(f"{t-t0:10.3f}: sent {self.packets_sent:12} packets ({(self.packets_sent - last_sent) // self.print_interval} packets / s), delay is {pause:9.6f} seconds")
-                last_sent = self.packets_sent
-            if pause > 0:
-                time.sleep(pause)
-
+                rates = [(d.packet_id - last) / (t - t_last) for d, last in zip(self.devices, last_ids)]
+                sampling = [r for d, r in zip(self.devices, rates) if d.sampling]
+                self.print(f"{t-t0:10.3f}: {len(sampling)}/{len(self.devices)} devices, aggregate {sum(rates):9.0f} packets / s, "
+                           f"per device min {min(sampling, default=0):.0f} max {max(sampling, default=0):.0f}, {pacer.report()}")
+                self.print("            per device packets / s: " + " ".join(f"{i}:{r:.0f}" for i, r in enumerate(rates)))
+                if self.devices[0].impairment:
+                    total = {k: sum(d.impairment.stats[k] for d in self.devices) for k in self.devices[0].impairment.stats}
+                    self.print("            impaired (all devices): " + ", ".join(f"{k.replace('_', ' ')} {v}" for k, v in total.items()))
+                t_last, last_ids = t, [d.packet_id for d in self.devices]
+
+
+# ---------------------- Benchmark ----------------------
+def _rate(func, min_time=0.5):
+    # volání func(i) za sekundu
+    n = 0
+    t0 = time.perf_counter()
+    while True:
+        for _ in range(1000):
+            func(n)
+            n += 1
+        t = time.perf_counter() - t0
+        if t >= min_time:
+            return n / t
+
+
+def benchmark(num_signals):
+    t = time.perf_counter()
+    table = PacketTable(num_signals)
+    build_time = time.perf_counter() - t
+    base_signal = np.linspace(-32768, 32767, PERIOD_LENGTH, dtype=np.int16)
+    for packet_id in (0, 1, table.count - 1, table.count, SEQ_MODULO - 1, SEQ_MODULO, 3 * SEQ_MODULO + 7):
+        assert table.packet(packet_id) == build_data_packet(base_signal, packet_id, num_signals), packet_id
+
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    addr = sink.getsockname()
+    reference = _rate(lambda i: build_data_packet(base_signal, i, num_signals))
+    tabled = _rate(table.packet)
+    sent = _rate(lambda i: sock.sendto(table.packet(i), addr))
+    sock.close()
+    sink.close()
+    print(f"{num_signals} signals, {len(table.packets[0])} B packet, table {table.count} packets "
+          f"built in {build_time * 1000:.0f} ms")
+    print(f"build packet: reference {reference:10.0f} packets/s, table {tabled:10.0f} packets/s ({tabled / reference:.0f}x)")
+    print(f"table + sendto 127.0.0.1: {sent:10.0f} packets/s ({sent * len(table.packets[0]) * 8 / 1e9:.2f} Gbit/s)")
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Testovací UDP generátor více signálů")
     parser.add_argument('--signals', type=int, default=2, help="Počet signálů v jednom packetu")
+    parser.add_argument('--rate', type=float, default=1000, help="packetů za sekundu")
+    parser.add_argument('--pacing', choices=PACING_MODES, default="sleep",
+                        help="sleep = jen sleep, hybrid = sleep a aktivní čekání, burst = --burst packetů na probuzení")
+    parser.add_argument('--burst', type=int, default=BURST_SIZE, help="packetů na probuzení v režimu burst")
+    parser.add_argument('--devices', type=int, default=1, help="počet simulovaných zařízení (každé vlastní port)")
+    parser.add_argument('--port', type=int, default=10578, help="příkazový port (prvního) zařízení")
+    parser.add_argument('--port-step', type=int, default=PORT_STEP, help="rozestup portů dalších zařízení")
+    parser.add_argument('--seed', type=int, default=0, help="seed poškozování provozu (zařízení i má seed + i)")
+    parser.add_argument('--drop', type=float, default=0, help="pravděpodobnost ztráty packetu")
+    parser.add_argument('--loss-burst-rate', type=float, default=0, help="pravděpodobnost začátku dávkové ztráty")
+    parser.add_argument('--loss-burst-length', type=int, default=8, help="max. délka dávkové ztráty (packetů)")
+    parser.add_argument('--reorder', type=float, default=0, help="pravděpodobnost pozdržení packetu")
+    parser.add_argument('--reorder-depth', type=int, default=4, help="max. počet packetů, o které se pozdrží")
+    parser.add_argument('--duplicate', type=float, default=0, help="pravděpodobnost duplikátu")
+    parser.add_argument('--corrupt', type=float, default=0, help="pravděpodobnost poškození (chybné CRC)")
+    parser.add_argument('--sample-errors', type=float, default=0, help="pravděpodobnost nenulových počtů chybných vzorků")
+    parser.add_argument('--bench', action='store_true', help="jen změří rychlost sestavení a odeslání packetů")
     args = parser.parse_args()
-    
-
-    gen = MultiSignalTestGenerator(num_signals=args.signals)
+    if args.bench:
+        benchmark(args.signals)
+        raise SystemExit
+
+    impairment = {k: getattr(args, k) for k in ('seed', 'drop', 'loss_burst_rate', 'loss_burst_length', 'reorder',
+                                                 'reorder_depth', 'duplicate', 'corrupt', 'sample_errors')}
+    if not any(impairment[k] for k in ('drop', 'loss_burst_rate', 'reorder', 'duplicate', 'corrupt', 'sample_errors')):
+        impairment = None
+    if args.devices > 1:
+        gen = DeviceFarm(args.devices, base_port=args.port, port_step=args.port_step, interval=1 / args.rate,
+                         num_signals=args.signals, pacing=args.pacing, burst=args.burst, impairment=impairment)
+    else:
+        gen = MultiSignalTestGenerator(port=args.port, interval=1 / args.rate, num_signals=args.signals,
+                                       pacing=args.pacing, burst=args.burst, impairment=impairment)
     gen.start()
-    print(f"Generátor připraven (signálů: {args.signals}). Čekám na příkaz.")
+    print(f"Generátor připraven (signálů: {args.signals}, zařízení: {args.devices}). Čekám na příkaz.")
 
     while True:
         try:
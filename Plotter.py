@@ -2,13 +2,29 @@ import socket
 import struct
 import numpy as np
 import pyqtgraph as pg
-from PyQt5.QtWidgets import QLabel, QVBoxLayout, QWidget, QPushButton, QGridLayout, QApplication, QSpinBox, QDoubleSpinBox, QCheckBox, QTextEdit, QScrollArea, QLineEdit, QDesktopWidget, QHBoxLayout, QSizePolicy 
+from PyQt5.QtWidgets import QFileDialog, QLabel, QVBoxLayout, QWidget, QPushButton, QGridLayout, QApplication, QSpinBox, QDoubleSpinBox, QCheckBox, QTextEdit, QScrollArea, QLineEdit, QDesktopWidget, QHBoxLayout, QSizePolicy 
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
 
-from collections import deque, OrderedDict
+import os
 import threading
 import time
+from protocol import (ACK_packet, ID_packet, DATA_packet, TRIGGER_packet,
+                      PING, GET_ID, REGISTER_RECEIVER, REMOVE_RECEIVER, GET_RECEIVERS, START_SAMPLING,
+                      START_ON_TRIGGER, STOP_SAMPLING, TRIGGER_ACK, FORSE_TRIGGER,
+                      SAMPLES_PER_PACKET, PACKET_RATE_HZ, ID_HEADER_STRUCT, parse_id_packet, CommandClient)
 from buffered_socket import UDPRelay
+from async_socket import AsyncUDPRelay
+from crc16 import verify_crc
+from ring_buffer import SignalRingBuffer
+from ingest import IngestPipeline, REORDER_WINDOW_SIZE
+from ingest_process import IngestProcess
+from journal import JournalWriter, JournalReader, next_free_path, JOURNAL_EXT
+from trigger_capture import trigger_base_path
+from replay import ReplayRelay
+from decimation import bucket_for, prepare_frame
+from scaling import ChannelScaling
+from latency import (LatencyHistograms, LatencyTracker, LATENCY_STAGES, INGEST_STAGES, BIN_EDGES,
+                     summarize, export_summary)
 
 
 # ---------------------- Parametry ----------------------
@@ -21,247 +37,239 @@ UDP_PORT_DATA = 10577  # port pro příjem dat
 
 NUM_PACKETS = 10      # počet vzorků (požadavek v CMD 5)
 RECV_TIMEOUT = 2.0
-SAMPLES_PER_PACKET = 200
-PACKET_RATE_HZ = 1000     # 1 paket/ms (1000 za s)
 SAMPLING_PERIOD = 1/SAMPLES_PER_PACKET/PACKET_RATE_HZ # 1 packet/s, 200 vzorků/packet = 200 vzorků/ms
 BUFFER_LENGTH_S = 10   # délka bufferu v s
 BUFFER_SIZE = int ( BUFFER_LENGTH_S * SAMPLES_PER_PACKET * PACKET_RATE_HZ )
+TRIGGER_POSITION = 2000   # ms před triggerem v uloženém snímku, zbytek bufferu je za triggerem
+# rezerva bufferu pro snímek: mezi dvěma kontrolami se může zapsat až celé okno řazení
+TRIGGER_RESERVE = REORDER_WINDOW_SIZE * SAMPLES_PER_PACKET
 SIGNAL_TYPE = np.int16
-MAX_ORDER = 65536
-OVERFLOW_THRESHOLD = 50
-
-# ---------------------- CMD a packety -------------------
-ACK_packet = 0
-ID_packet = 1
-DATA_packet = 2
-TRIGGER_packet = 3
-
-#CMD
-PING = 0
-GET_ID = 1
-REGISTER_RECEIVER = 2
-REMOVE_RECEIVER = 3
-GET_RECEIVERS =	4
-START_SAMPLING = 5
-START_ON_TRIGGER = 6
-STOP_SAMPLING = 7
-TRIGGER_ACK = 8
-FORSE_TRIGGER =	9
-
-# ---------------------- CRC CCITT ----------------------
-def crc16_ccitt(data: bytes, poly=0x1021, crc=0xFFFF):
-    for b in data:
-        crc ^= b << 8
-        for _ in range(8):
-            if crc & 0x8000:
-                crc = (crc << 1) ^ poly
-            else:
-                crc <<= 1
-            crc &= 0xFFFF
-    return crc
+UDP_TRANSPORT = "thread"  # "thread" = UDPRelay s vlákny, "asyncio" = AsyncUDPRelay na sdílené smyčce
+UDP_RCVBUF = 8 * 1024 * 1024  # SO_RCVBUF datového socketu (kernel může hodnotu omezit, viz net.core.rmem_max)
+SAVE_PATH = os.path.join(os.getcwd(), "capture" + JOURNAL_EXT)  # výchozí jméno žurnálu, index se doplní
+INGEST_MODE = "thread"    # "thread" = příjem ve vlákně GUI procesu, "process" = samostatný proces + sdílená paměť
+
+LATENCY_KERNEL_TIMESTAMPS = True  # čas příjmu z kernelu (SO_TIMESTAMPNS) pro měření latence, ~1 us na packet
+LATENCY_REFRESH_MS = 500  # obnovení okna Latency
+
+REPLAY_JOURNAL = None     # žurnál .pkj, který se přehraje místo příjmu dat ze sítě
+REPLAY_SPEED = 1.0        # 1 = reálný čas, N = N× rychleji, 0 = co nejrychleji
 
-def verify_crc(pkt):
-    if len(pkt) < 2:
-        return None
-    data = pkt[:-2]
-    received_crc = struct.unpack('<H', pkt[-2:])[0]
-    if (crc:=crc16_ccitt(data)) != received_crc:
-        print(f"CRC mismatch: expected 0x{crc:04X}, received 0x{received_crc:04X}")
-        return None
-    return data
+def make_relay(**kwargs):
+    if UDP_TRANSPORT == "asyncio":
+        return AsyncUDPRelay(**kwargs)
+    return UDPRelay(**kwargs)
+
+def make_data_relay():
+    if REPLAY_JOURNAL:
+        return ReplayRelay(REPLAY_JOURNAL, REPLAY_SPEED)
+    return make_relay(batch_mode=True, rcvbuf=UDP_RCVBUF, kernel_timestamps=LATENCY_KERNEL_TIMESTAMPS)
 
 
 # ----------------------Vlákno na čtení dat ----------------
+# Qt obal nad IngestPipeline - socket a zpracování běží ve vlákně GUI procesu.
+# Stejné rozhraní má IngestProcess (ingest_process.py), který totéž dělá v samostatném procesu.
 class SamplingThread(QThread):
     data_ready = pyqtSignal()
     log_signal = pyqtSignal(str)
-    def __init__(self, ch, buffer_lock, signal_buffer, error_buffer, 
+    def __init__(self, ch, buffer_lock, signal_buffer,
                  udp_device_addr, udp_device_port, udp_data_port, use_my_ip):
         super().__init__()
-        self.channels_count = ch
-        self.buffer_lock = buffer_lock
         self.signal_buffer = signal_buffer
-        self.error_buffer = error_buffer
         self.udp_device_addr = udp_device_addr
         self.udp_device_port = udp_device_port
         self.udp_data_port = udp_data_port
-        self.last_packet_order = None
         
-        self.udprelay = UDPRelay()
+        self.udprelay = make_data_relay()
         self.udprelay.bind(port=self.udp_data_port, use_my_ip=use_my_ip, device_ip=self.udp_device_addr, device_port=self.udp_device_port)
-        
+        self.udprelay.settimeout(0.5)
 
         self.running = True
-        #self.sock.settimeout(0.3)
-        self.lock = threading.Lock() 
-        #self.cmd_sock = cmd_sock
-
-        # === Nový mezibuffer pro seřazené packety ===
-        self.packet_buffer = {}
-        self.min_buffer_size = 90
-        self.chunk_size = 30
-        self.last_flushed_order = -1
-        self.lost_packets_counter = 0
-        self.crc_error_counter = 0
-        self.received_packets = 0
-        
+        self.pipeline = IngestPipeline(ch, signal_buffer, buffer_lock,
+                                       log=self.log_signal.emit,
+                                       on_data=self.data_ready.emit,
+                                       on_trigger=lambda packet_num, sample_num: self.send_trigger_ack())
+        self.pipeline.latency = LatencyTracker()
+
+    @property
+    def received_packets(self):
+        return self.pipeline.received_packets
+
+    @property
+    def lost_packets_counter(self):
+        return self.pipeline.lost_packets_counter
+
+    @property
+    def crc_error_counter(self):
+        return self.pipeline.crc_error_counter
+
+    @property
+    def latency(self):
+        return self.pipeline.latency.histograms
+
+    def clear_latency(self):
+        self.pipeline.latency.histograms.clear()
+
     def set_channels_count(self, new_count):
-        with self.lock:
-            self.channels_count = new_count
+        self.pipeline.set_channels_count(new_count)
 
     def get_packet_buffer_size(self):
-        with self.lock:
-            return len(self.packet_buffer)
-        
-    def run(self):
-        while self.running:
-            try:
-                pkt, _ = self.udprelay.recvfrom(4096)
-                self.received_packets += 1
-                if len(pkt) >= 2:
-                    packet_type, packet_order = struct.unpack('<HH', pkt[0:4])
-
-                    if packet_type == DATA_packet:
-                        #self.received_packets += 1
-                        if len(pkt) < 4:
-                            self.log_signal.emit("[ERR] Received too short packet")
-
-                        # Parsování hlavičky (2B type + 2B číslo paketu)
-                        
-                        
-                        data = verify_crc(pkt)
-                        if not data:
-                            self.crc_error_counter += 1
-                            self.log_signal.emit(f" [ERR] Invalid packet[{len(pkt)}] {packet_type:04X} {packet_order:5}")
-                            continue
-
-                        # === Detekce přetečení packet_order ===
-                        if self.last_packet_order is not None:
-                            if self.last_packet_order > (MAX_ORDER - OVERFLOW_THRESHOLD) and packet_order < OVERFLOW_THRESHOLD:
-                                self.log_signal.emit(
-                                    f"[INFO] Overflow detected: {self.last_packet_order} → {packet_order}, flushing buffer and starting new cycle."
-                                )
-                                self.flush_packet_buffer()
-                                self.packet_buffer.clear()
-                                self.last_flushed_order = -1
-                            elif self.last_flushed_order > packet_order:
-                                self.log_signal.emit(f"[DROP] Packet {packet_order} is older than last flushed {self.last_flushed_order}, dropping.")
-                                continue
-
-
-                        # === Přidání do packet_buffer ===
-                        self.packet_buffer[packet_order] = data 
-                        self.last_packet_order = packet_order
-
-                        # === Pokud máme alespoň 90, odešleme 30 nejstarších ===
-                        if len(self.packet_buffer) >= self.min_buffer_size:
-                            sorted_keys = sorted(self.packet_buffer.keys())
-                            
-                            to_flush = sorted_keys[:self.chunk_size]
- 
-                            self.lost_packets_counter += to_flush[-1] - (to_flush[0] + self.chunk_size -1)
-                                                       
-                            with self.lock:
-                                ch_count = self.channels_count
-
-                            # === Dekódování a přesun dat ===
-                            self.process_packets(to_flush)
-                            self.last_flushed_order = to_flush[-1]
-                            self.data_ready.emit()
-
-
-                    elif packet_type == TRIGGER_packet and len(pkt) >= 5:
-                        # Trigger packet
-                        self.received_packets -= 1
-                        packet_num, sample_num = struct.unpack('<HB', pkt[2:5])
-                        self.log_signal.emit(f"[TRIGGER] Trigger packet received (packet_num={packet_num}, sample_num={sample_num})")
-                        self.send_trigger_ack()  
-
-                    else:
-                        print(f"[ERR] wrong packet, {pkt}")
-                                             
-            except socket.timeout:
-                pass
-            
+        return self.pipeline.get_packet_buffer_size()
 
-    def process_packets(self, orders: list):
-        with self.lock:
-            ch_count = self.channels_count
+    def get_socket_queue_size(self):
+        return self.udprelay.get_received_count()
 
-        for order in orders:
-            data = self.packet_buffer.pop(order)
-            offset = 4
+    def get_overflow_count(self):
+        return self.udprelay.get_overflow_count()
 
-            signals = [[] for _ in range(ch_count+1)]
-            errors = []
+    def get_kernel_drops(self):
+        return self.udprelay.get_kernel_drops()
 
-            x = [order * SAMPLES_PER_PACKET + k for k in range(SAMPLES_PER_PACKET)]
-            signals[0].extend(x)
+    def gap_histogram(self):
+        return self.pipeline.gap_histogram()
 
-            for ch_i in range(ch_count):
-                sig = struct.unpack('<' + 'h'*SAMPLES_PER_PACKET, data[offset:offset + 2*SAMPLES_PER_PACKET])
-                signals[ch_i + 1].extend(sig)
-                offset += 2 * SAMPLES_PER_PACKET
+    def clear_error_stats(self):
+        self.pipeline.clear_error_stats()
 
-            for ch_i in range(ch_count):
-                errors.append(data[offset])
-                offset += 1
+    def reset_received(self):
+        self.pipeline.received_packets = 0
 
-            if ch_count % 2 != 0:
-                offset += 1
+    def clear_buffer(self):
+        with self.pipeline.buffer_lock:
+            self.signal_buffer.clear()
+
+    def start_journal(self, path, info=None):
+        # False, pokud žurnál nejde založit (např. soubor už existuje)
+        self.stop_journal()
+        try:
+            self.pipeline.journal = JournalWriter(path, self.pipeline.channels_count, info=info)
+        except OSError as e:
+            self.log_signal.emit(f"[ERR] Save: {e}")
+            return False
+        return True
+
+    def stop_journal(self):
+        journal, self.pipeline.journal = self.pipeline.journal, None
+        if journal is not None:
+            self.log_signal.emit(journal.close())
+
+    def poll_events(self):
+        # logy jdou přes log_signal, není co vybírat
+        return []
+
+    def run(self):
+        while self.running:
+            try:
+                batch = self.udprelay.recv_batch()
+            except socket.timeout:
+                continue
+            self.pipeline.process_batch(batch)
 
-            with self.buffer_lock:
-                self.signal_buffer[0].extend(signals[0])
-                for i in range(ch_count):
-                    self.signal_buffer[i+1].extend(signals[i+1])
-                    self.error_buffer[i].extend([errors[i]] * SAMPLES_PER_PACKET)
-    
     def flush_packet_buffer(self):
-        if not self.packet_buffer:
-            return
-        sorted_keys = sorted(self.packet_buffer.keys())
-        self.process_packets(sorted_keys)
-        self.data_ready.emit()
+        self.pipeline.flush_packet_buffer()
 
     def send_trigger_ack(self):
         try:
             packet = struct.pack('<I', TRIGGER_ACK)
-            self.udprelay.sendto(packet, (self.udp_device_addr, self.udp_data_port))
+            self.udprelay.sendto(packet, (self.udp_device_addr, self.udp_device_port))
             self.log_signal.emit("[ACK] Trigger ACK send")
         except Exception as e:
             print(f"[ERR] Sendind Trigger ACK failed: {e}")
       
+    def set_trigger_capture(self, base_path, pre_samples=0, post_samples=0):
+        self.pipeline.set_trigger_capture(base_path, pre_samples, post_samples)
+
     def stop(self):
         self.running = False
         self.quit()
         self.wait()
+        self.udprelay.stop()
+        self.stop_journal()
+        self.set_trigger_capture(None)
+
+# ---------------------- Latence ----------------------
+# GraphicsLayoutWidget, který po vykreslení pošle signál - konec fáze render (data jsou na obrazovce)
+class PaintTimedLayoutWidget(pg.GraphicsLayoutWidget):
+    painted = pyqtSignal()
+
+    def paintEvent(self, ev):
+        result = super().paintEvent(ev)
+        self.painted.emit()
+        return result
+
+
+# Klouzavé histogramy latence po fázích (latency.py) - křivka na fázi, tabulka percentilů, export
+class LatencyWindow(QWidget):
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+        self.setWindowTitle("Latency")
+        self.resize(900, 600)
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setLogMode(x=True, y=False)
+        self.plot_widget.setLabel('bottom', 'Latency', units='s')
+        self.plot_widget.setLabel('left', 'Count')
+        self.plot_widget.showGrid(x=True, y=True, alpha=0.3)
+        self.plot_widget.addLegend()
+        layout.addWidget(self.plot_widget)
+        # hrany košů včetně krajních (pod 1 us a nad 10 s)
+        step = BIN_EDGES[1] / BIN_EDGES[0]
+        self.edges = np.concatenate(([BIN_EDGES[0] / step], BIN_EDGES, [BIN_EDGES[-1] * step]))
+        self.curves = {stage: self.plot_widget.plot(pen=pg.intColor(i, hues=len(LATENCY_STAGES)), name=stage,
+                                                    stepMode="center")
+                       for i, stage in enumerate(LATENCY_STAGES)}
+
+        self.summary_label = QLabel("")
+        self.summary_label.setStyleSheet("font-family: monospace; padding: 6px;")
+        layout.addWidget(self.summary_label)
+
+        row = QHBoxLayout()
+        self.export_button = QPushButton("Export")
+        self.export_button.clicked.connect(self.export)
+        row.addWidget(self.export_button)
+        self.clear_button = QPushButton("Clear")
+        self.clear_button.clicked.connect(self.clear)
+        row.addWidget(self.clear_button)
+        row.addStretch(1)
+        layout.addLayout(row)
+
+        self.timer = QTimer()
+        self.timer.setInterval(LATENCY_REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.timer.start()
+        self.refresh()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        summary = self.client.latency_summary()
+        lines = []
+        for stage, s in summary.items():
+            self.curves[stage].setData(self.edges, np.array(s['counts'], dtype=float), stepMode="center")
+            fmt = lambda v: "-" if v is None else f"{v * 1000:9.3f}"
+            lines.append(f"{stage:8} n {s['count']:9}   p50 <= {fmt(s['p50'])} ms   p99 <= {fmt(s['p99'])} ms"
+                         f"   max <= {fmt(s['max'])} ms")
+        self.summary_label.setText("\n".join(lines))
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export latency", os.path.join(os.getcwd(), "latency.json"),
+                                              "JSON (*.json);;CSV (*.csv)")
+        if path:
+            export_summary(path, self.client.latency_summary())
+            self.client.log_message(f"[OK] Latency histograms exported to {path}")
+
+    def clear(self):
+        self.client.clear_latency()
+        self.refresh()
 
-# ---------------------- Get ID ----------------------
-ID_HEADER_STRUCT = struct.Struct('<HHHBBI3I HBB I HBB 8s 30s H')
-
-def parse_id_packet(data):
-    if len(data) < ID_HEADER_STRUCT.size:
-        raise ValueError("[ERR]: ID packet is short")
-    unpacked = ID_HEADER_STRUCT.unpack(data[:ID_HEADER_STRUCT.size])
-    return {
-        'packet_type': unpacked[0],
-        'state': unpacked[1],
-        'hw_id': unpacked[2],
-        'hw_ver_major': unpacked[3],
-        'hw_ver_minor': unpacked[4],
-        'mcu_serial': unpacked[5],
-        'cpu_uid': (unpacked[6], unpacked[7], unpacked[8]),
-        'adc_hw_id': unpacked[9],
-        'adc_ver_major': unpacked[10],
-        'adc_ver_minor': unpacked[11],
-        'adc_serial': unpacked[12],
-        'fw_id': unpacked[13],
-        'fw_ver_major': unpacked[14],
-        'fw_ver_minor': unpacked[15],
-        'fw_config': unpacked[16].decode('ascii').rstrip('\x00'),
-        'build_time': unpacked[17].decode('ascii').rstrip('\x00'),
-        'channels_count': unpacked[18],
-    }
 
 # -------------------- GUI s více tlačítky ----------------------
 class SignalClient(QWidget):
@@ -270,9 +278,10 @@ class SignalClient(QWidget):
     def __init__(self):
         super().__init__()
         
-        self.udp_relay = UDPRelay()
+        self.udp_relay = make_relay(ring_slots=64)
         self.udp_device_addr = UDP_DEVICE_IP
         self.udp_device_port = UDP_PORT_SEND #generátor
+        self.commands = CommandClient(self.udp_relay, (self.udp_device_addr, self.udp_device_port))
         self.udp_ack_port = UDP_PORT_RECV #klient pro ack
         self.udp_data_port = UDP_PORT_DATA #klient pro data
 
@@ -281,6 +290,12 @@ class SignalClient(QWidget):
         
         self.num_packets = 0
         self.channels_count = 0
+        self.device_info = None     # rozparsovaný ID packet
+        if REPLAY_JOURNAL:
+            # při přehrávání je počet kanálů a popis zařízení v žurnálu
+            journal = JournalReader(REPLAY_JOURNAL)
+            self.channels_count = journal.channels_count
+            self.device_info = journal.info or None
         self.lost_packets = 0
         self.err_packets = 0
         
@@ -298,7 +313,8 @@ class SignalClient(QWidget):
 
         
         # === 1. řádek: GRAF ===
-        self.plot_widget = pg.GraphicsLayoutWidget()
+        self.plot_widget = PaintTimedLayoutWidget()
+        self.plot_widget.painted.connect(self.record_frame_latency)
         self.plot = self.plot_widget.addPlot(title="Signals from all chanels")
         self.plot.setLabel('bottom', 'Time', units='s')
         self.plot.setLabel('left', 'Amplitude + offset', units='')
@@ -306,6 +322,9 @@ class SignalClient(QWidget):
         self.plot.showGrid(x=True, y=True, alpha=0.5)
         self.plot.setMouseEnabled(x=True, y=True)
         self.layout.addWidget(self.plot_widget)
+        # další osy Y (jednotka -> ViewBox se společnou osou X), první jednotka je na levé ose grafu
+        self.extra_axes = []
+        self.plot.getViewBox().sigResized.connect(self.update_axis_views)
 
         
 
@@ -349,7 +368,7 @@ class SignalClient(QWidget):
 # --- Y Min ---
         self.y_min_label = QLabel("Y min:")
         self.y_min_spinbox = QDoubleSpinBox()
-        self.y_min_spinbox.setRange(-1000000, 0)
+        self.y_min_spinbox.setRange(-1e9, 1e9)
         self.y_min_spinbox.setValue(-33000.0)
 
         row2.addWidget(self.y_min_label, 0, 6, alignment=Qt.AlignRight)
@@ -357,7 +376,7 @@ class SignalClient(QWidget):
 # --- Y Max ---
         self.y_max_label = QLabel("Y max:")
         self.y_max_spinbox = QDoubleSpinBox()
-        self.y_max_spinbox.setRange(0, 1000000)
+        self.y_max_spinbox.setRange(-1e9, 1e9)
         self.y_max_spinbox.setValue(33000.0)
 
         row2.addWidget(self.y_max_label, 0, 8, alignment=Qt.AlignRight)
@@ -376,6 +395,8 @@ class SignalClient(QWidget):
         self.buffer_size_spinbox = QDoubleSpinBox()
         self.buffer_size_spinbox.setRange(0.1, 60.0)
         self.buffer_size_spinbox.setValue(BUFFER_SIZE * SAMPLING_PERIOD)
+        self.buffer_size_spinbox.setKeyboardTracking(False)
+        self.buffer_size_spinbox.valueChanged.connect(self.set_buffer_length)
         row2.addWidget(self.buffer_size_label, 0, 11, alignment=Qt.AlignRight)
         row2.addWidget(self.buffer_size_spinbox, 0, 12, alignment=Qt.AlignLeft)
 
@@ -386,7 +407,9 @@ class SignalClient(QWidget):
         # ------ 3. řádek -----
 # Path display (full width)
         self.path_label = QLabel("Path:")
-        self.path_display = QLineEdit("C://future_path" + 40 * "/něco" + "konec")
+        self.save_path = SAVE_PATH
+        self.journal_path = None    # právě ukládaný žurnál
+        self.path_display = QLineEdit(next_free_path(self.save_path))
         self.path_display.setReadOnly(True)
         self.path_display.setStyleSheet("font-family: monospace; padding: 4px;")
         self.path_display.setFrame(False)
@@ -399,12 +422,15 @@ class SignalClient(QWidget):
         row2.addWidget(self.path_display, 1, 4, 1, 10)
         
         self.set_path_button = QPushButton("Set path")
+        self.set_path_button.clicked.connect(self.set_path)
         row2.addWidget(self.set_path_button, 2, 4)
         
         self.save_data_button = QPushButton("Save buffer")
+        self.save_data_button.clicked.connect(self.toggle_save)
         row2.addWidget(self.save_data_button, 2, 5)
 
         self.AdHoc_safe_button = QPushButton("Ad Hoc save")
+        self.AdHoc_safe_button.clicked.connect(self.ad_hoc_save)
         row2.addWidget(self.AdHoc_safe_button, 2, 6)
 
         self.layout.addLayout(row2)
@@ -454,21 +480,24 @@ class SignalClient(QWidget):
         self.send_trigger_button.clicked.connect(self.send_trigger)
         grid.addWidget(self.send_trigger_button, 4,0, 1, 2)
 
-        self.save_on_trigger = False
+        self.save_on_trigger = True
         self.save_on_trigger_checkbox = QCheckBox("Save on triger")
         self.save_on_trigger_checkbox.setChecked(True)
-        #self.save_on_trigger_checkbox.stateChanged.connect(dopsat funkci)
+        self.save_on_trigger_checkbox.stateChanged.connect(self.update_trigger_capture)
         grid.addWidget(self.save_on_trigger_checkbox, 4, 2, 1, 3,  alignment=Qt.AlignLeft)      
 
 
 #trigger position
-        self.num_packets_label = QLabel("Trigger position:")
-        self.num_packets_spinbox = QSpinBox()
-        self.num_packets_spinbox.setRange(0, BUFFER_SIZE)
-        #self.num_packets_spinbox.setValue(TRIGGER_POSITION)
+        self.trigger_position_label = QLabel("Trigger position:")
+        self.trigger_position_spinbox = QSpinBox()
+        self.trigger_position_spinbox.setRange(0, BUFFER_LENGTH_S * 1000)
+        self.trigger_position_spinbox.setSuffix(" ms")
+        self.trigger_position_spinbox.setValue(TRIGGER_POSITION)
+        self.trigger_position_spinbox.setKeyboardTracking(False)
+        self.trigger_position_spinbox.valueChanged.connect(self.update_trigger_capture)
 
-        grid.addWidget(self.num_packets_label, 5, 0, 1, 2, alignment=Qt.AlignRight)
-        grid.addWidget(self.num_packets_spinbox, 5, 2, 1, 3)
+        grid.addWidget(self.trigger_position_label, 5, 0, 1, 2, alignment=Qt.AlignRight)
+        grid.addWidget(self.trigger_position_spinbox, 5, 2, 1, 3)
 
         # === Sloupec 1: ID & Registrace ===
 
@@ -530,6 +559,15 @@ class SignalClient(QWidget):
         grid.addWidget(self.queued_packets, 4, 11)
         grid.addWidget(self.queued_packets_value, 5, 11, alignment=Qt.AlignCenter)
 
+        self.latency_button = QPushButton("Latency")
+        self.latency_button.clicked.connect(self.show_latency)
+        grid.addWidget(self.latency_button, 5, 12)
+        self.latency_window = None
+        # render a total měří GUI (ingest fáze jsou u SamplingThread / IngestProcess)
+        self.render_latency = LatencyHistograms()
+        self.frame_packets = None       # packetů v bufferu u posledního připraveného, ještě nevykresleného snímku
+        self.last_render_append = 0.0
+
 
         # === Sloupec 3: LOG ===
         self.log_output = QTextEdit("Log messenge:")
@@ -545,14 +583,16 @@ class SignalClient(QWidget):
 
         # === Signálové křivky ===
         self.curves = []
-        self.signal_buffer = [deque(maxlen=BUFFER_SIZE) for _ in range(self.channels_count+1)]
-        self.error_buffer = [deque(maxlen=BUFFER_SIZE) for _ in range(self.channels_count)]
+        self.buffer_capacity = BUFFER_SIZE
+        self.signal_buffer = SignalRingBuffer(self.channels_count, self.buffer_capacity, SAMPLES_PER_PACKET)
+        self.last_frame_key = None
         self.init_curves()
         
         self.init_sockets()
 
         self.timer = QTimer()
         self.timer.setInterval(33)
+        self.timer.timeout.connect(self.poll_ingest_events)
         self.timer.timeout.connect(self.update_plot_buffered)
         self.timer.start()
 
@@ -563,8 +603,55 @@ class SignalClient(QWidget):
         self.update_plot_buffered()
 
     def init_curves(self):
+        # převod a osy Y podle jednotek kanálů z ID packetu; Y min/max platí pro levou osu (první jednotku)
+        channels = (self.device_info or {}).get('channels')
+        self.scaling = ChannelScaling(channels, self.channels_count)
         self.plot.clear()
-        self.curves = [self.plot.plot(pen=pg.intColor(i, hues=self.channels_count)) for i in range(self.channels_count)]
+        for vb, axis in self.extra_axes:
+            self.plot.scene().removeItem(vb)
+            if axis is not self.plot.getAxis('right'):
+                self.plot.layout.removeItem(axis)
+                self.plot.scene().removeItem(axis)
+        self.extra_axes = []
+        self.plot.hideAxis('right')
+
+        self.curves = [None] * self.channels_count
+        for k, (unit, group) in enumerate(self.scaling.groups()):
+            if k == 0:
+                vb, axis = self.plot.getViewBox(), self.plot.getAxis('left')
+            else:
+                vb = pg.ViewBox()
+                if k == 1:
+                    self.plot.showAxis('right')
+                    axis = self.plot.getAxis('right')
+                else:
+                    axis = pg.AxisItem('right')
+                    self.plot.layout.addItem(axis, 2, k + 1)
+                self.plot.scene().addItem(vb)
+                axis.linkToView(vb)
+                vb.setXLink(self.plot)
+                self.extra_axes.append((vb, axis))
+            axis.setLabel(f"{', '.join(f'ch {c}' for c in group)} [{unit or 'raw'}]")
+            for c in group:
+                curve = pg.PlotDataItem(pen=pg.intColor(c, hues=self.channels_count))
+                vb.addItem(curve)
+                self.curves[c] = curve
+            y_min, y_max = self.scaling.full_scale(group)
+            if k == 0:
+                for spinbox, value in ((self.y_min_spinbox, y_min), (self.y_max_spinbox, y_max)):
+                    spinbox.blockSignals(True)
+                    spinbox.setValue(value)
+                    spinbox.blockSignals(False)
+            else:
+                vb.setYRange(y_min, y_max, padding=0)
+        self.update_axis_views()
+        self.last_frame_key = None
+
+    def update_axis_views(self):
+        main = self.plot.getViewBox()
+        for vb, _ in self.extra_axes:
+            vb.setGeometry(main.sceneBoundingRect())
+            vb.linkedViewChanged(main, vb.XAxis)
 
     def init_sockets(self):
         #print("Init sockets called")
@@ -572,18 +659,76 @@ class SignalClient(QWidget):
         self.udp_ack_port = int(self.command_port_edit.text())
         self.udp_device_addr, self.udp_device_port = self.generator_ip_edit.text().split(':', 1)
         self.udp_device_port = int(self.udp_device_port)
+        self.commands.device_addr = (self.udp_device_addr, self.udp_device_port)
         use_my_ip = not self.listen_all_checkbox.isChecked()
         self.udp_relay.bind(port=self.udp_ack_port, use_my_ip=use_my_ip, device_ip=self.udp_device_addr, device_port=self.udp_device_port)  
         self.log_message(f"Relay bound to {self.udp_ack_port}")
+        self.use_my_ip = use_my_ip
+        self.start_ingest()
+        self.log_message(f"Listening for data on {self.udp_data_port}") #bez ověření z udprelay
 
-        if self.sampling_thread and self.sampling_thread.isRunning():
+    def start_ingest(self):
+        # (znovu)spustí příjem dat; v režimu "process" i při změně počtu kanálů nebo délky bufferu,
+        # protože buffer ve sdílené paměti nejde přealokovat
+        if self.sampling_thread:
+            self.stop_saving()
             self.sampling_thread.stop()
 
-        self.sampling_thread = SamplingThread(self.channels_count,
-                                              self.buffer_lock, self.signal_buffer, self.error_buffer,self.udp_device_addr,self.udp_device_port, self.udp_data_port, use_my_ip)
-        self.sampling_thread.log_signal.connect(self.log_message)   
+        if INGEST_MODE == "process":
+            self.sampling_thread = IngestProcess(self.channels_count, self.buffer_capacity, SAMPLES_PER_PACKET,
+                                                 self.udp_device_addr, self.udp_device_port, self.udp_data_port,
+                                                 self.use_my_ip, UDP_RCVBUF,
+                                                 (REPLAY_JOURNAL, REPLAY_SPEED) if REPLAY_JOURNAL else None,
+                                                 LATENCY_KERNEL_TIMESTAMPS)
+            with self.buffer_lock:
+                self.signal_buffer = self.sampling_thread.signal_buffer
+                self.last_frame_key = None
+        else:
+            self.sampling_thread = SamplingThread(self.channels_count,
+                                                  self.buffer_lock, self.signal_buffer, self.udp_device_addr,self.udp_device_port, self.udp_data_port, self.use_my_ip)
+            self.sampling_thread.log_signal.connect(self.log_message)   
         self.sampling_thread.start()
-        self.log_message(f"Listening for data on {self.udp_data_port}") #bez ověření z udprelay
+        self.update_trigger_capture()
+
+    def record_frame_latency(self):
+        # po vykreslení snímku: render a total pro nejnovější zápis do bufferu, který snímek obsahuje
+        frame_packets, self.frame_packets = self.frame_packets, None
+        if frame_packets is None or not self.sampling_thread or self.sampling_thread.latency is None:
+            return
+        record = self.sampling_thread.latency.append_for_frame(frame_packets)
+        if record is None or record[1] <= self.last_render_append:
+            return
+        now = time.time()
+        self.last_render_append = record[1]
+        self.render_latency.add('render', now - record[1], now)
+        self.render_latency.add('total', now - record[2], now)
+
+    def latency_summary(self):
+        ingest = self.sampling_thread.latency if self.sampling_thread else None
+        sources = {stage: (ingest if stage in INGEST_STAGES else self.render_latency) or self.render_latency
+                   for stage in LATENCY_STAGES}
+        return summarize(sources)
+
+    def clear_latency(self):
+        if self.sampling_thread:
+            self.sampling_thread.clear_latency()
+        self.render_latency.clear()
+
+    def show_latency(self):
+        if self.latency_window is None:
+            self.latency_window = LatencyWindow(self)
+        self.latency_window.show()
+        self.latency_window.raise_()
+
+    def poll_ingest_events(self):
+        if not self.sampling_thread:
+            return
+        for event in self.sampling_thread.poll_events():
+            if event[0] == 'log':
+                self.log_message(event[1])
+            elif event[0] == 'journal_failed' and event[1] == self.journal_path:
+                # ingest proces žurnál nezaložil (chybu už zalogoval), GUI se vrátí do stavu bez ukládání
+                self.saving_stopped()
   
     def on_auto_range_changed(self, state):
         self.auto_x_range = self.auto_x_range_checkbox.isChecked()
@@ -596,45 +741,49 @@ class SignalClient(QWidget):
             self.update_plot_buffered("manual_range_change")
 
     def update_plot_buffered(self, *args):
+        done = False
         with self.buffer_lock:
-            if self.channels_count == 0 or not self.signal_buffer or not self.signal_buffer[0]:
+            buf = self.signal_buffer
+            N = len(buf)
+            if self.channels_count == 0 or N == 0:
                 return
 
             vb = self.plot.getViewBox()
             x_range_s = self.x_range_spinbox.value() / 1000  # ve vteřinách
-
-            x_raw = np.array(list(self.signal_buffer[0])) * SAMPLING_PERIOD
-            N = len(x_raw)
-            if N == 0:
-                return
+            x_last = buf.latest_x(1)[0] * SAMPLING_PERIOD
 
             if self.auto_x_range:
-                x = x_raw
+                n_visible = N
             else:
-                # stále vykreslíme *všechna* data
-                x = x_raw
                 if args:  # změna spinboxu → změň rozsah
-                    xmax = x_raw[-1]
+                    xmax = x_last
                     xmin = max(0, xmax - x_range_s)
                     vb.setXRange(xmin, xmax, padding=0)
+                # vykreslujeme jen od levého okraje zobrazení do konce bufferu
+                xmin = vb.viewRange()[0][0]
+                n_visible = int(min(N, max(1, (x_last - xmin) / SAMPLING_PERIOD + 1)))
 
             # Aktualizace křivek
             if len(self.curves) != self.channels_count:
-                self.plot.clear()
-                self.curves = [self.plot.plot(pen=pg.intColor(i, hues=self.channels_count))
-                            for i in range(self.channels_count)]
-
-            for i in range(self.channels_count):
-                y_raw = np.array(list(self.signal_buffer[i + 1]))
-                y = y_raw[-len(x):]
-                self.curves[i].setData(x[-len(y):], y)
+                self.init_curves()
+
+            # min/max obálka s košem podle šířky grafu v pixelech z pyramidy bufferu - cena snímku nezávisí na délce bufferu
+            width_px = max(100, int(vb.width()))
+            bucket = bucket_for(n_visible, width_px)
+            frame_key = (buf.generation, buf.total_packets, n_visible, bucket)
+            if frame_key != self.last_frame_key:
+                self.last_frame_key = frame_key
+                self.frame_packets = buf.total_packets
+                # při nezměněném snímku se nepočítá znovu
+                x, y = prepare_frame(buf, n_visible, bucket, self.scaling, SAMPLING_PERIOD)
+                for i in range(self.channels_count):
+                    self.curves[i].setData(x, y[i])
 
             vb.setYRange(self.y_min_spinbox.value(), self.y_max_spinbox.value())
 
-            # Výpočet chyb
-            N_err = int(x_range_s * SAMPLES_PER_PACKET)
-            channel_errors = [sum(1 for val in list(self.error_buffer[i])[-N_err:] if val != 0)
-                            for i in range(self.channels_count)]
+            # Výpočet chyb - součet chybných vzorků z hlaviček packetů v rozsahu X
+            n_err_packets = int(x_range_s * PACKET_RATE_HZ)
+            channel_errors = self.signal_buffer.latest_errors(n_err_packets).sum(axis=1, dtype=np.int64)
             error_text = "Errors samples:\n" + "\n".join(
                 f"Channel {i}: {count}" for i, count in enumerate(channel_errors))
             self.data_error_label.setText(error_text)
@@ -644,17 +793,42 @@ class SignalClient(QWidget):
                 self.lost_packets_value.setText(str(self.sampling_thread.lost_packets_counter))
                 self.err_packets_value.setText(str(self.sampling_thread.crc_error_counter))
                 self.recv_packets_value.setText(str(self.sampling_thread.received_packets))
-                queued = self.sampling_thread.udprelay.get_received_count()
+                queued = self.sampling_thread.get_socket_queue_size()
                 buffered = self.sampling_thread.get_packet_buffer_size()
-                self.queued_packets_value.setText(f" buf socket: {queued} ; sequencing buffer: {buffered}")
-            if self.sampling_thread.received_packets == self.num_packets:
-                self.stop_sampling()
+                kernel_drops = self.sampling_thread.get_kernel_drops()
+                overflows = self.sampling_thread.get_overflow_count()
+                self.queued_packets_value.setText(
+                    f" buf socket: {queued} ; kernel drops: {'-' if kernel_drops is None else kernel_drops} ; "
+                    f"ring overflows: {overflows} ; sequencing buffer: {buffered}")
+                done = self.num_packets and self.sampling_thread.received_packets >= self.num_packets
+        # mimo zámek - stop_sampling vyprázdní okno řazení do bufferu a znovu vykresluje
+        if done:
+            self.num_packets = 0    # jen jednou, stop_sampling sem vede znovu
+            self.stop_sampling()
     
+    def set_buffer_length(self, seconds):
+        capacity = int(seconds * SAMPLES_PER_PACKET * PACKET_RATE_HZ)
+        self.buffer_capacity = capacity
+        if INGEST_MODE == "process":
+            self.start_ingest()
+        else:
+            with self.buffer_lock:
+                self.signal_buffer.reset(capacity=capacity)
+        self.x_range_spinbox.setRange(0, capacity / SAMPLES_PER_PACKET)
+        self.trigger_position_spinbox.setMaximum(int(seconds * 1000))
+        self.update_trigger_capture()
+        self.log_buffer_memory()
+
+    def log_buffer_memory(self):
+        buf = self.signal_buffer
+        self.log_message(
+            f"Buffer: {buf.capacity} samples/channel, "
+            f"{buf.nbytes_per_channel() / 1e6:.1f} MB per channel, {buf.nbytes() / 1e6:.1f} MB total"
+        )
+
     def clear_error_stats(self):
         if self.sampling_thread:
-            self.sampling_thread.lost_packets_counter = 0
-            self.sampling_thread.crc_error_counter = 0
-            self.sampling_thread.received_packets = 0
+            self.sampling_thread.clear_error_stats()
             self.lost_packets_value.setText("0")
             self.err_packets_value.setText("0")
             self.recv_packets_value.setText("0")
@@ -665,26 +839,7 @@ class SignalClient(QWidget):
         self.log_output.append(f"[{timestamp}] {msg}")
 
     def send_command(self, cmd: int, data: bytes = b'', expect_response: bool = False, expected_packets: int = 1):
-        pkt = struct.pack('<I', cmd) + data
-        self.udp_relay.sendto(pkt, (self.udp_device_addr, self.udp_device_port)) 
-
-        if not expect_response:
-            return None
-
-        responses = []
-        self.udp_relay.settimeout(0.3)
-        try:
-            for _ in range(expected_packets):
-                resp, _ = self.udp_relay.recvfrom(1024) 
-                responses.append(resp)
-        except socket.timeout: #???
-            if not responses:
-                print(f"[TIMEOUT] CMD {cmd}: no response")
-            else:
-                print(f"[INFO] CMD {cmd}: received {len(responses)} / {expected_packets} packets")
-        #finally:
-            #self.sock.settimeout(None)
-        return responses if expected_packets > 1 else (responses[0] if responses else None)
+        return self.commands.send(cmd, data, expect_response, expected_packets)
 
     def ping(self):
         try:
@@ -707,20 +862,23 @@ class SignalClient(QWidget):
                 self.log_message("[ERR] Get ID: CRC failed")
                 return
             parsed = parse_id_packet(data)
+            if parsed['channels_count'] != self.channels_count:
+                self.stop_saving()  # žurnál má počet kanálů v hlavičce
             self.channels_count = parsed['channels_count']
+            self.device_info = parsed
 
-            # Změnit velikost již existujících bufferů
-            with self.buffer_lock:
-                # Smazat původní obsah
-                self.signal_buffer.clear()
-                self.error_buffer.clear()
-                # Přidat nové prázdné dequey podle nového počtu kanálů
-                self.signal_buffer.extend(deque(maxlen=BUFFER_SIZE) for _ in range(self.channels_count + 1))
-                self.error_buffer.extend(deque(maxlen=BUFFER_SIZE) for _ in range(self.channels_count))
-
-            # Předat nový počet kanálů do vlákna
-            if self.sampling_thread:
-                self.sampling_thread.set_channels_count(self.channels_count)
+            if INGEST_MODE == "process":
+                # nový buffer ve sdílené paměti a nový ingest proces pro nový počet kanálů
+                self.start_ingest()
+            else:
+                # Přealokovat buffer podle nového počtu kanálů (stejný objekt sdílí i vlákno)
+                with self.buffer_lock:
+                    self.signal_buffer.reset(self.channels_count)
+
+                # Předat nový počet kanálů do vlákna
+                if self.sampling_thread:
+                    self.sampling_thread.set_channels_count(self.channels_count)
+            self.log_buffer_memory()
 
             self.init_curves()
 
@@ -808,7 +966,7 @@ class SignalClient(QWidget):
             self.log_message(f"[ERR] Get receivers: {e}")
     
     def start_sampling(self):
-        self.sampling_thread.received_packets = 0
+        self.sampling_thread.reset_received()
         self.num_packets = self.num_packets_spinbox.value()
         data = struct.pack('<I', self.num_packets)
         if self.channels_count == 0:
@@ -820,7 +978,7 @@ class SignalClient(QWidget):
         self.log_message(f"[OK] Start sampling, {self.num_packets} packets")
 
     def start_on_trigger(self):
-            self.sampling_thread.received_packets = 0
+            self.sampling_thread.reset_received()
             self.num_packets = self.num_packets_spinbox.value()
             data = struct.pack('<I', self.num_packets)
             if self.channels_count == 0:
@@ -849,6 +1007,9 @@ class SignalClient(QWidget):
                 self.log_message(f"[WARN] Stop sampling: no or invalid ACK response")
             
             self.sampling_thread.flush_packet_buffer()
+            gaps = self.sampling_thread.gap_histogram()
+            if gaps:
+                self.log_message("[INFO] Lost packet gaps (length: count): " + ", ".join(f"{n}: {c}" for n, c in gaps.items()))
             self.update_plot_buffered()
         else:
             self.log_message("[INFO] Sampling is already stopped")
@@ -862,31 +1023,98 @@ class SignalClient(QWidget):
             self.log_message(f"[ERR] Trigger send: {e}")
     
     def clear_plot(self):
-        # Vyčistit buffery
-        with self.buffer_lock:
-            for buf in self.signal_buffer:
-                buf.clear()
-            for buf in self.error_buffer:
-                buf.clear()
+        # Vyčistit buffery (v režimu "process" je čistí ingest proces, GUI má buffer jen pro čtení)
+        self.sampling_thread.clear_buffer()
 
-        # Vyčistit vykreslené křivky a graf
-        self.plot.clear()
-        self.curves = []
+        # Vyčistit vykreslené křivky (osy podle jednotek zůstávají)
+        for curve in self.curves:
+            curve.setData([], [])
+        self.last_frame_key = None
 
         # Vymazat text chyb / info
         self.update_plot_buffered()
         self.log_message("Graf cleaned.")
 
+    def set_path(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Set path", self.save_path,
+                                              f"Packet journal (*{JOURNAL_EXT})",
+                                              options=QFileDialog.DontConfirmOverwrite)
+        if path:
+            self.save_path = path
+            self.update_path_display()
+            self.update_trigger_capture()
+
+    def update_path_display(self):
+        self.path_display.setText(self.journal_path or next_free_path(self.save_path))
+        self.path_display.setCursorPosition(len(self.path_display.text()))
+
+    def update_trigger_capture(self, *args):
+        # snímek má délku bufferu bez rezervy: "Trigger position" před triggerem, zbytek za ním
+        self.save_on_trigger = self.save_on_trigger_checkbox.isChecked()
+        if not self.sampling_thread:
+            return
+        if not self.save_on_trigger:
+            self.sampling_thread.set_trigger_capture(None)
+            return
+        length = max(SAMPLES_PER_PACKET, self.buffer_capacity - TRIGGER_RESERVE)
+        pre = min(length - 1, round(self.trigger_position_spinbox.value() / 1000 / SAMPLING_PERIOD))
+        self.sampling_thread.set_trigger_capture(trigger_base_path(self.save_path), pre, length - pre)
+
+    def toggle_save(self):
+        # průběžné ukládání přijatých packetů do dalšího volného souboru ve zvolené cestě
+        if self.journal_path:
+            self.stop_saving()
+        else:
+            self.start_saving(next_free_path(self.save_path))
+
+    def ad_hoc_save(self):
+        # jednorázově jinam, nastavená cesta se nemění
+        path, _ = QFileDialog.getSaveFileName(self, "Ad Hoc save", os.path.dirname(self.save_path),
+                                              f"Packet journal (*{JOURNAL_EXT})")
+        if path:
+            for old in (path, path + ".idx"):
+                if os.path.exists(old):
+                    os.remove(old)   # přepsání potvrdil dialog
+            self.start_saving(path)
+
+    def start_saving(self, path):
+        if not self.sampling_thread:
+            return
+        if self.channels_count == 0:
+            self.log_message("[ERR] Need Get ID at first")
+            return
+        if not self.sampling_thread.start_journal(path, self.device_info):
+            return
+        self.journal_path = path
+        self.save_data_button.setText("Stop saving")
+        self.AdHoc_safe_button.setEnabled(False)
+        self.update_path_display()
+        self.log_message(f"Saving packets to {path}")
+
+    def stop_saving(self):
+        if not self.journal_path:
+            return
+        self.sampling_thread.stop_journal()
+        self.saving_stopped()
+
+    def saving_stopped(self):
+        self.journal_path = None
+        self.save_data_button.setText("Save buffer")
+        self.AdHoc_safe_button.setEnabled(True)
+        self.update_path_display()
+
     def closeEvent(self, event):
         print("Ukončuji aplikaci...")
 
-        if self.sampling_thread and self.sampling_thread.isRunning():
+        if self.sampling_thread:
             print("Zastavuji příjem dat...")
             self.sampling_thread.stop()
 
         self.udp_relay.close()
 
         self.timer.stop()
+        if self.latency_window:
+            self.latency_window.close()
         event.accept()
 
 # Spuštění aplikace
@@ -895,7 +1123,28 @@ QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
 
 if __name__ == "__main__":
     import sys
-    app = QApplication(sys.argv)
+    import argparse
+    parser = argparse.ArgumentParser(description="UDP Signal Client")
+    parser.add_argument('--transport', choices=("thread", "asyncio"), default=UDP_TRANSPORT,
+                        help="UDP vrstva: vlákna pro každý socket nebo jedna smyčka asyncio")
+    parser.add_argument('--ingest', choices=("thread", "process"), default=INGEST_MODE,
+                        help="příjem a zpracování dat ve vlákně GUI nebo v samostatném procesu")
+    parser.add_argument('--replay', metavar="JOURNAL", help="přehrát žurnál .pkj místo příjmu dat ze sítě")
+    parser.add_argument('--speed', type=float, default=REPLAY_SPEED,
+                        help="rychlost přehrávání: 1 = reálný čas, N = N× rychleji, 0 = co nejrychleji")
+    parser.add_argument('--view', metavar="RECORDING", help="jen prohlížení záznamu .pkj / .i16 (bez příjmu dat)")
+    args, qt_args = parser.parse_known_args()
+    UDP_TRANSPORT = args.transport
+    INGEST_MODE = args.ingest
+    REPLAY_JOURNAL = args.replay
+    REPLAY_SPEED = args.speed
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    if args.view:
+        from viewer import OfflineViewer
+        viewer = OfflineViewer(args.view)
+        viewer.show()
+        sys.exit(app.exec_())
     client = SignalClient()
     client.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,152 @@
+import asyncio
+import socket
+import threading
+import time
+
+from buffered_socket import UDPRelay, detect_local_ip, BATCH_SIZE, RING_SLOTS, SLOT_SIZE, OVERFLOW_DROP
+
+
+# ---------------------- Smyčka asyncio ----------------------
+# Jedna smyčka v jednom vlákně obsluhuje všechny AsyncUDPRelay (příkazy i data, libovolný počet zařízení).
+class EventLoopThread:
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="udp-asyncio", daemon=True)
+        self.thread.start()
+
+    def run(self, coro, timeout=5.0):
+        # spustí korutinu ve smyčce a počká na výsledek
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def call_soon(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+
+class _RelayProtocol(asyncio.DatagramProtocol):
+    def __init__(self, relay):
+        self.relay = relay
+        self.closed = None
+
+    def connection_made(self, transport):
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_lost(self, exc):
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+    def datagram_received(self, data, addr):
+        self.relay._on_datagram(data, addr)
+
+    def error_received(self, exc):
+        if self.relay.running:
+            print(f"[CHYBA] při příjmu dat: {exc}")
+
+
+# ---------------------- Relay nad asyncio ----------------------
+# Stejné rozhraní jako UDPRelay (bind/sendto/recvfrom/recv_batch/...), ale bez vlastních vláken:
+# příjem obsluhuje DatagramProtocol ve sdílené smyčce, odeslání se předá smyčce bez čekací fronty.
+class AsyncUDPRelay(UDPRelay):
+    def __init__(self, batch_mode: bool = False, batch_size: int = BATCH_SIZE, ring_slots: int = RING_SLOTS,
+                 slot_size: int = SLOT_SIZE, overflow: str = OVERFLOW_DROP, rcvbuf: int = None,
+                 kernel_timestamps: bool = False):
+        # 'block' v protokolu nejde (datagramový transport neumí pozastavit čtení), plný kruh vždy zahazuje;
+        # datagram_received nedostane čas z kernelu, čas příjmu je čas zpětného volání
+        super().__init__(batch_mode, batch_size, ring_slots, slot_size, OVERFLOW_DROP, rcvbuf)
+        self.loop_thread = EventLoopThread.get()
+        self.transport = None
+
+    def bind(self, port: int, use_my_ip: bool = False, device_ip: str = "192.168.1.100", device_port: int = "9999"):
+        self.stop()
+        with self.sock_lock:
+            local_ip = detect_local_ip(device_ip, device_port) if use_my_ip else "0.0.0.0"
+            self.addr = (local_ip, port)
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self.rcvbuf:
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            self.sock.bind(self.addr)
+            self.start()
+
+    def start(self):
+        if not self.sock:
+            raise RuntimeError("Nejdřív zavolej bind() pro nastavení IP a portu.")
+        self.running = True
+        if self.transport is None:
+            loop = self.loop_thread.loop
+
+            async def create():
+                transport, _ = await loop.create_datagram_endpoint(lambda: _RelayProtocol(self), sock=self.sock)
+                return transport
+
+            self.transport = self.loop_thread.run(create())
+
+    def stop(self):
+        self.running = False
+        with self.sock_lock:
+            if self.transport is not None:
+                # transport zavře i socket; čeká se na connection_lost, aby šel port hned znovu použít v bind()
+                transport, self.transport = self.transport, None
+
+                async def close():
+                    transport.close()
+                    await transport.get_protocol().closed
+
+                self.loop_thread.run(close())
+            self.sock = None
+
+    def _on_datagram(self, data, addr):
+        # běží ve vlákně smyčky - jediný zapisující do kruhu
+        ring = self.receive_buffer
+        if ring.head - ring.tail >= ring.size:
+            ring.overflow_count += 1
+            return
+        i = ring.head & ring.mask
+        n = min(len(data), ring.slot_size)
+        ring.slots[i][:n] = data[:n]
+        ring.lengths[i] = n
+        ring.addrs[i] = addr
+        ring.timestamps[i] = time.time()
+        ring.head += 1
+        self._received_count += 1
+        # vždy (jako listen_loop): test prázdného kruhu by soupeřil s čtenářem, který mezitím kruh vyprázdní a usne
+        ring.readable.set()
+
+    def sendto(self, data: bytes, addr):
+        transport = self.transport
+        if transport is not None:
+            self.loop_thread.call_soon(transport.sendto, bytes(data), addr)
+
+    def send_loop(self):
+        pass
+
+    def listen_loop(self):
+        pass
+
+
+if __name__ == '__main__':
+    # jednoduchý echo test: dva relaye na jedné smyčce si posílají zprávy
+    a = AsyncUDPRelay()
+    b = AsyncUDPRelay(batch_mode=True)
+    a.bind(port=5000)
+    b.bind(port=5001)
+    for i in range(5):
+        a.sendto(f"Ahoj {i}".encode('utf-8'), ('127.0.0.1', 5001))
+    time.sleep(0.1)
+    for pkt in b.recv_batch():
+        text = bytes(pkt).decode('utf-8')
+        print(f"[PŘIJATO] {text}")
+        b.sendto(pkt, ('127.0.0.1', 5000))
+    for _ in range(5):
+        data, addr = a.recvfrom(4096)
+        print(f"[ECHO] od {addr}: {data.decode('utf-8')}")
+    a.close()
+    b.close()
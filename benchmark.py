@@ -0,0 +1,483 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import socket
+import subprocess
+import time
+
+import numpy as np
+
+from protocol import (SAMPLES_PER_PACKET, PACKET_RATE_HZ, ID_packet, ID_HEADER_STRUCT, CHANNEL_STRUCT,
+                      CommandClient, parse_id_packet)
+from buffered_socket import UDPRelay
+from crc16 import crc16_ccitt, verify_crc, verify_crc_batch
+from decimation import bucket_for, prepare_frame
+from ingest import IngestPipeline, CHUNK_SIZE
+from latency import LatencyTracker
+from packet_decoder import DataPacketDecoder
+from ring_buffer import SignalRingBuffer
+from scaling import ChannelScaling
+
+GENERATOR_PORT = 10678    # jiné porty než výchozí, aby benchmark nekolidoval s běžícím Plotterem
+DATA_PORT = 10677
+CMD_PORT = 10679
+UDP_RCVBUF = 8 * 1024 * 1024
+RECV_TIMEOUT = 0.05       # s, jak často ingest kontroluje konec běhu
+DRAIN_TIMEOUT = 0.3       # s bez dat = zbytek po stop_sampling je přečtený
+
+
+# ---------------------- Měření latence ----------------------
+# Čas příjmu (relay, time.time při probuzení select) a zápisu do bufferu podle absolutního pořadí packetu.
+# Připojuje se jako pipeline.latency - stejné háčky jako LatencyTracker v Plotteru (received při příjmu,
+# flushed při výdeji z okna pro řazení, appended po zápisu do bufferu), histogramy fází se počítají dál.
+class ArrivalLog(LatencyTracker):
+    def __init__(self, max_packets):
+        super().__init__()
+        self.arrival = np.zeros(max_packets)
+        self.written = np.zeros(max_packets)
+        self.pending = None         # pořadí vydané dávky, čeká na zápis do bufferu
+
+    def received(self, order, timestamp):
+        super().received(order, timestamp)
+        # u duplikátu zůstane čas prvního příjmu
+        if 0 <= order < len(self.arrival) and not self.arrival[order]:
+            self.arrival[order] = timestamp or self.t_dequeue
+
+    def flushed(self, orders, now):
+        super().flushed(orders, now)
+        orders = np.asarray(orders)
+        self.pending = orders[orders < len(self.written)]
+
+    def appended(self, t_decoded, t_locked, t_appended, total_packets):
+        super().appended(t_decoded, t_locked, t_appended, total_packets)
+        if self.pending is not None:
+            self.written[self.pending] = t_appended
+            self.pending = None
+
+    def latencies(self, until):
+        # s, příjem -> zápis do bufferu, pro packety zapsané za běhu (do until); zbytek okna
+        # pro řazení se po zastavení vydá až flush_packet_buffer a ustálený stav by zkreslil
+        done = (self.arrival > 0) & (self.written > 0) & (self.written <= until)
+        return self.written[done] - self.arrival[done]
+
+
+class ReorderOnlyPipeline(IngestPipeline):
+    # vydané dávky jen započítá (ztracené), bez dekódování a zápisu - fáze reorder v micro benchmarku
+    def flush_chunk(self, chunk):
+        self.lost_packets_counter += chunk[2]
+
+
+def _cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+# ---------------------- Procesy benchmarku ----------------------
+# Generátor i příjem běží v samostatných procesech (spawn): vlastní GIL a CPU jako u skutečného zařízení,
+# čerstvý proces pro každý bod, takže peak RSS (ru_maxrss) a CPU patří jen tomuto bodu.
+def generator_worker(config, ready, stop):
+    from Generator import MultiSignalTestGenerator
+    gen = MultiSignalTestGenerator(port=config['generator_port'], interval=1 / config['rate'],
+                                   num_signals=config['channels'], print_interval=1e9,
+                                   pacing=config['pacing'], impairment=config['impairment'])
+    gen.print = lambda *msg: None
+    gen.start()
+    ready.set()
+    stop.wait()
+    gen.stop()
+
+
+def ingest_worker(config, ready, stop, results):
+    # stejná cesta jako SamplingThread v Plotteru (UDPRelay v dávkovém režimu -> IngestPipeline -> kruhový buffer),
+    # jen bez Qt
+    ch = config['channels']
+    capacity = int(config['buffer_s'] * SAMPLES_PER_PACKET * PACKET_RATE_HZ)
+    ring = SignalRingBuffer(ch, capacity, SAMPLES_PER_PACKET)
+    log = ArrivalLog(int(config['rate'] * (config['duration'] + 2) * 1.2) + 10000)
+    pipeline = IngestPipeline(ch, ring, log=lambda msg: None)
+    pipeline.latency = log
+    relay = UDPRelay(batch_mode=True, rcvbuf=UDP_RCVBUF)
+    relay.settimeout(RECV_TIMEOUT)
+    relay.bind(port=config['data_port'], use_my_ip=False,
+               device_ip='127.0.0.1', device_port=config['generator_port'])
+    ready.set()
+
+    cpu0 = _cpu_time()
+    while not stop.is_set():
+        try:
+            pipeline.process_batch(relay.recv_batch())
+        except socket.timeout:
+            pass
+    t_stop = time.time()
+    # po stop_sampling dočíst, co zůstalo v socketu a v relay
+    relay.settimeout(DRAIN_TIMEOUT)
+    try:
+        while True:
+            pipeline.process_batch(relay.recv_batch())
+    except socket.timeout:
+        pass
+    pipeline.flush_packet_buffer()
+    cpu = _cpu_time() - cpu0      # všechna vlákna procesu (relay i pipeline), čekání v select CPU nespotřebuje
+    kernel_drops = relay.get_kernel_drops()
+    relay.close()
+
+    arrived = log.arrival[log.arrival > 0]
+    span = float(arrived.max() - arrived.min()) if len(arrived) > 1 else 0.0
+    latency = log.latencies(t_stop) * 1000
+    received = pipeline.received_packets
+    results.put({
+        'received': received,
+        'lost': pipeline.lost_packets_counter,
+        'crc_errors': pipeline.crc_error_counter,
+        'overflow': relay.get_overflow_count(),
+        'kernel_drops': kernel_drops,
+        'written_packets': ring.total_packets,
+        'packets_per_s': round(len(arrived) / span, 1) if span else 0.0,
+        'latency_p50_ms': round(float(np.percentile(latency, 50)), 3) if len(latency) else None,
+        'latency_p99_ms': round(float(np.percentile(latency, 99)), 3) if len(latency) else None,
+        'latency_max_ms': round(float(latency.max()), 3) if len(latency) else None,
+        'cpu_us_per_packet': round(cpu / received * 1e6, 2) if received else None,
+        'cpu_percent': round(cpu / span * 100, 1) if span else None,
+        'buffer_mb': round(ring.nbytes() / 1e6, 1),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+
+
+def run_point(channels, buffer_s, rate, args, impairment=None):
+    ctx = mp.get_context('spawn')
+    config = {'channels': channels, 'buffer_s': buffer_s, 'rate': rate, 'duration': args.duration,
+              'pacing': args.pacing, 'impairment': impairment,
+              'generator_port': args.port, 'data_port': args.data_port}
+    gen_ready, gen_stop = ctx.Event(), ctx.Event()
+    ingest_ready, ingest_stop = ctx.Event(), ctx.Event()
+    results = ctx.Queue()
+    generator = ctx.Process(target=generator_worker, args=(config, gen_ready, gen_stop), daemon=True)
+    ingest = ctx.Process(target=ingest_worker, args=(config, ingest_ready, ingest_stop, results), daemon=True)
+    generator.start()
+    ingest.start()
+    cmd_relay = UDPRelay(ring_slots=64)
+    try:
+        if not (gen_ready.wait(10) and ingest_ready.wait(10)):
+            raise RuntimeError("[ERR] benchmark processes did not start")
+        cmd_relay.bind(port=args.cmd_port, use_my_ip=False, device_ip='127.0.0.1', device_port=args.port)
+        commands = CommandClient(cmd_relay, ('127.0.0.1', args.port))
+        commands.get_id()
+        if not commands.register_receiver('127.0.0.1', args.data_port):
+            raise RuntimeError("[ERR] register receiver: no response")
+        commands.start_sampling(0)
+        time.sleep(args.duration)
+        sent = commands.stop_sampling()
+        ingest_stop.set()
+        result = results.get(timeout=30)
+    finally:
+        cmd_relay.close()
+        ingest_stop.set()
+        gen_stop.set()
+        ingest.join(timeout=5)
+        generator.join(timeout=5)
+        for p in (ingest, generator):
+            if p.is_alive():
+                p.terminate()
+
+    point = {'channels': channels, 'buffer_s': buffer_s, 'rate': rate, 'sent': sent}
+    point.update(result)
+    # generátor může po odpovědi na STOP ještě odeslat packet, který už rozpracoval -> received >= sent
+    point['lossless'] = bool(sent and result['received'] >= sent and result['written_packets'] == result['received']
+                             and not result['lost'] and not result['crc_errors'] and not result['overflow']
+                             and not result['kernel_drops'])
+    return point
+
+
+# ---------------------- Výsledky ----------------------
+def _git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def host_info():
+    return {'platform': platform.platform(), 'python': platform.python_version(), 'numpy': np.__version__,
+            'cpus': os.cpu_count(), 'commit': _git_commit(), 'date': time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def write_results(path, name, params, results, **extra):
+    doc = {'benchmark': name, 'host': host_info(), 'params': params, 'results': results}
+    doc.update(extra)
+    with open(path, "w") as f:
+        json.dump(doc, f, indent=1)
+    print(f"[OK] Results written to {path}")
+
+
+def compare(base_path, results, keys, metrics):
+    # tabulka změn proti dřívějšímu souboru výsledků (stejné klíče bodu)
+    with open(base_path) as f:
+        base = json.load(f)
+    base_points = {tuple(p[k] for k in keys): p for p in base['results']}
+    print(f"\nCompared to {base_path} ({base['host'].get('commit')}):")
+    for point in results:
+        old = base_points.get(tuple(point[k] for k in keys))
+        if old is None:
+            continue
+        cells = []
+        for m in metrics:
+            a, b = old.get(m), point.get(m)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100:+.0f}%" if a else "-"
+            cells.append(f"{m} {a} -> {b} ({change})")
+        print("  " + " ".join(f"{k}={point[k]}" for k in keys) + ": " + ", ".join(cells))
+
+
+def _int_list(text):
+    return [int(v) for v in text.split(',')]
+
+
+def _float_list(text):
+    return [float(v) for v in text.split(',')]
+
+
+# ---------------------- End-to-end benchmark ----------------------
+E2E_KEYS = ('channels', 'buffer_s', 'rate')
+E2E_METRICS = ('packets_per_s', 'latency_p50_ms', 'latency_p99_ms', 'cpu_us_per_packet', 'peak_rss_mb')
+
+
+def bench_e2e(args):
+    impairment = {k: getattr(args, k) for k in ('seed', 'drop', 'reorder', 'duplicate', 'corrupt')}
+    if not any(impairment[k] for k in ('drop', 'reorder', 'duplicate', 'corrupt')):
+        impairment = None
+    results = []
+    summary = []
+    for channels in args.channels:
+        for buffer_s in args.buffers:
+            best = 0
+            for rate in args.rates:
+                p = run_point(channels, buffer_s, rate, args, impairment)
+                results.append(p)
+                print(f"{channels} ch, {buffer_s:g} s buffer, {rate:6} packets/s: "
+                      f"sent {p['sent']}, recv {p['received']}, lost {p['lost']}, crc {p['crc_errors']}, "
+                      f"{p['packets_per_s']:.0f} packets/s, latency p50 {p['latency_p50_ms']} p99 {p['latency_p99_ms']} ms, "
+                      f"cpu {p['cpu_us_per_packet']} us/packet ({p['cpu_percent']}%), peak RSS {p['peak_rss_mb']} MB"
+                      + ("" if p['lossless'] else "  [LOSS]"))
+                if p['lossless']:
+                    best = max(best, rate)
+            summary.append({'channels': channels, 'buffer_s': buffer_s, 'max_lossless_rate': best})
+
+    print("\nMax lossless rate (packets/s): " +
+          ", ".join(f"{s['channels']} ch/{s['buffer_s']:g} s: {s['max_lossless_rate']}" for s in summary))
+    params = {k: getattr(args, k) for k in ('rates', 'channels', 'buffers', 'duration', 'pacing')}
+    params['impairment'] = impairment
+    out = args.out or f"bench_e2e_{host_info()['commit'] or 'results'}.json"
+    write_results(out, 'e2e', params, results, summary=summary)
+    if args.compare:
+        compare(args.compare, results, E2E_KEYS, E2E_METRICS)
+
+
+# ---------------------- Mikrobenchmarky ----------------------
+# Každá fáze zvlášť na syntetických packetech z PacketTable generátoru (stejný obsah jako za běhu),
+# čas na packet a na vzorek (int16 hodnota, tj. packety * 200 * kanály) pro několik počtů kanálů.
+MICRO_KEYS = ('stage', 'channels')
+MICRO_METRICS = ('ns_per_packet', 'ns_per_sample', 'us_per_call')
+MICRO_PACKETS = 1000        # packetů na jedno volání fází po packetech
+MICRO_BUFFER_S = 10         # s, délka bufferu pro append a přípravu snímku
+PLOT_WIDTH = 1600           # px, šířka grafu pro přípravu snímku a vykreslení
+
+
+def _seconds_per_call(func, min_time):
+    func()      # zahřátí (alokace, cache)
+    rounds = 0
+    t0 = time.perf_counter()
+    while True:
+        func()
+        rounds += 1
+        t = time.perf_counter() - t0
+        if t >= min_time:
+            return t / rounds
+
+
+def _id_packet(channels):
+    header = ID_HEADER_STRUCT.pack(ID_packet, 0, 0x1234, 1, 0, 0x11223344, 0xAABBCCDD, 0xEEFF0011, 0x22334455,
+                                   0x5678, 1, 1, 0x99AABBCC, 0xABCD, 2, 3, b"RELEASE\0", b"2025-05-13T12:43:13", channels)
+    records = b''.join(CHANNEL_STRUCT.pack(b"mV", 0.0, 1.0) for _ in range(channels))
+    return header + records
+
+
+def _full_buffer(channels, packets):
+    # buffer MICRO_BUFFER_S sekund naplněný dekódovanými packety
+    ring = SignalRingBuffer(channels, MICRO_BUFFER_S * SAMPLES_PER_PACKET * PACKET_RATE_HZ, SAMPLES_PER_PACKET)
+    _, samples, errors = DataPacketDecoder(channels).decode([p[:-2] for p in packets])
+    n = len(packets)
+    for start in range(0, ring.packets_capacity, n):
+        ring.append(np.arange(start, start + n, dtype=np.int64) * SAMPLES_PER_PACKET, samples, errors)
+    return ring
+
+
+def micro_stages(channels, packets, with_qt):
+    # [(fáze, funkce, packetů na volání, vzorků na volání)]
+    n = len(packets)
+    spp = SAMPLES_PER_PACKET
+    data = [p[:-2] for p in packets]
+    id_packet = _id_packet(channels)
+    decoder = DataPacketDecoder(channels)
+    chunk = data[:CHUNK_SIZE]
+    _, chunk_samples, chunk_errors = decoder.decode(chunk)
+
+    # pořadí jako po síti: každý 10. packet přijde o 3 později (mírné přeházení v okně)
+    seqs = list(range(n))
+    for i in range(0, n - 3, 10):
+        seqs.insert(i + 3, seqs.pop(i))
+    stream = [(packets[seq], data[seq]) for seq in seqs]
+
+    def reorder():
+        # IngestPipeline.handle_packet (rozbalení pořadí, okno pro řazení, výdej po CHUNK_SIZE) s ověřeným CRC,
+        # vydané dávky se nedekódují
+        pipeline = ReorderOnlyPipeline(channels, None, log=lambda msg: None)
+        for pkt, d in stream:
+            pipeline.handle_packet(pkt, d)
+        pipeline.flush_packet_buffer()
+
+    ring = SignalRingBuffer(channels, MICRO_BUFFER_S * spp * PACKET_RATE_HZ, spp)
+    pipeline = IngestPipeline(channels, ring, log=lambda msg: None)
+    counter = [0]
+
+    def process_packets():
+        k = counter[0]
+        counter[0] += CHUNK_SIZE
+        pipeline.process_packets(list(range(k, k + CHUNK_SIZE)), chunk)
+
+    def append():
+        k = counter[0]
+        counter[0] += CHUNK_SIZE
+        ring.append(np.arange(k, k + CHUNK_SIZE, dtype=np.int64) * spp, chunk_samples, chunk_errors)
+
+    full = _full_buffer(channels, packets)
+    scaling = ChannelScaling(None, channels)
+    n_visible = len(full)
+    bucket = bucket_for(n_visible, PLOT_WIDTH)
+
+    sample_period = 1 / (spp * PACKET_RATE_HZ)
+
+    def frame_envelope():
+        # příprava snímku jako v update_plot_buffered: celý buffer, min/max koše podle šířky grafu
+        return prepare_frame(full, n_visible, bucket, scaling, sample_period)
+
+    def frame_raw():
+        # přiblížený pohled: surové vzorky (koš 1)
+        return prepare_frame(full, 2 * PLOT_WIDTH, 1, scaling, sample_period)
+
+    stages = [
+        ('crc16_ccitt', lambda: [crc16_ccitt(d) for d in data], n, n * spp * channels),
+        ('verify_crc', lambda: [verify_crc(p) for p in packets], n, n * spp * channels),
+        ('verify_crc_batch', lambda: verify_crc_batch(packets), n, n * spp * channels),
+        ('parse_id_packet', lambda: parse_id_packet(id_packet), 1, 0),
+        ('reorder', reorder, n, n * spp * channels),
+        ('decode', lambda: decoder.decode(chunk), CHUNK_SIZE, CHUNK_SIZE * spp * channels),
+        ('buffer_append', append, CHUNK_SIZE, CHUNK_SIZE * spp * channels),
+        ('process_packets', process_packets, CHUNK_SIZE, CHUNK_SIZE * spp * channels),
+        ('frame_envelope', frame_envelope, 0, n_visible * channels),
+        ('frame_raw', frame_raw, 0, 2 * PLOT_WIDTH * channels),
+    ]
+    if with_qt:
+        stages += qt_stages(channels, frame_envelope, frame_raw, n_visible)
+    return stages
+
+
+def qt_stages(channels, frame_envelope, frame_raw, n_visible):
+    # setData + vykreslení do pixmapy (offscreen), křivky jako v Plotter.init_curves
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        import pyqtgraph as pg
+        from PyQt5.QtWidgets import QApplication
+    except ImportError as e:
+        print(f"[INFO] Qt render skipped: {e}")
+        return []
+    app = QApplication.instance() or QApplication([])
+    widget = pg.PlotWidget()
+    widget.resize(PLOT_WIDTH, 600)
+    widget.show()
+    app.processEvents()
+    curves = [pg.PlotDataItem(pen=pg.intColor(c, hues=channels)) for c in range(channels)]
+    for curve in curves:
+        widget.addItem(curve)
+
+    def render(frame):
+        def run():
+            x, y = frame()
+            for c, curve in enumerate(curves):
+                curve.setData(x, y[c])
+            app.processEvents()
+            widget.grab()
+        return run
+
+    return [
+        ('qt_render_envelope', render(frame_envelope), 0, n_visible * channels),
+        ('qt_render_raw', render(frame_raw), 0, 2 * PLOT_WIDTH * channels),
+    ]
+
+
+def bench_micro(args):
+    from Generator import PacketTable
+    results = []
+    for channels in args.channels:
+        table = PacketTable(channels)
+        packets = [bytes(table.packet(i)) for i in range(MICRO_PACKETS)]
+        for stage, func, n_packets, n_samples in micro_stages(channels, packets, not args.no_qt):
+            if args.stages and stage not in args.stages:
+                continue
+            t = _seconds_per_call(func, args.min_time)
+            row = {'stage': stage, 'channels': channels, 'us_per_call': round(t * 1e6, 2),
+                   'ns_per_packet': round(t / n_packets * 1e9, 1) if n_packets else None,
+                   'ns_per_sample': round(t / n_samples * 1e9, 3) if n_samples else None}
+            results.append(row)
+            print(f"{stage:20} {channels} ch: {row['us_per_call']:12.1f} us/call"
+                  + (f", {row['ns_per_packet']:10.1f} ns/packet" if n_packets else "")
+                  + (f", {row['ns_per_sample']:8.3f} ns/sample" if n_samples else ""))
+
+    params = {k: getattr(args, k) for k in ('channels', 'min_time')}
+    params.update(packets=MICRO_PACKETS, buffer_s=MICRO_BUFFER_S, plot_width=PLOT_WIDTH)
+    out = args.out or f"bench_micro_{host_info()['commit'] or 'results'}.json"
+    write_results(out, 'micro', params, results)
+    if args.compare:
+        compare(args.compare, results, MICRO_KEYS, MICRO_METRICS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarky příjmové cesty, výsledky do JSON pro porovnání mezi commity")
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    e2e = sub.add_parser('e2e', help="generátor -> loopback -> UDPRelay -> IngestPipeline -> kruhový buffer (bez GUI)")
+    e2e.add_argument('--rates', type=_int_list, default=[1000, 5000, 20000, 50000], help="packets/s, čárkou oddělené")
+    e2e.add_argument('--channels', type=_int_list, default=[1, 4], help="počty kanálů")
+    e2e.add_argument('--buffers', type=_float_list, default=[10, 60], help="délky kruhového bufferu v s (při 1000 packets/s)")
+    e2e.add_argument('--duration', type=float, default=3.0, help="délka jednoho bodu v s")
+    e2e.add_argument('--pacing', default="hybrid", help="časování generátoru (sleep, hybrid, burst)")
+    e2e.add_argument('--seed', type=int, default=0, help="seed poškozování provozu")
+    e2e.add_argument('--drop', type=float, default=0, help="pravděpodobnost ztráty packetu")
+    e2e.add_argument('--reorder', type=float, default=0, help="pravděpodobnost pozdržení packetu")
+    e2e.add_argument('--duplicate', type=float, default=0, help="pravděpodobnost duplikátu")
+    e2e.add_argument('--corrupt', type=float, default=0, help="pravděpodobnost chyby CRC")
+    e2e.add_argument('--port', type=int, default=GENERATOR_PORT, help="příkazový port generátoru")
+    e2e.add_argument('--data-port', type=int, default=DATA_PORT, help="port pro příjem dat")
+    e2e.add_argument('--cmd-port', type=int, default=CMD_PORT, help="lokální port pro ACK")
+    e2e.add_argument('--out', help="výstupní JSON (výchozí bench_e2e_<commit>.json)")
+    e2e.add_argument('--compare', metavar="JSON", help="porovnat s dřívějším souborem výsledků")
+    e2e.set_defaults(func=bench_e2e)
+
+    micro = sub.add_parser('micro', help="jednotlivé fáze příjmu a vykreslení zvlášť (ns na packet / vzorek)")
+    micro.add_argument('--channels', type=_int_list, default=[1, 2, 4, 8], help="počty kanálů")
+    micro.add_argument('--stages', type=lambda text: text.split(','), help="jen vybrané fáze, čárkou oddělené")
+    micro.add_argument('--min-time', type=float, default=0.3, help="s měření na jednu fázi")
+    micro.add_argument('--no-qt', action='store_true', help="bez vykreslení v Qt")
+    micro.add_argument('--out', help="výstupní JSON (výchozí bench_micro_<commit>.json)")
+    micro.add_argument('--compare', metavar="JSON", help="porovnat s dřívějším souborem výsledků")
+    micro.set_defaults(func=bench_micro)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -1,16 +1,127 @@
 import socket
+import struct
+import sys
 import threading
 import queue
+import select
 import time
 
+SLOT_SIZE = 4096        # maximální délka jednoho datagramu (stejně jako recvfrom(4096))
+RING_SLOTS = 2048       # počet slotů přijímacího kruhu (mocnina 2)
+BATCH_SIZE = 256        # maximální počet packetů v jedné dávce
+SELECT_TIMEOUT = 0.5    # jak dlouho přijímací vlákno čeká na data, než zkontroluje running
+
+# čas příjmu z kernelu (Linux); Python konstantu nemá, SCM_TIMESTAMPNS má stejnou hodnotu
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35 if sys.platform.startswith('linux') else None)
+_TIMESPEC = struct.Struct('@qq')
+_ANC_SIZE = socket.CMSG_SPACE(_TIMESPEC.size) if hasattr(socket, 'CMSG_SPACE') else 0
+
+OVERFLOW_DROP = 'drop'      # plný kruh: datagram se přečte ze socketu a zahodí (počítá se)
+OVERFLOW_BLOCK = 'block'    # plný kruh: přestane se číst, data drží (a případně zahazuje) kernel
+
+
+# ---------------------- SPSC kruh packetů ----------------------
+# Sloty pevné velikosti v jednom předalokovaném bufferu mezi jedním zapisujícím (přijímací vlákno)
+# a jedním čtoucím vláknem. head mění jen zapisující, tail jen čtoucí, takže není potřeba zámek;
+# Event slouží jen k probuzení čtoucího vlákna, když čeká na prázdném kruhu.
+class PacketRing:
+    def __init__(self, slots=RING_SLOTS, slot_size=SLOT_SIZE, overflow=OVERFLOW_DROP):
+        if slots & (slots - 1):
+            raise ValueError("Počet slotů musí být mocnina 2.")
+        if overflow not in (OVERFLOW_DROP, OVERFLOW_BLOCK):
+            raise ValueError(f"Neznámá politika přetečení: {overflow}")
+        self.size = slots
+        self.mask = slots - 1
+        self.slot_size = slot_size
+        self.overflow = overflow
+        self.buffer = bytearray(slots * slot_size)
+        view = memoryview(self.buffer)
+        self.slots = [view[i * slot_size:(i + 1) * slot_size] for i in range(slots)]
+        self.scratch = memoryview(bytearray(slot_size))     # sem se čtou zahazované datagramy
+        self.lengths = [0] * slots
+        self.addrs = [None] * slots
+        self.timestamps = [0.0] * slots
+        self.head = 0               # celkem zapsaných packetů
+        self.tail = 0               # celkem přečtených packetů
+        self.overflow_count = 0     # zahozené packety (drop) nebo zastavení čtení (block)
+        self.readable = threading.Event()
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def free(self):
+        return self.size - (self.head - self.tail)
+
+    def packet(self, i):
+        i &= self.mask
+        return self.slots[i][:self.lengths[i]]
+
+    def wait(self, timeout):
+        # čeká, dokud v kruhu není alespoň jeden packet
+        self.readable.clear()
+        if self.head != self.tail:
+            return True
+        return self.readable.wait(timeout) or self.head != self.tail
+
+
+class PacketBatch:
+    # Packety přijaté od posledního čtení. Packety jsou memoryview do slotů kruhu,
+    # platné jen do dalšího volání UDPRelay.recv_batch() - pak se sloty uvolní pro zápis.
+    def __init__(self, ring, start, stop):
+        self.ring = ring
+        self.start = start
+        self.stop = stop
+        self.timestamp = ring.timestamps[start & ring.mask] if stop > start else 0.0
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.stop - self.start:
+            raise IndexError(i)
+        return self.ring.packet(self.start + i)
+
+    def __iter__(self):
+        packet = self.ring.packet
+        for i in range(self.start, self.stop):
+            yield packet(i)
+
+    def timestamps(self):
+        ring = self.ring
+        return [ring.timestamps[i & ring.mask] for i in range(self.start, self.stop)]
+
+
+def _kernel_time(ancdata, default):
+    for level, kind, data in ancdata:
+        if kind == SO_TIMESTAMPNS and len(data) >= _TIMESPEC.size:
+            sec, nsec = _TIMESPEC.unpack_from(data)
+            return sec + nsec * 1e-9
+    return default
+
+
+def detect_local_ip(device_ip, device_port):
+    # IP adresa rozhraní, přes které se jde na zařízení
+    try:
+        tmp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        tmp_sock.connect((device_ip, device_port))  
+        local_ip = tmp_sock.getsockname()[0]
+        tmp_sock.close()
+        print(f"[INFO] Detekovaná vlastní IP: {local_ip}")
+        return local_ip
+    except Exception as e:
+        raise RuntimeError(f"Chyba při zjišťování vlastní IP: {e}")
+
 
 class UDPRelay:
-    def __init__(self):
+    def __init__(self, batch_mode: bool = False, batch_size: int = BATCH_SIZE, ring_slots: int = RING_SLOTS,
+                 slot_size: int = SLOT_SIZE, overflow: str = OVERFLOW_DROP, rcvbuf: int = None,
+                 kernel_timestamps: bool = False):
         self.addr = None
         self.sock = None
         self.sock_lock = threading.Lock()
 
-        self.receive_buffer = queue.Queue()
+        # přijatá data: SPSC kruh pevných slotů (bez zámku, omezená paměť)
+        self.receive_buffer = PacketRing(ring_slots, slot_size, overflow)
         self.send_buffer = queue.Queue(maxsize=1000)
 
         self.running = False
@@ -19,25 +130,34 @@ class UDPRelay:
         self._timeout = 5.0
         self._received_count = 0
 
+        # dávkový příjem: recv_batch() vrací všechny připravené packety najednou (bez adres)
+        self.batch_mode = batch_mode
+        self.batch_size = batch_size
+        self._batch_end = None
+
+        self.rcvbuf = rcvbuf    # SO_RCVBUF v bajtech, None = výchozí hodnota systému
+        # timestamps v kruhu = čas příjmu v kernelu místo probuzení vlákna (recvmsg, ~1 us navíc na packet)
+        self.kernel_timestamps = kernel_timestamps and SO_TIMESTAMPNS is not None and bool(_ANC_SIZE)
+
     def bind(self, port: int, use_my_ip: bool = False, device_ip: str = "192.168.1.100", device_port: int = "9999"): 
         self.stop()
         with self.sock_lock:
             if use_my_ip:
-                try:
-                    tmp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                    tmp_sock.connect((device_ip, device_port))  
-                    local_ip = tmp_sock.getsockname()[0]
-                    tmp_sock.close()
-                    print(f"[INFO] Detekovaná vlastní IP: {local_ip}")
-                except Exception as e:
-                    raise RuntimeError(f"Chyba při zjišťování vlastní IP: {e}")
+                local_ip = detect_local_ip(device_ip, device_port)
             else:
                 local_ip = "0.0.0.0"
 
             self.addr = (local_ip, port)
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self.rcvbuf:
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            if self.kernel_timestamps:
+                try:
+                    self.sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+                except OSError:
+                    self.kernel_timestamps = False
             self.sock.bind(self.addr)
-            self.sock.settimeout(5.0)
+            self.sock.setblocking(False)   # čekání obstarává select, socket se pak vyčerpá bez blokování
             self.start()
             #print(f"[INFO] Bound to {self.addr[0]}:{self.addr[1]}")      
 
@@ -70,19 +190,49 @@ class UDPRelay:
 
 
     def listen_loop(self):
+        sock = self.sock
+        ring = self.receive_buffer
+        slots, lengths, addrs, timestamps, mask = ring.slots, ring.lengths, ring.addrs, ring.timestamps, ring.mask
+        with_addr = not self.batch_mode
+        kernel_timestamps = self.kernel_timestamps
         while self.running:
+            n = 0
             try:
-                data, addr = self.sock.recvfrom(4096)
-                #print(f"[DEBUG] Příchozí data od {addr}: {data}")
-                self.receive_buffer.put((data, addr))
-                self._received_count += 1
-            except socket.timeout:
-                #print("timeout")
-                continue
-            except (socket.error, OSError) as e:
+                readable, _, _ = select.select([sock], [], [], SELECT_TIMEOUT)
+                if not readable:
+                    continue
+                now = time.time()
+                # vyčerpat vše, co je v socketu
+                while True:
+                    if ring.head - ring.tail >= ring.size:
+                        if ring.overflow == OVERFLOW_BLOCK:
+                            ring.overflow_count += 1
+                            time.sleep(0.001)
+                            break
+                        sock.recv_into(ring.scratch)
+                        ring.overflow_count += 1
+                        continue
+                    i = ring.head & mask
+                    if kernel_timestamps:
+                        lengths[i], ancdata, _, addrs[i] = sock.recvmsg_into([slots[i]], _ANC_SIZE)
+                        timestamps[i] = _kernel_time(ancdata, now)
+                    elif with_addr:
+                        lengths[i], addrs[i] = sock.recvfrom_into(slots[i])
+                        timestamps[i] = now
+                    else:
+                        lengths[i] = sock.recv_into(slots[i])
+                        timestamps[i] = now
+                    ring.head += 1
+                    n += 1
+            except BlockingIOError:
+                pass
+            except (socket.error, OSError, ValueError) as e:
                 if self.running:
                     print(f"[CHYBA] při příjmu dat: {e}")
                 break
+            if n:
+                self._received_count += n
+                ring.readable.set()
 
     def send_loop(self):
         
@@ -90,7 +240,13 @@ class UDPRelay:
         while self.running:
             try:
                 data, addr = self.send_buffer.get(timeout=0.1)
-                self.sock.sendto(data, addr)
+                while True:
+                    try:
+                        self.sock.sendto(data, addr)
+                        break
+                    except BlockingIOError:
+                        # neblokující socket: počkat, až bude možné zapisovat
+                        select.select([], [self.sock], [], SELECT_TIMEOUT)
                 #now = time.time()
                 #print(f"[ODESLÁNO] na {addr} v čase {now:.3f} (interval {now - last_send:.3f}s): {data.decode('utf-8').strip()}")
                 #last_send = now
@@ -108,14 +264,63 @@ class UDPRelay:
         self._timeout = timeout
         
     def recvfrom(self, bufsize):
-        try:
-            data, addr = self.receive_buffer.get(timeout=self._timeout)
-            return data[:bufsize], addr  # <<< zde aplikujeme bufsize limit
-        except queue.Empty:
+        ring = self.receive_buffer
+        if not ring.wait(self._timeout):
             raise socket.timeout("recvfrom timeout vypršel")
+        i = ring.tail & ring.mask
+        data = bytes(ring.slots[i][:min(ring.lengths[i], bufsize)])  # <<< zde aplikujeme bufsize limit
+        addr = ring.addrs[i]
+        ring.tail += 1
+        return data, addr
+
+    def recv_batch(self):
+        # vrací PacketBatch se všemi připravenými packety (max. batch_size);
+        # sloty předchozí dávky se tím uvolní pro zápis
+        ring = self.receive_buffer
+        if self._batch_end is not None:
+            ring.tail = self._batch_end
+            self._batch_end = None
+        if not ring.wait(self._timeout):
+            raise socket.timeout("recv_batch timeout vypršel")
+        start = ring.tail
+        stop = min(ring.head, start + self.batch_size)
+        self._batch_end = stop
+        return PacketBatch(ring, start, stop)
 
     def get_received_count(self):
-        return self.receive_buffer.qsize()
+        # packety čekající v kruhu na zpracování
+        return len(self.receive_buffer)
+
+    def get_overflow_count(self):
+        return self.receive_buffer.overflow_count
+
+    def get_rcvbuf(self):
+        with self.sock_lock:
+            if not self.sock:
+                return None
+            return self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+    def get_kernel_stats(self):
+        # stav socketu v kernelu z /proc/net/udp (jen Linux): bajty ve frontě a zahozené datagramy
+        if not self.addr:
+            return None
+        port = f"{self.addr[1]:04X}"
+        for path in ("/proc/net/udp", "/proc/net/udp6"):
+            try:
+                with open(path) as f:
+                    next(f)
+                    for line in f:
+                        fields = line.split()
+                        if fields[1].rsplit(':', 1)[1] == port:
+                            rx_queue = int(fields[4].split(':')[1], 16)
+                            return {'rx_queue': rx_queue, 'drops': int(fields[-1])}
+            except (OSError, ValueError, IndexError, StopIteration):
+                continue
+        return None
+
+    def get_kernel_drops(self):
+        stats = self.get_kernel_stats()
+        return stats['drops'] if stats else None
 
     def close(self):
         self.stop()
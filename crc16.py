@@ -0,0 +1,113 @@
+import struct
+import binascii
+import time
+
+CRC_POLY = 0x1021
+CRC_INIT = 0xFFFF
+
+_CRC_STRUCT = struct.Struct('<H')
+_tables = {}
+
+
+# ---------------------- CRC CCITT ----------------------
+def crc16_ccitt_bitwise(data: bytes, poly=CRC_POLY, crc=CRC_INIT):
+    # referenční implementace (bit po bitu), pouze pro kontrolu a benchmark
+    for b in data:
+        crc ^= b << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = (crc << 1) ^ poly
+            else:
+                crc <<= 1
+            crc &= 0xFFFF
+    return crc
+
+
+def crc16_table(poly=CRC_POLY):
+    table = _tables.get(poly)
+    if table is None:
+        table = tuple(crc16_ccitt_bitwise(bytes([i]), poly, 0) for i in range(256))
+        _tables[poly] = table
+    return table
+
+
+def crc16_ccitt(data: bytes, poly=CRC_POLY, crc=CRC_INIT):
+    # CCITT polynom (0x1021, bez reflexe) počítá binascii.crc_hqx v C
+    if poly == CRC_POLY:
+        return binascii.crc_hqx(data, crc)
+    table = crc16_table(poly)
+    for b in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ b]
+    return crc
+
+
+def verify_crc(pkt):
+    if len(pkt) < 2:
+        return None
+    data = pkt[:-2]
+    received_crc = _CRC_STRUCT.unpack_from(pkt, len(pkt) - 2)[0]
+    if (crc:=crc16_ccitt(data)) != received_crc:
+        print(f"CRC mismatch: expected 0x{crc:04X}, received 0x{received_crc:04X}")
+        return None
+    return data
+
+
+def verify_crc_batch(packets):
+    # vrací seznam dat bez CRC (None u chybného packetu), bez výpisu pro každý packet
+    crc_hqx = binascii.crc_hqx
+    unpack_from = _CRC_STRUCT.unpack_from
+    result = []
+    for pkt in packets:
+        n = len(pkt) - 2
+        if n < 0:
+            result.append(None)
+            continue
+        data = pkt[:n]
+        if crc_hqx(data, CRC_INIT) == unpack_from(pkt, n)[0]:
+            result.append(data)
+        else:
+            result.append(None)
+    return result
+
+
+# ---------------------- Benchmark ----------------------
+def _packets_per_second(func, packets, min_time=0.5):
+    rounds = 0
+    t0 = time.perf_counter()
+    while True:
+        func(packets)
+        rounds += 1
+        t = time.perf_counter() - t0
+        if t >= min_time:
+            return rounds * len(packets) / t
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Benchmark CRC16-CCITT (packets/s)")
+    parser.add_argument('--channels', type=int, default=2, help="Počet kanálů v datovém packetu")
+    parser.add_argument('--packets', type=int, default=30, help="Počet packetů v jedné dávce")
+    args = parser.parse_args()
+
+    # stejná délka jako datový packet generátoru: hlavička + vzorky + chyby + padding
+    payload_len = 4 + args.channels * 200 * 2 + args.channels + (args.channels % 2)
+    packets = []
+    for _ in range(args.packets):
+        data = os.urandom(payload_len)
+        packets.append(data + struct.pack('<H', crc16_ccitt_bitwise(data)))
+
+    assert all(crc16_ccitt(p[:-2]) == crc16_ccitt_bitwise(p[:-2]) for p in packets)
+    assert all(crc16_ccitt(p[:-2], 0x8005, 0) == crc16_ccitt_bitwise(p[:-2], 0x8005, 0) for p in packets)
+    assert all(d is not None for d in verify_crc_batch(packets))
+
+    print(f"packet size {len(packets[0])} B, batch {len(packets)} packets")
+    results = [
+        ("bitwise (původní)", lambda pkts: [crc16_ccitt_bitwise(p[:-2]) for p in pkts]),
+        ("table (obecný polynom)", lambda pkts: [crc16_ccitt(p[:-2], 0x8005) for p in pkts]),
+        ("crc16_ccitt", lambda pkts: [crc16_ccitt(p[:-2]) for p in pkts]),
+        ("verify_crc_batch", verify_crc_batch),
+    ]
+    for name, func in results:
+        print(f"{name:24}: {_packets_per_second(func, packets):12,.0f} packets/s")
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+# ---------------------- Min/max decimace ----------------------
+def reduce_envelope(mins, maxs, step):
+    # (min[kanál, n], max[kanál, n]) -> min/max po koších o step prvcích, neúplný poslední koš se počítá také;
+    # pro surová data mins = maxs = y, pro hrubší úroveň pyramidy min/max jemnější úrovně
+    ch, n = mins.shape
+    full = n // step * step
+    lo = mins[:, :full].reshape(ch, -1, step).min(axis=-1)
+    hi = maxs[:, :full].reshape(ch, -1, step).max(axis=-1)
+    if full < n:
+        lo = np.concatenate((lo, mins[:, full:].min(axis=-1, keepdims=True)), axis=1)
+        hi = np.concatenate((hi, maxs[:, full:].max(axis=-1, keepdims=True)), axis=1)
+    return lo, hi
+
+
+def interleave_envelope(x, ymin, ymax):
+    # každý koš vykreslí svislou čáru min -> max, výstup má 2 body na koš
+    x2 = np.repeat(x, 2)
+    y2 = np.empty(ymin.shape[:-1] + (2 * ymin.shape[-1],), dtype=ymin.dtype)
+    y2[..., 0::2] = ymin
+    y2[..., 1::2] = ymax
+    return x2, y2
+
+
+def bucket_for(n_visible, width_px):
+    # velikost koše zaokrouhlená na mocninu dvou, aby se cache neměnila při každé změně rozsahu
+    if n_visible <= 2 * width_px:
+        return 1
+    return 1 << int(np.ceil(np.log2(n_visible / width_px)))
+
+
+def prepare_frame(buf, n_visible, bucket, scaling, sample_period):
+    # snímek z posledních n_visible vzorků bufferu: x v s a y[kanál] v jednotkách kanálů;
+    # koš 1 = surové vzorky, jinak min/max obálka z pyramidy bufferu (2 body na koš)
+    if bucket == 1:
+        x = buf.latest_x(n_visible) * sample_period
+        y = buf.latest_samples(n_visible)
+    else:
+        xs, ymin, ymax = buf.envelope(n_visible, bucket)
+        x, y = interleave_envelope(xs * sample_period, ymin, ymax)
+    # int16 -> jednotky kanálů jen pro vykreslované body
+    return x, scaling.apply(y)
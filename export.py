@@ -0,0 +1,181 @@
+import argparse
+import json
+import lzma
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from protocol import PACKET_RATE_HZ
+from packet_decoder import DataPacketDecoder
+from journal import JournalReader
+from scaling import ChannelScaling, DEFAULT_CHANNEL
+
+# ---------------------- Sloupcový export ----------------------
+# Adresář name.cols/ s manifest.json a bloky (chunk) po CHUNK_PACKETS packetech:
+#   chNN_KKKKK.npy|.zlib|.xz  vzorky int16 jednoho kanálu (zlib/xz = komprimované surové int16 LE)
+#   order_KKKKK.npy           absolutní pořadí packetů bloku (mezery = ztracené packety)
+#   errors_KKKKK.npy          počty chybných vzorků [kanál, packet] uint8
+# Manifest má u každého bloku rozsah vzorků, součty chyb a převod kanálů z ID packetu (unit, offset, gain).
+CHUNK_PACKETS = 5000      # 5 s při 1000 packets/s
+ZLIB_LEVEL = 6
+LZMA_PRESET = 1
+EXPORT_EXT = ".cols"
+MANIFEST = "manifest.json"
+
+# zlib i lzma při kompresi uvolňují GIL, takže vlákna stačí na využití všech jader
+CODECS = {
+    'npy': ('.npy', None, None),
+    'zlib': ('.zlib', lambda b: zlib.compress(b, ZLIB_LEVEL), zlib.decompress),
+    'lzma': ('.xz', lambda b: lzma.compress(b, preset=LZMA_PRESET), lzma.decompress),
+}
+
+
+def _write_column(path, data, codec):
+    ext, compress, _ = CODECS[codec]
+    if compress is None:
+        np.save(path, data)
+    else:
+        with open(path, "wb") as f:
+            f.write(compress(data.tobytes()))
+    return os.path.getsize(path)
+
+
+def _read_column(path, codec, dtype=np.int16):
+    ext, _, decompress = CODECS[codec]
+    if decompress is None:
+        return np.load(path, mmap_mode='r')
+    with open(path, "rb") as f:
+        return np.frombuffer(decompress(f.read()), dtype=dtype)
+
+
+def export_journal(journal_path, out_dir=None, codec='npy', chunk_packets=CHUNK_PACKETS, workers=None, log=print):
+    if codec not in CODECS:
+        raise ValueError(f"[ERR]: unknown codec {codec}, use one of {', '.join(CODECS)}")
+    reader = JournalReader(journal_path)
+    out_dir = out_dir or os.path.splitext(journal_path)[0] + EXPORT_EXT
+    os.makedirs(out_dir, exist_ok=True)
+    ch = reader.channels_count
+    spp = reader.samples_per_packet
+    decoder = DataPacketDecoder(ch, spp)
+    packet_size = decoder.packet_size + 2       # v žurnálu je packet i s CRC
+    scale = reader.info.get('channels') or [DEFAULT_CHANNEL] * ch
+    ext = CODECS[codec][0]
+
+    index = reader.valid_index()
+    workers = workers or os.cpu_count() or 1
+    chunks = []
+    pending = []
+    raw_bytes = written_bytes = 0
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for k, first in enumerate(range(0, len(index), chunk_packets)):
+            part = index[first:first + chunk_packets]
+            packets = np.ascontiguousarray(reader.read_packets(part['offset'], packet_size)[:, :-2])
+            _, samples, errors = decoder.decode_buffer(packets)
+            orders = part['order'].copy()
+
+            files = [f"ch{c:02d}_{k:05d}{ext}" for c in range(ch)]
+            np.save(os.path.join(out_dir, f"order_{k:05d}.npy"), orders)
+            np.save(os.path.join(out_dir, f"errors_{k:05d}.npy"), np.ascontiguousarray(errors))
+            for c in range(ch):
+                pending.append(pool.submit(_write_column, os.path.join(out_dir, files[c]), samples[c], codec))
+            raw_bytes += samples.nbytes
+            chunks.append({
+                'index': k,
+                'first_order': int(orders[0]),
+                'last_order': int(orders[-1]),
+                'first_sample': int(orders[0]) * spp,
+                'stop_sample': (int(orders[-1]) + 1) * spp,
+                'packets': len(orders),
+                'samples': files,
+                'order': f"order_{k:05d}.npy",
+                'errors': f"errors_{k:05d}.npy",
+                'error_samples': errors.sum(axis=1, dtype=np.int64).tolist(),
+                'scale': scale,
+            })
+            # omezení rozpracovaných bloků v paměti
+            while len(pending) > 2 * workers * ch:
+                written_bytes += pending.pop(0).result()
+        for f in pending:
+            written_bytes += f.result()
+
+    manifest = {
+        'source': os.path.basename(journal_path),
+        'codec': codec,
+        'dtype': '<i2',
+        'channels_count': ch,
+        'samples_per_packet': spp,
+        'sample_rate': spp * PACKET_RATE_HZ,
+        'channels': scale,
+        'chunks': chunks,
+    }
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1)
+    dt = time.perf_counter() - t0
+    log(f"[OK] Exported {len(index)} packets in {len(chunks)} chunks to {out_dir}: "
+        f"{raw_bytes / 1e6:.1f} MB -> {written_bytes / 1e6:.1f} MB ({codec}), "
+        f"{dt:.2f} s, {raw_bytes / 1e6 / max(dt, 1e-9):.0f} MB/s, {workers} workers")
+    return out_dir
+
+
+# ---------------------- Čtení exportu ----------------------
+class ColumnarReader:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.codec = self.manifest['codec']
+        self.channels_count = self.manifest['channels_count']
+        self.samples_per_packet = self.manifest['samples_per_packet']
+        self.chunks = self.manifest['chunks']
+        self.first_sample = np.array([c['first_sample'] for c in self.chunks], dtype=np.int64)
+        self.stop_sample = np.array([c['stop_sample'] for c in self.chunks], dtype=np.int64)
+
+    def chunks_between(self, start, stop):
+        # bloky překrývající rozsah absolutních indexů vzorků [start, stop)
+        lo = np.searchsorted(self.stop_sample, start, side='right')
+        hi = np.searchsorted(self.first_sample, stop, side='left')
+        return range(lo, hi)
+
+    def read_chunk(self, k, channels=None):
+        # (x[n], samples[kanál, n], errors[kanál, packet]) jednoho bloku
+        chunk = self.chunks[k]
+        channels = range(self.channels_count) if channels is None else channels
+        path = lambda name: os.path.join(self.directory, name)
+        orders = np.load(path(chunk['order']))
+        spp = self.samples_per_packet
+        x = (orders[:, None] * spp + np.arange(spp, dtype=np.int64)).ravel()
+        samples = np.stack([_read_column(path(chunk['samples'][c]), self.codec) for c in channels])
+        errors = np.load(path(chunk['errors']))[list(channels)]
+        return x, samples, errors
+
+    def read(self, start, stop, channels=None, scaled=False):
+        # (x, samples[kanál, n]) pro rozsah [start, stop); čte jen překrývající se bloky
+        xs, parts = [], []
+        for k in self.chunks_between(start, stop):
+            x, samples, _ = self.read_chunk(k, channels)
+            a, b = np.searchsorted(x, (start, stop))
+            xs.append(x[a:b])
+            parts.append(samples[:, a:b])
+        n_ch = self.channels_count if channels is None else len(channels)
+        if not xs:
+            return np.zeros(0, dtype=np.int64), np.zeros((n_ch, 0), dtype=np.int16)
+        x, samples = np.concatenate(xs), np.concatenate(parts, axis=1)
+        if scaled:
+            scaling = ChannelScaling(self.manifest['channels'], self.channels_count)
+            samples = scaling.apply(samples, None if channels is None else list(channels))
+        return x, samples
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export žurnálu packetů do sloupcových bloků po kanálech")
+    parser.add_argument('journal', help="soubor .pkj")
+    parser.add_argument('--out', help="výstupní adresář (výchozí name.cols)")
+    parser.add_argument('--codec', choices=tuple(CODECS), default='npy')
+    parser.add_argument('--chunk-packets', type=int, default=CHUNK_PACKETS)
+    parser.add_argument('--workers', type=int, help="vlákna pro kompresi a zápis (výchozí počet jader)")
+    args = parser.parse_args()
+    export_journal(args.journal, args.out, args.codec, args.chunk_packets, args.workers)
@@ -0,0 +1,236 @@
+import struct
+import threading
+import time
+
+import numpy as np
+
+from protocol import DATA_packet, TRIGGER_packet, SAMPLES_PER_PACKET, MAX_ORDER
+from crc16 import verify_crc_batch
+from packet_decoder import DataPacketDecoder
+from sequencing import ReorderWindow, SequenceUnwrapper
+from journal import FLAG_CRC_ERROR, FLAG_BEFORE_START
+from trigger_capture import TriggerCapture
+
+REORDER_WINDOW_SIZE = 256  # sloty okna pro řazení packetů (mocnina 2, > min_buffer_size)
+MIN_BUFFER_SIZE = 90       # kolik packetů držet v okně před výdejem
+CHUNK_SIZE = 30            # kolik packetů vydat najednou
+PACKET_LOG_INTERVAL = 1.0  # s, nejvýš jedna zpráva o chybných / zahozených packetech za interval
+
+
+# ---------------------- Omezení výpisu ----------------------
+# Při zarušené lince nebo dávce duplikátů by zpráva za každý packet zahltila log GUI (a frontu událostí
+# ingest procesu). První zpráva v intervalu projde, další se jen počítají a vypíše se jejich souhrn.
+class RateLimitedLog:
+    def __init__(self, log, label, interval=PACKET_LOG_INTERVAL):
+        self.log = log
+        self.label = label
+        self.interval = interval
+        self.next_time = 0.0
+        self.suppressed = 0
+
+    def __call__(self, msg):
+        now = time.monotonic()
+        if now < self.next_time:
+            self.suppressed += 1
+            return
+        self.flush()
+        self.log(msg)
+        self.next_time = now + self.interval
+
+    def tick(self):
+        # volá se po každé dávce - souhrn vyjde i po skončení série chyb
+        if self.suppressed and time.monotonic() >= self.next_time:
+            self.flush()
+            self.next_time = 0.0
+
+    def flush(self):
+        if self.suppressed:
+            self.log(f"{self.label}: {self.suppressed} more in the last {self.interval:g} s")
+            self.suppressed = 0
+
+
+# ---------------------- Zpracování přijatých packetů ----------------------
+# CRC -> rozbalení pořadí -> řazení -> dekódování -> zápis do bufferu signálu. Bez Qt,
+# používá ho SamplingThread v GUI, samostatný ingest proces i headless nahrávání.
+class IngestPipeline:
+    def __init__(self, channels_count, signal_buffer, buffer_lock=None,
+                 log=print, on_data=None, on_trigger=None):
+        self.channels_count = channels_count
+        self.signal_buffer = signal_buffer
+        self.buffer_lock = buffer_lock or threading.Lock()
+        self.log = log
+        self.on_data = on_data          # volá se po zápisu dávky do bufferu
+        self.on_trigger = on_trigger    # on_trigger(packet_num, sample_num)
+        self.journal = None             # JournalWriter pro průběžné ukládání packetů
+        self.trigger_capture = None     # TriggerCapture pro uložení okolí triggeru
+        self.latency = None             # LatencyTracker pro měření latence po fázích
+        self.lock = threading.Lock()
+        self.invalid_log = RateLimitedLog(log, "[ERR] Invalid packets")
+        self.drop_log = RateLimitedLog(log, "[DROP] Late or duplicate packets")
+
+        self.min_buffer_size = MIN_BUFFER_SIZE
+        self.chunk_size = CHUNK_SIZE
+        self.reorder = ReorderWindow(REORDER_WINDOW_SIZE, self.min_buffer_size)
+        self.unwrapper = SequenceUnwrapper(MAX_ORDER)
+        self.decoder = None
+        self.lost_packets_counter = 0
+        self.crc_error_counter = 0
+        self.received_packets = 0
+
+    def set_channels_count(self, new_count):
+        with self.lock:
+            self.channels_count = new_count
+
+    def get_packet_buffer_size(self):
+        with self.lock:
+            return len(self.reorder)
+
+    def clear_error_stats(self):
+        self.lost_packets_counter = 0
+        self.crc_error_counter = 0
+        self.received_packets = 0
+        with self.lock:
+            self.reorder.clear_stats()
+
+    def gap_histogram(self):
+        with self.lock:
+            return self.reorder.gap_histogram()
+
+    def set_trigger_capture(self, base_path, pre_samples=0, post_samples=0):
+        # base_path=None vypne ukládání na trigger
+        capture = self.trigger_capture
+        if base_path is None:
+            self.trigger_capture = None
+            if capture is not None:
+                capture.close()
+        elif capture is not None:
+            capture.configure(base_path, pre_samples, post_samples)
+        else:
+            self.trigger_capture = TriggerCapture(base_path, pre_samples, post_samples, log=self.log)
+
+    def process_batch(self, batch):
+        # CRC celé dávky najednou, packety mohou být memoryview do bufferu relay
+        if self.latency is not None:
+            self.latency.dequeued(time.time())
+        if (self.journal is not None or self.latency is not None) and hasattr(batch, 'timestamps'):
+            for pkt, data, timestamp in zip(batch, verify_crc_batch(batch), batch.timestamps()):
+                self.handle_packet(pkt, data, timestamp)
+        else:
+            for pkt, data in zip(batch, verify_crc_batch(batch)):
+                self.handle_packet(pkt, data)
+        self.invalid_log.tick()
+        self.drop_log.tick()
+
+    def handle_packet(self, pkt, data, timestamp=None):
+        self.received_packets += 1
+        if len(pkt) >= 4:
+            packet_type, packet_order = struct.unpack_from('<HH', pkt)
+
+            if packet_type == DATA_packet:
+                journal = self.journal
+                if data is None:
+                    self.crc_error_counter += 1
+                    if journal is not None and journal.record_invalid:
+                        journal.append(-1, timestamp or time.time(), pkt, FLAG_CRC_ERROR)
+                    self.invalid_log(f" [ERR] Invalid packet[{len(pkt)}] {packet_type:04X} {packet_order:5}")
+                    return
+
+                # === 16bit pořadí -> absolutní pořadí (bez vyprazdňování bufferu při přetečení) ===
+                order = self.unwrapper.unwrap(packet_order)
+                if journal is not None:
+                    if order >= 0:
+                        journal.append(order, timestamp or time.time(), pkt)
+                    else:
+                        # packet přes přetečení starší než první přijatý - okno ho zahodí jako opožděný;
+                        # v žurnálu pořadí -1 jako neplatný packet, příznak odliší od chyby CRC
+                        journal.append(-1, timestamp or time.time(), pkt, FLAG_BEFORE_START)
+                if self.latency is not None:
+                    self.latency.received(order, timestamp)
+
+                # === Přidání do okna, pokud máme alespoň 90, odešleme 30 nejstarších ===
+                # (kopie dat - buffer dávky se po zpracování použije znovu)
+                with self.lock:
+                    accepted = self.reorder.insert(order, bytes(data))
+                    chunk = self.reorder.flush(self.chunk_size) if self.reorder.ready() else None
+                if not accepted:
+                    self.drop_log(f"[DROP] Packet {order} ({packet_order}) is older than last flushed {self.reorder.next_seq - 1} or duplicate, dropping.")
+                    return
+
+                # === Dekódování a přesun dat ===
+                if chunk:
+                    self.flush_chunk(chunk)
+
+            elif packet_type == TRIGGER_packet and len(pkt) >= 5:
+                # Trigger packet
+                self.received_packets -= 1
+                packet_num, sample_num = struct.unpack_from('<HB', pkt, 2)
+                self.log(f"[TRIGGER] Trigger packet received (packet_num={packet_num}, sample_num={sample_num})")
+                if self.trigger_capture is not None:
+                    self.trigger_capture.arm(self.unwrapper.resolve(packet_num) * SAMPLES_PER_PACKET + sample_num)
+                if self.on_trigger:
+                    self.on_trigger(packet_num, sample_num)
+
+            else:
+                self.log(f"[ERR] wrong packet, {bytes(pkt)}")
+        else:
+            self.log("[ERR] Received too short packet")
+
+    def flush_chunk(self, chunk):
+        orders, packets, lost = chunk
+        self.lost_packets_counter += lost
+        if orders:
+            if self.latency is not None:
+                self.latency.flushed(orders, time.time())
+            self.process_packets(orders, packets)
+            if self.on_data:
+                self.on_data()
+
+    def process_packets(self, orders: list, packets: list):
+        with self.lock:
+            ch_count = self.channels_count
+
+        if not orders:
+            return
+        if self.decoder is None or self.decoder.channels_count != ch_count:
+            self.decoder = DataPacketDecoder(ch_count, SAMPLES_PER_PACKET)
+
+        # packet jiné délky (např. při změně počtu kanálů) by shodil celou dávku - vyřadí se a počítá jako ztracený
+        size = self.decoder.packet_size
+        if any(len(p) != size for p in packets):
+            valid = [i for i, p in enumerate(packets) if len(p) == size]
+            bad = len(packets) - len(valid)
+            self.lost_packets_counter += bad
+            self.log(f"[ERR] {bad} data packets with wrong size (expected {size} B for {ch_count} channels), dropping")
+            orders = [orders[i] for i in valid]
+            packets = [packets[i] for i in valid]
+            if not orders:
+                return
+
+        try:
+            _, samples, errors = self.decoder.decode(packets)
+        except ValueError as e:
+            self.log(str(e))
+            return
+
+        first_index = np.asarray(orders, dtype=np.int64) * SAMPLES_PER_PACKET
+
+        latency = self.latency
+        t_decoded = time.time() if latency is not None else 0.0
+        with self.buffer_lock:
+            t_locked = time.time() if latency is not None else 0.0
+            if self.signal_buffer.channels_count != ch_count:
+                return  # buffer byl mezitím přealokován na jiný počet kanálů
+            self.signal_buffer.append(first_index, samples, errors)
+            if self.trigger_capture is not None:
+                self.trigger_capture.update(self.signal_buffer)
+            # SampleFileWriter (recorder.py) total_packets nemá, latence se měří jen nad kruhovým bufferem
+            total_packets = self.signal_buffer.total_packets if latency is not None else 0
+        if latency is not None:
+            latency.appended(t_decoded, t_locked, time.time(), total_packets)
+
+    def flush_packet_buffer(self):
+        with self.lock:
+            chunk = self.reorder.flush()
+        self.flush_chunk(chunk)
+        self.invalid_log.flush()
+        self.drop_log.flush()
@@ -0,0 +1,287 @@
+import multiprocessing as mp
+import queue
+import socket
+import struct
+import time
+
+import numpy as np
+
+from protocol import TRIGGER_ACK
+from buffered_socket import UDPRelay
+from ring_buffer import SharedSignalRingBuffer, open_shared_memory
+from ingest import IngestPipeline, REORDER_WINDOW_SIZE
+from journal import JournalWriter
+from replay import ReplayRelay
+from latency import LatencyHistograms, LatencyTracker
+
+# ---------------------- Počítadla ve sdílené paměti ----------------------
+C_RECEIVED = 0
+C_LOST = 1
+C_CRC_ERRORS = 2
+C_SEQUENCING = 3      # packety v okně pro řazení
+C_SOCKET_QUEUE = 4    # packety čekající v kruhu relay
+C_OVERFLOW = 5
+C_KERNEL_DROPS = 6    # -1 = nedostupné
+C_RUNNING = 7
+C_FLUSHED = 8         # generace posledního dokončeného příkazu 'flush'
+COUNTERS_SIZE = 9
+GAPS_SIZE = REORDER_WINDOW_SIZE + 1     # histogram délek mezer za počítadly
+
+CONTROL_INTERVAL = 0.02   # jak často worker kontroluje frontu příkazů
+FLUSH_TIMEOUT = 1.0       # jak dlouho GUI čeká na potvrzení vyprázdnění okna pro řazení
+
+
+def _counters_view(shm, readonly=False):
+    counters = np.ndarray((COUNTERS_SIZE + GAPS_SIZE,), dtype=np.int64, buffer=shm.buf)
+    if readonly:
+        counters.setflags(write=False)
+    return counters
+
+
+# ---------------------- Ingest proces ----------------------
+# Běží v samostatném procesu (vlastní GIL): vlastní datový socket, CRC, řazení, dekódování
+# a zápis do kruhového bufferu ve sdílené paměti. S GUI komunikuje jen přes sdílenou paměť
+# a dvě fronty (příkazy dovnitř, logy, triggery a chyby ven).
+def ingest_worker(config, ring_name, counters_name, latency_name, control, events):
+    ring = SharedSignalRingBuffer(config['channels_count'], config['capacity'], config['samples_per_packet'], name=ring_name)
+    counters_shm = open_shared_memory(counters_name, 0)
+    counters = _counters_view(counters_shm)
+    latency_shm = open_shared_memory(latency_name, 0)
+
+    if config.get('replay'):
+        relay = ReplayRelay(*config['replay'])
+    else:
+        relay = UDPRelay(batch_mode=True, rcvbuf=config['rcvbuf'], kernel_timestamps=config['kernel_timestamps'])
+    relay.settimeout(CONTROL_INTERVAL)
+    device = (config['udp_device_addr'], config['udp_device_port'])
+
+    def log(msg):
+        events.put(('log', msg))
+
+    def on_trigger(packet_num, sample_num):
+        events.put(('trigger', packet_num, sample_num))
+        try:
+            relay.sendto(struct.pack('<I', TRIGGER_ACK), device)
+            log("[ACK] Trigger ACK send")
+        except Exception as e:
+            print(f"[ERR] Sendind Trigger ACK failed: {e}")
+
+    pipeline = IngestPipeline(config['channels_count'], ring, log=log, on_trigger=on_trigger)
+    pipeline.latency = LatencyTracker(LatencyHistograms(latency_shm.buf))
+    try:
+        relay.bind(port=config['udp_data_port'], use_my_ip=config['use_my_ip'],
+                   device_ip=config['udp_device_addr'], device_port=config['udp_device_port'])
+    except Exception as e:
+        log(f"[ERR] Ingest process: {e}")
+        pipeline.latency = None
+        ring.close()
+        counters_shm.close()
+        latency_shm.close()
+        return
+
+    counters[C_RUNNING] = 1
+    next_control = 0.0
+    try:
+        while True:
+            try:
+                pipeline.process_batch(relay.recv_batch())
+            except socket.timeout:
+                pass
+
+            counters[C_RECEIVED] = pipeline.received_packets
+            counters[C_LOST] = pipeline.lost_packets_counter
+            counters[C_CRC_ERRORS] = pipeline.crc_error_counter
+            counters[C_SEQUENCING] = len(pipeline.reorder)
+            counters[C_SOCKET_QUEUE] = relay.get_received_count()
+            counters[C_OVERFLOW] = relay.get_overflow_count()
+
+            now = time.monotonic()
+            if now < next_control:
+                continue
+            next_control = now + CONTROL_INTERVAL
+            kernel_drops = relay.get_kernel_drops()
+            counters[C_KERNEL_DROPS] = -1 if kernel_drops is None else kernel_drops
+            counters[COUNTERS_SIZE:] = pipeline.reorder.gaps
+
+            try:
+                while True:
+                    cmd, *cmd_args = control.get_nowait()
+                    if cmd == 'stop':
+                        return
+                    elif cmd == 'flush':
+                        # počítadla a mezery se zveřejní před potvrzením, GUI je čte hned po něm
+                        pipeline.flush_packet_buffer()
+                        counters[C_LOST] = pipeline.lost_packets_counter
+                        counters[C_SEQUENCING] = len(pipeline.reorder)
+                        counters[COUNTERS_SIZE:] = pipeline.reorder.gaps
+                        counters[C_FLUSHED] = cmd_args[0]
+                    elif cmd == 'clear_stats':
+                        pipeline.clear_error_stats()
+                    elif cmd == 'reset_received':
+                        pipeline.received_packets = 0
+                    elif cmd == 'clear':
+                        ring.clear()
+                    elif cmd == 'journal':
+                        close_journal(pipeline, log)
+                        try:
+                            pipeline.journal = JournalWriter(cmd_args[0], pipeline.channels_count, info=cmd_args[1])
+                        except OSError as e:
+                            log(f"[ERR] Save: {e}")
+                            events.put(('journal_failed', cmd_args[0]))
+                    elif cmd == 'journal_stop':
+                        close_journal(pipeline, log)
+                    elif cmd == 'trigger_capture':
+                        pipeline.set_trigger_capture(*cmd_args)
+                    elif cmd == 'clear_latency':
+                        pipeline.latency.histograms.clear()
+            except queue.Empty:
+                pass
+    finally:
+        relay.stop()
+        close_journal(pipeline, log)
+        pipeline.set_trigger_capture(None)
+        counters[C_RUNNING] = 0
+        counters = None
+        pipeline.latency = None
+        ring.close()
+        counters_shm.close()
+        latency_shm.close()
+
+
+def close_journal(pipeline, log):
+    journal, pipeline.journal = pipeline.journal, None
+    if journal is not None:
+        log(journal.close())
+
+
+# ---------------------- Ovládání z GUI ----------------------
+# Stejné rozhraní jako SamplingThread, aby GUI nemuselo rozlišovat, kde ingest běží.
+# Proces se spouští metodou spawn - nesmí zdědit stav Qt z GUI procesu.
+class IngestProcess:
+    def __init__(self, channels_count, capacity, samples_per_packet,
+                 udp_device_addr, udp_device_port, udp_data_port, use_my_ip, rcvbuf=None, replay=None,
+                 kernel_timestamps=False):
+        ctx = mp.get_context('spawn')
+        # GUI je vlastníkem sdílené paměti, ale mapuje ji jen pro čtení
+        self.signal_buffer = SharedSignalRingBuffer(channels_count, capacity, samples_per_packet, readonly=True)
+        self._counters_shm = open_shared_memory(None, 8 * (COUNTERS_SIZE + GAPS_SIZE))
+        self.counters = _counters_view(self._counters_shm, readonly=True)
+        # histogramy latence zapisuje worker, GUI je jen čte
+        self._latency_shm = open_shared_memory(None, LatencyHistograms.nbytes())
+        self.latency = LatencyHistograms(self._latency_shm.buf, readonly=True)
+        self.control = ctx.Queue()
+        self.events = ctx.Queue()
+        self._flush_generation = 0
+        config = {
+            'channels_count': channels_count,
+            'capacity': capacity,
+            'samples_per_packet': samples_per_packet,
+            'udp_device_addr': udp_device_addr,
+            'udp_device_port': udp_device_port,
+            'udp_data_port': udp_data_port,
+            'use_my_ip': use_my_ip,
+            'rcvbuf': rcvbuf,
+            'replay': replay,       # (žurnál, rychlost) místo datového socketu
+            'kernel_timestamps': kernel_timestamps,
+        }
+        self.process = ctx.Process(target=ingest_worker, name="ingest",
+                                   args=(config, self.signal_buffer.name, self._counters_shm.name, self._latency_shm.name,
+                                         self.control, self.events),
+                                   daemon=True)
+
+    def start(self, timeout=10.0):
+        # počká, až worker naváže datový socket - packety poslané dřív by se ztratily
+        self.process.start()
+        deadline = time.monotonic() + timeout
+        while not self.counters[C_RUNNING] and self.process.is_alive() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def isRunning(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        if self.counters is None:
+            return  # už zastaveno
+        if self.process.is_alive():
+            self.control.put(('stop',))
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        self.counters = None
+        self.latency = None
+        self.signal_buffer.close()
+        self._counters_shm.close()
+        self._counters_shm.unlink()
+        self._latency_shm.close()
+        self._latency_shm.unlink()
+
+    @property
+    def received_packets(self):
+        return int(self.counters[C_RECEIVED])
+
+    @property
+    def lost_packets_counter(self):
+        return int(self.counters[C_LOST])
+
+    @property
+    def crc_error_counter(self):
+        return int(self.counters[C_CRC_ERRORS])
+
+    def get_packet_buffer_size(self):
+        return int(self.counters[C_SEQUENCING])
+
+    def get_socket_queue_size(self):
+        return int(self.counters[C_SOCKET_QUEUE])
+
+    def get_overflow_count(self):
+        return int(self.counters[C_OVERFLOW])
+
+    def get_kernel_drops(self):
+        drops = int(self.counters[C_KERNEL_DROPS])
+        return None if drops < 0 else drops
+
+    def gap_histogram(self):
+        return {length: int(n) for length, n in enumerate(self.counters[COUNTERS_SIZE:]) if n}
+
+    def flush_packet_buffer(self, timeout=FLUSH_TIMEOUT):
+        # čeká na potvrzení od workeru - potom buffer, počítadla i mezery obsahují vydané packety
+        self._flush_generation += 1
+        generation = self._flush_generation
+        self.control.put(('flush', generation))
+        deadline = time.monotonic() + timeout
+        while self.counters[C_FLUSHED] != generation and self.process.is_alive() and time.monotonic() < deadline:
+            time.sleep(0.002)
+
+    def clear_error_stats(self):
+        self.control.put(('clear_stats',))
+
+    def reset_received(self):
+        self.control.put(('reset_received',))
+
+    def clear_buffer(self):
+        self.control.put(('clear',))
+
+    def start_journal(self, path, info=None):
+        # žurnál zakládá ingest proces; při chybě pošle událost ('journal_failed', path)
+        self.control.put(('journal', path, info))
+        return True
+
+    def stop_journal(self):
+        self.control.put(('journal_stop',))
+
+    def set_trigger_capture(self, base_path, pre_samples=0, post_samples=0):
+        self.control.put(('trigger_capture', base_path, pre_samples, post_samples))
+
+    def clear_latency(self):
+        self.control.put(('clear_latency',))
+
+    def poll_events(self):
+        # logy a triggery z ingest procesu, volá se z časovače GUI
+        out = []
+        try:
+            while True:
+                out.append(self.events.get_nowait())
+        except queue.Empty:
+            pass
+        return out
@@ -0,0 +1,193 @@
+import json
+import os
+import re
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from protocol import SAMPLES_PER_PACKET
+
+# ---------------------- Formát žurnálu ----------------------
+# Hlavička souboru, pak záznamy za sebou v pořadí příjmu:
+#   [absolutní pořadí int64][čas příjmu float64 (time.time)][příznaky u16][délka u16][packet včetně CRC]
+# Vedlejší soubor .idx obsahuje pro každý záznam dvojici (pořadí, offset v žurnálu) - také v pořadí příjmu.
+# Volitelný .json obsahuje popis zařízení z ID packetu (jednotky, offsety a zisky kanálů).
+JOURNAL_MAGIC = b'PLTJ'
+JOURNAL_VERSION = 1
+JOURNAL_HEADER = struct.Struct('<4sHHHHd')   # magic, verze, kanály, vzorků/packet, rezerva, čas vytvoření
+RECORD_HEADER = struct.Struct('<qdHH')       # pořadí, čas příjmu, příznaky, délka packetu
+INDEX_DTYPE = np.dtype([('order', '<i8'), ('offset', '<i8')])
+JOURNAL_EXT = ".pkj"
+
+FLAG_CRC_ERROR = 0x0001    # packet neprošel CRC, pořadí -1 (zapisuje se s record_invalid=True, kvůli přehrávání)
+FLAG_BEFORE_START = 0x0002 # opožděný packet z doby před prvním přijatým (rozbalené pořadí < 0), pořadí -1
+
+WRITE_BUFFER = 4 * 1024 * 1024   # B, buffer souboru - zápisy po velkých blocích
+WRITE_INTERVAL = 0.05            # s, jak často zapisovací vlákno vybírá frontu
+FSYNC_INTERVAL = 1.0             # s, jak často se data vynutí na disk
+MAX_BACKLOG = 1 << 16            # packetů ve frontě, pak se zahazuje (vlákno příjmu nikdy nečeká)
+
+
+# ---------------------- Názvy souborů ----------------------
+# Stejné jméno -> vždy o jedna větší index, než je nejvyšší ve složce (name_001.pkj, name_002.pkj, ...)
+def next_free_path(base, ext=JOURNAL_EXT):
+    directory, name = os.path.split(base)
+    stem, base_ext = os.path.splitext(name)
+    ext = base_ext or ext
+    pattern = re.compile(re.escape(stem) + r'_(\d+)' + re.escape(ext) + '$')
+    try:
+        names = os.listdir(directory or '.')
+    except FileNotFoundError:
+        names = []
+    indices = [int(m.group(1)) for m in map(pattern.match, names) if m]
+    return os.path.join(directory, f"{stem}_{max(indices, default=0) + 1:03d}{ext}")
+
+
+# ---------------------- Zápis žurnálu ----------------------
+# append() jen vloží kopii packetu do fronty; formátování, zápis a fsync dělá vlastní vlákno.
+class JournalWriter:
+    def __init__(self, path, channels_count, samples_per_packet=SAMPLES_PER_PACKET,
+                 fsync_interval=FSYNC_INTERVAL, max_backlog=MAX_BACKLOG, record_invalid=True, info=None):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.channels_count = channels_count
+        self.fsync_interval = fsync_interval
+        self.max_backlog = max_backlog
+        self.record_invalid = record_invalid
+
+        self.file = open(path, "xb", buffering=WRITE_BUFFER)
+        self.index_file = open(self.index_path, "xb", buffering=WRITE_BUFFER // 16)
+        self.file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, channels_count,
+                                            samples_per_packet, 0, time.time()))
+        self.offset = JOURNAL_HEADER.size
+        if info:
+            with open(path + ".json", "w") as f:
+                json.dump(info, f, indent=2)
+
+        self._pending = deque()
+        self._closing = threading.Event()
+        self.written_packets = 0
+        self.dropped_packets = 0
+        self.thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self.thread.start()
+
+    def append(self, order, timestamp, packet, flags=0):
+        # volá vlákno příjmu - nikdy neblokuje
+        if len(self._pending) >= self.max_backlog:
+            self.dropped_packets += 1
+            return
+        self._pending.append((order, timestamp, flags, bytes(packet)))
+
+    def _drain(self):
+        pending = self._pending
+        if not pending:
+            return
+        records = bytearray()
+        index = []
+        offset = self.offset
+        pack = RECORD_HEADER.pack
+        while pending:
+            order, timestamp, flags, packet = pending.popleft()
+            index.append((order, offset))
+            records += pack(order, timestamp, flags, len(packet))
+            records += packet
+            offset += RECORD_HEADER.size + len(packet)
+        self.file.write(records)
+        self.index_file.write(np.array(index, dtype=INDEX_DTYPE).data)
+        self.offset = offset
+        self.written_packets += len(index)
+
+    def _sync(self):
+        for f in (self.file, self.index_file):
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _run(self):
+        next_sync = time.monotonic() + self.fsync_interval
+        while not self._closing.wait(WRITE_INTERVAL):
+            self._drain()
+            now = time.monotonic()
+            if now >= next_sync:
+                self._sync()
+                next_sync = now + self.fsync_interval
+        self._drain()
+        self._sync()
+        self.file.close()
+        self.index_file.close()
+
+    def close(self):
+        # dopíše frontu, vrací souhrn pro log
+        self._closing.set()
+        self.thread.join()
+        return (f"Saved {self.written_packets} packets ({self.offset / 1e6:.1f} MB) to {self.path}"
+                + (f", dropped {self.dropped_packets}" if self.dropped_packets else ""))
+
+
+# ---------------------- Čtení žurnálu ----------------------
+def read_journal_header(f):
+    magic, version, channels_count, samples_per_packet, _, created = JOURNAL_HEADER.unpack(f.read(JOURNAL_HEADER.size))
+    if magic != JOURNAL_MAGIC:
+        raise ValueError("[ERR]: not a packet journal")
+    if version != JOURNAL_VERSION:
+        raise ValueError(f"[ERR]: unsupported journal version {version}")
+    return {'channels_count': channels_count, 'samples_per_packet': samples_per_packet, 'created': created}
+
+
+class JournalReader:
+    def __init__(self, path, load_index=True):
+        self.path = path
+        with open(path, "rb") as f:
+            self.header = read_journal_header(f)
+        self.channels_count = self.header['channels_count']
+        self.samples_per_packet = self.header['samples_per_packet']
+        try:
+            with open(path + ".json") as f:
+                self.info = json.load(f)
+        except FileNotFoundError:
+            self.info = {}
+        # index seřazený podle pořadí packetu (v souboru je v pořadí příjmu); load_index=False
+        # pro čtení přes vlastní (např. uložený) index - u velkých žurnálů šetří čas i paměť
+        self.index = None
+        if load_index:
+            index = np.fromfile(path + ".idx", dtype=INDEX_DTYPE)
+            self.index = index[np.argsort(index['order'], kind='stable')]
+        self._mm = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def offset_of(self, order):
+        i = np.searchsorted(self.index['order'], order)
+        if i == len(self.index) or self.index['order'][i] != order:
+            return None
+        return int(self.index['offset'][i])
+
+    def valid_index(self):
+        # seřazený index bez duplicit a bez packetů s chybou CRC (pořadí -1)
+        index = self.index[self.index['order'] >= 0]
+        _, first = np.unique(index['order'], return_index=True)
+        return index[first]
+
+    def read_packets(self, offsets, packet_size):
+        # packety na daných offsetech záznamů jako pole [packet, bajt], čte se přes memmap
+        if self._mm is None:
+            self._mm = np.memmap(self.path, dtype=np.uint8, mode='r')
+        rows = (np.asarray(offsets, dtype=np.int64) + RECORD_HEADER.size)[:, None] + np.arange(packet_size)
+        return self._mm[rows]
+
+    def records(self):
+        # (pořadí, čas příjmu, příznaky, packet) v pořadí příjmu
+        with open(self.path, "rb") as f:
+            f.seek(JOURNAL_HEADER.size)
+            while True:
+                head = f.read(RECORD_HEADER.size)
+                if len(head) < RECORD_HEADER.size:
+                    return
+                order, timestamp, flags, length = RECORD_HEADER.unpack(head)
+                packet = f.read(length)
+                if len(packet) < length:
+                    return  # useknutý poslední záznam (pád během zápisu)
+                yield order, timestamp, flags, packet
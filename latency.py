@@ -0,0 +1,164 @@
+import csv
+import json
+import time
+
+import numpy as np
+
+# ---------------------- Latence po fázích ----------------------
+# Cesta packetu od socketu na obrazovku rozdělená na fáze (s):
+#   socket  - příjem v kernelu (SO_TIMESTAMPNS, jinak probuzení relay) -> výběr dávky z relay
+#   reorder - výběr dávky -> výdej z okna pro řazení (držení MIN_BUFFER_SIZE packetů)
+#   decode  - výdej -> dekódovaná dávka
+#   lock    - čekání na buffer_lock (soupeření s GUI)
+#   append  - zápis do kruhového bufferu (včetně pyramidy a trigger capture)
+#   render  - zapsáno -> vykreslený snímek, který data obsahuje (měří GUI)
+#   total   - příjem v kernelu -> vykreslený snímek (nejnovější packet snímku)
+# socket a reorder se počítají pro každý packet, ostatní jednou za vydanou dávku nebo snímek.
+LATENCY_STAGES = ('socket', 'reorder', 'decode', 'lock', 'append', 'render', 'total')
+INGEST_STAGES = LATENCY_STAGES[:5]
+BIN_EDGES = np.logspace(-6, 1, 29)     # 1 us .. 10 s, 4 koše na dekádu; + koš pod a nad rozsahem
+BINS = len(BIN_EDGES) + 1
+ROLLING_SLOTS = 10                      # klouzavé okno = ROLLING_SLOTS * SLOT_SECONDS
+SLOT_SECONDS = 1.0
+APPEND_HISTORY = 64                     # posledních zápisů do bufferu pro měření render/total
+TRACK_SLOTS = 1024                      # sloty časů packetů podle pořadí (> okno pro řazení)
+
+
+# ---------------------- Klouzavé histogramy ----------------------
+# counts[fáze, slot, koš] - slot je sekunda modulo ROLLING_SLOTS, při prvním zápisu do nové sekundy se vynuluje.
+# Pole mohou ležet ve sdílené paměti (buffer=...): zapisuje ingest proces, GUI jen čte.
+# appends[i] = (celkem packetů v bufferu, čas zápisu, čas příjmu nejnovějšího packetu) posledních zápisů.
+class LatencyHistograms:
+    def __init__(self, buffer=None, readonly=False):
+        shapes = [('counts', (len(LATENCY_STAGES), ROLLING_SLOTS, BINS), np.int64),
+                  ('slot_ids', (len(LATENCY_STAGES), ROLLING_SLOTS), np.int64),
+                  ('appends', (APPEND_HISTORY, 3), np.float64),
+                  ('append_count', (1,), np.int64)]
+        offset = 0
+        for name, shape, dtype in shapes:
+            if buffer is None:
+                array = np.zeros(shape, dtype=dtype)
+            else:
+                array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+                if readonly:
+                    array.setflags(write=False)
+            offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+            setattr(self, name, array)
+
+    @staticmethod
+    def nbytes():
+        n = len(LATENCY_STAGES)
+        return 8 * (n * ROLLING_SLOTS * BINS + n * ROLLING_SLOTS + APPEND_HISTORY * 3 + 1)
+
+    def add(self, stage, seconds, now=None):
+        # seconds: jedna hodnota nebo pole hodnot
+        k = LATENCY_STAGES.index(stage)
+        slot_id = int((now or time.time()) // SLOT_SECONDS)
+        slot = slot_id % ROLLING_SLOTS
+        if self.slot_ids[k, slot] != slot_id:
+            self.counts[k, slot] = 0
+            self.slot_ids[k, slot] = slot_id
+        bins = np.searchsorted(BIN_EDGES, seconds)
+        if np.ndim(bins):
+            self.counts[k, slot] += np.bincount(bins, minlength=BINS)
+        else:
+            self.counts[k, slot, bins] += 1
+
+    def record_append(self, total_packets, t_append, t_received):
+        i = int(self.append_count[0]) % APPEND_HISTORY
+        self.appends[i] = (total_packets, t_append, t_received)
+        self.append_count[0] += 1
+
+    def append_for_frame(self, frame_packets):
+        # nejnovější zápis, jehož data už snímek s frame_packets packety obsahuje; (packetů, čas zápisu, čas příjmu)
+        appends = self.appends[:min(int(self.append_count[0]), APPEND_HISTORY)]
+        done = appends[(appends[:, 0] > 0) & (appends[:, 0] <= frame_packets)]
+        if not len(done):
+            return None
+        return tuple(done[np.argmax(done[:, 0])])
+
+    def histogram(self, stage, now=None):
+        k = LATENCY_STAGES.index(stage)
+        current = int((now or time.time()) // SLOT_SECONDS)
+        valid = self.slot_ids[k] > current - ROLLING_SLOTS
+        return self.counts[k][valid].sum(axis=0)
+
+    def clear(self):
+        self.counts[...] = 0
+        self.slot_ids[...] = 0
+
+
+def percentile(counts, q):
+    # horní hrana koše, ve kterém leží q-tý percentil (s); None pro prázdný histogram
+    total = counts.sum()
+    if not total:
+        return None
+    i = int(np.searchsorted(np.cumsum(counts), total * q / 100))
+    return float(BIN_EDGES[min(i, len(BIN_EDGES) - 1)])
+
+
+def summarize(histograms, now=None):
+    # {fáze: {'count', 'p50', 'p99', 'max', 'counts'}}; histograms = {fáze: LatencyHistograms}
+    now = now or time.time()
+    out = {}
+    for stage in LATENCY_STAGES:
+        counts = histograms[stage].histogram(stage, now)
+        nonzero = np.nonzero(counts)[0]
+        out[stage] = {'count': int(counts.sum()), 'p50': percentile(counts, 50), 'p99': percentile(counts, 99),
+                      'max': float(BIN_EDGES[min(nonzero[-1], len(BIN_EDGES) - 1)]) if len(nonzero) else None,
+                      'counts': counts.tolist()}
+    return out
+
+
+def export_summary(path, summary):
+    # .csv: řádek na fázi a koš; jinak JSON s hranami košů
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(['stage', 'bin_upper_s', 'count'])
+            for stage, s in summary.items():
+                for edge, count in zip(list(BIN_EDGES) + [float('inf')], s['counts']):
+                    writer.writerow([stage, edge, count])
+    else:
+        with open(path, "w") as f:
+            json.dump({'date': time.strftime("%Y-%m-%dT%H:%M:%S"), 'window_s': ROLLING_SLOTS * SLOT_SECONDS,
+                       'bin_edges_s': BIN_EDGES.tolist(), 'stages': summary}, f, indent=1)
+
+
+# ---------------------- Měření v IngestPipeline ----------------------
+# Časy příjmu a výběru z relay se ukládají podle pořadí packetu (slot = pořadí & maska), při výdeji
+# z okna pro řazení se z nich spočítá socket a reorder pro každý packet vydané dávky.
+class LatencyTracker:
+    def __init__(self, histograms=None):
+        self.histograms = histograms if histograms is not None else LatencyHistograms()
+        self.received_at = np.zeros(TRACK_SLOTS)
+        self.dequeued_at = np.zeros(TRACK_SLOTS)
+        self.mask = TRACK_SLOTS - 1
+        self.t_dequeue = 0.0
+        self.t_flush = 0.0
+        self.t_newest = 0.0
+
+    def dequeued(self, now):
+        # dávka vybraná z relay
+        self.t_dequeue = now
+
+    def received(self, order, timestamp):
+        i = order & self.mask
+        self.received_at[i] = timestamp or self.t_dequeue
+        self.dequeued_at[i] = self.t_dequeue
+
+    def flushed(self, orders, now):
+        i = np.asarray(orders, dtype=np.int64) & self.mask
+        received, dequeued = self.received_at[i], self.dequeued_at[i]
+        h = self.histograms
+        h.add('socket', dequeued - received, now)
+        h.add('reorder', now - dequeued, now)
+        self.t_flush = now
+        self.t_newest = float(received.max())
+
+    def appended(self, t_decoded, t_locked, t_appended, total_packets):
+        h = self.histograms
+        h.add('decode', t_decoded - self.t_flush, t_appended)
+        h.add('lock', t_locked - t_decoded, t_appended)
+        h.add('append', t_appended - t_locked, t_appended)
+        h.record_append(total_packets, t_appended, self.t_newest)
@@ -0,0 +1,43 @@
+import numpy as np
+
+from protocol import SAMPLES_PER_PACKET
+
+
+# ---------------------- Datový packet ----------------------
+# 2B typ + 2B pořadí, pak SAMPLES_PER_PACKET vzorků int16 pro každý kanál,
+# 1B počet chybných vzorků pro každý kanál a padding při lichém počtu kanálů (CRC už je odříznuté)
+def data_packet_dtype(channels_count, samples_per_packet=SAMPLES_PER_PACKET):
+    fields = [
+        ('packet_type', '<u2'),
+        ('order', '<u2'),
+        ('samples', '<i2', (channels_count, samples_per_packet)),
+        ('errors', 'u1', (channels_count,)),
+    ]
+    if channels_count % 2 != 0:
+        fields.append(('padding', 'u1'))
+    return np.dtype(fields)
+
+
+class DataPacketDecoder:
+    def __init__(self, channels_count, samples_per_packet=SAMPLES_PER_PACKET):
+        self.channels_count = channels_count
+        self.samples_per_packet = samples_per_packet
+        self.dtype = data_packet_dtype(channels_count, samples_per_packet)
+        self.packet_size = self.dtype.itemsize
+
+    def decode(self, packets):
+        # packets: seznam dat datových packetů bez CRC (výstup verify_crc)
+        # vrací (orders[N], samples[kanál, N*vzorků], errors[kanál, N])
+        raw = b''.join(packets)
+        if len(raw) != len(packets) * self.packet_size:
+            raise ValueError(f"[ERR]: data packet size mismatch, expected {self.packet_size} B per packet for {self.channels_count} channels")
+        return self.decode_buffer(raw)
+
+    def decode_buffer(self, raw):
+        records = np.frombuffer(raw, dtype=self.dtype)
+        n = len(records)
+        orders = records['order']
+        # (N, kanál, vzorek) -> (kanál, N*vzorek), jediná kopie dat
+        samples = records['samples'].transpose(1, 0, 2).reshape(self.channels_count, n * self.samples_per_packet)
+        errors = records['errors'].T
+        return orders, samples, errors
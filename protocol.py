@@ -0,0 +1,134 @@
+import socket
+import struct
+
+from crc16 import verify_crc
+
+# ---------------------- Protokol zařízení ----------------------
+SAMPLES_PER_PACKET = 200
+PACKET_RATE_HZ = 1000     # 1 paket/ms (1000 za s)
+MAX_ORDER = 65536         # pořadí packetu je 16bitové
+
+# ---------------------- CMD a packety -------------------
+ACK_packet = 0
+ID_packet = 1
+DATA_packet = 2
+TRIGGER_packet = 3
+
+#CMD
+PING = 0
+GET_ID = 1
+REGISTER_RECEIVER = 2
+REMOVE_RECEIVER = 3
+GET_RECEIVERS =	4
+START_SAMPLING = 5
+START_ON_TRIGGER = 6
+STOP_SAMPLING = 7
+TRIGGER_ACK = 8
+FORSE_TRIGGER =	9
+
+# ---------------------- Get ID ----------------------
+ID_HEADER_STRUCT = struct.Struct('<HHHBBI3I HBB I HBB 8s 30s H')
+
+def parse_id_packet(data):
+    if len(data) < ID_HEADER_STRUCT.size:
+        raise ValueError("[ERR]: ID packet is short")
+    unpacked = ID_HEADER_STRUCT.unpack(data[:ID_HEADER_STRUCT.size])
+    return {
+        'packet_type': unpacked[0],
+        'state': unpacked[1],
+        'hw_id': unpacked[2],
+        'hw_ver_major': unpacked[3],
+        'hw_ver_minor': unpacked[4],
+        'mcu_serial': unpacked[5],
+        'cpu_uid': (unpacked[6], unpacked[7], unpacked[8]),
+        'adc_hw_id': unpacked[9],
+        'adc_ver_major': unpacked[10],
+        'adc_ver_minor': unpacked[11],
+        'adc_serial': unpacked[12],
+        'fw_id': unpacked[13],
+        'fw_ver_major': unpacked[14],
+        'fw_ver_minor': unpacked[15],
+        'fw_config': unpacked[16].decode('ascii').rstrip('\x00'),
+        'build_time': unpacked[17].decode('ascii').rstrip('\x00'),
+        'channels_count': unpacked[18],
+        'channels': parse_channel_records(data[ID_HEADER_STRUCT.size:], unpacked[18]),
+    }
+
+
+# Za hlavičkou ID packetu je pro každý kanál jednotka (4 B), offset a zisk (float32)
+CHANNEL_STRUCT = struct.Struct('<4sff')
+
+def parse_channel_records(data, channels_count):
+    # hodnota = vzorek * gain + offset; chybí-li záznamy (starší firmware), bez převodu
+    channels = []
+    for i in range(channels_count):
+        if len(data) >= (i + 1) * CHANNEL_STRUCT.size:
+            unit, offset, gain = CHANNEL_STRUCT.unpack_from(data, i * CHANNEL_STRUCT.size)
+            unit = unit.split(b'\x00', 1)[0].decode('ascii', 'replace')
+        else:
+            unit, offset, gain = "", 0.0, 1.0
+        channels.append({'unit': unit, 'offset': offset, 'gain': gain})
+    return channels
+
+
+# ---------------------- Odpovědi na příkazy ----------------------
+STOP_ACK_STRUCT = struct.Struct('<HHIQ')   # typ, chyba, CMD, počet odeslaných packetů
+
+def parse_stop_ack(resp):
+    # vrací počet packetů odeslaných zařízením, nebo None pro neplatné ACK
+    if not resp or len(resp) < STOP_ACK_STRUCT.size:
+        return None
+    packet_type, error_state, cmd_type, packets_sent = STOP_ACK_STRUCT.unpack_from(resp)
+    if packet_type != ACK_packet or cmd_type != STOP_SAMPLING:
+        return None
+    return packets_sent
+
+
+# ---------------------- Příkazy zařízení ----------------------
+# Bez Qt - používá ho GUI (SignalClient) i headless recorder. relay je UDPRelay příkazového portu.
+class CommandClient:
+    def __init__(self, relay, device_addr, response_timeout=0.3):
+        self.relay = relay
+        self.device_addr = device_addr      # (ip, port) příkazového portu zařízení
+        self.response_timeout = response_timeout
+
+    def send(self, cmd: int, data: bytes = b'', expect_response: bool = False, expected_packets: int = 1):
+        pkt = struct.pack('<I', cmd) + data
+        self.relay.sendto(pkt, self.device_addr)
+
+        if not expect_response:
+            return None
+
+        responses = []
+        self.relay.settimeout(self.response_timeout)
+        try:
+            for _ in range(expected_packets):
+                resp, _ = self.relay.recvfrom(1024)
+                responses.append(resp)
+        except socket.timeout:
+            if not responses:
+                print(f"[TIMEOUT] CMD {cmd}: no response")
+            else:
+                print(f"[INFO] CMD {cmd}: received {len(responses)} / {expected_packets} packets")
+        return responses if expected_packets > 1 else (responses[0] if responses else None)
+
+    def get_id(self):
+        resp = self.send(GET_ID, expect_response=True)
+        if not resp:
+            raise RuntimeError("Get ID: no response")
+        data = verify_crc(resp)
+        if not data:
+            raise RuntimeError("Get ID: CRC failed")
+        return parse_id_packet(data)
+
+    def register_receiver(self, addr, port):
+        data = socket.inet_aton(addr) + struct.pack('<H', int(port))
+        return self.send(REGISTER_RECEIVER, data, expect_response=True)
+
+    def start_sampling(self, num_packets=0, on_trigger=False):
+        cmd = START_ON_TRIGGER if on_trigger else START_SAMPLING
+        return self.send(cmd, struct.pack('<I', num_packets), expect_response=True)
+
+    def stop_sampling(self):
+        # vrací počet packetů odeslaných zařízením (None bez platného ACK)
+        return parse_stop_ack(self.send(STOP_SAMPLING, expect_response=True))
@@ -0,0 +1,179 @@
+import time
+_T_START = time.perf_counter()
+
+import argparse
+import json
+import socket
+import sys
+
+import numpy as np
+
+from protocol import SAMPLES_PER_PACKET, PACKET_RATE_HZ, CommandClient
+from buffered_socket import UDPRelay, detect_local_ip
+from ingest import IngestPipeline
+from journal import JournalWriter, next_free_path
+
+_IMPORT_TIME = time.perf_counter() - _T_START
+
+UDP_DEVICE = "127.0.0.1:10578"
+UDP_PORT_RECV = 10579     # příkazový port (ACK)
+UDP_PORT_DATA = 10577     # port pro příjem dat
+UDP_RCVBUF = 8 * 1024 * 1024
+STATS_INTERVAL = 1.0      # s
+WRITE_BUFFER = 1 << 20    # B, buffer souboru se vzorky
+
+
+# ---------------------- Zápis vzorků na disk ----------------------
+# Má stejné rozhraní jako SignalRingBuffer (channels_count, append), takže ho IngestPipeline
+# plní místo kruhového bufferu. Soubor .i16 obsahuje int16 vzorky prokládaně po kanálech
+# (vzorek 0 všech kanálů, vzorek 1 všech kanálů, ...), chybějící packety jsou doplněné nulami.
+# Popis formátu a statistiky se zapíší do .json vedle něj.
+class SampleFileWriter:
+    def __init__(self, path, channels_count, samples_per_packet=SAMPLES_PER_PACKET, info=None):
+        self.path = path
+        self.channels_count = channels_count
+        self.samples_per_packet = samples_per_packet
+        self.info = info or {}
+        self.file = open(path + ".i16", "wb", buffering=WRITE_BUFFER)
+        self.first_sample_index = None
+        self.next_index = None
+        self.samples_written = 0
+        self.gap_samples = 0
+        self.error_samples = np.zeros(channels_count, dtype=np.int64)
+
+    def append(self, first_index, samples, errors):
+        spp = self.samples_per_packet
+        if self.next_index is None:
+            self.first_sample_index = self.next_index = int(first_index[0])
+        offsets = first_index - self.next_index
+        span = int(offsets[-1]) + spp
+        frames = samples.T      # (vzorky, kanály)
+        if span != frames.shape[0]:
+            # chybějící packety doplníme nulami, soubor zůstane spojitý v čase
+            out = np.zeros((span, self.channels_count), dtype=samples.dtype)
+            out[(offsets[:, None] + np.arange(spp)).ravel()] = frames
+            self.gap_samples += span - frames.shape[0]
+            frames = out
+        self.file.write(np.ascontiguousarray(frames).data)
+        self.next_index += span
+        self.samples_written += span
+        self.error_samples += errors.sum(axis=1, dtype=np.int64)
+
+    def close(self):
+        self.file.close()
+        meta = dict(self.info)
+        meta.update({
+            'format': 'int16 little-endian, interleaved channels',
+            'channels_count': self.channels_count,
+            'sample_rate': SAMPLES_PER_PACKET * PACKET_RATE_HZ,
+            'first_sample_index': self.first_sample_index,
+            'samples_per_channel': self.samples_written,
+            'gap_samples': self.gap_samples,
+            'error_samples': self.error_samples.tolist(),
+        })
+        with open(self.path + ".json", "w") as f:
+            json.dump(meta, f, indent=2)
+
+
+# ---------------------- Nahrávání bez GUI ----------------------
+def record(args):
+    device_ip, device_port = args.device.split(':', 1)
+    device_port = int(device_port)
+    use_my_ip = not args.listen_all
+
+    cmd_relay = UDPRelay(ring_slots=64)
+    cmd_relay.bind(port=args.cmd_port, use_my_ip=use_my_ip, device_ip=device_ip, device_port=device_port)
+    commands = CommandClient(cmd_relay, (device_ip, device_port))
+
+    ident = commands.get_id()
+    channels_count = ident['channels_count']
+    print(f"[OK] Firmware v{ident['fw_ver_major']}.{ident['fw_ver_minor']}, build {ident['build_time']}, "
+          f"{channels_count} channels")
+
+    writer = SampleFileWriter(args.out, channels_count, info={'device': args.device, 'id': ident})
+    data_relay = UDPRelay(batch_mode=True, rcvbuf=args.rcvbuf)
+    data_relay.bind(port=args.data_port, use_my_ip=use_my_ip, device_ip=device_ip, device_port=device_port)
+    data_relay.settimeout(0.2)
+    pipeline = IngestPipeline(channels_count, writer)
+    if args.journal:
+        pipeline.journal = JournalWriter(next_free_path(args.journal), channels_count, info=ident)
+        print(f"[OK] Packet journal {pipeline.journal.path}")
+
+    receiver = args.receiver or f"{detect_local_ip(device_ip, device_port)}:{args.data_port}"
+    addr, port = receiver.split(':', 1)
+    if not commands.register_receiver(addr, int(port)):
+        print("[WARN] Register receiver: no response")
+    commands.start_sampling(args.packets)
+    print(f"[OK] Recording to {args.out}.i16, receiver {receiver}, "
+          f"{args.packets or 'unlimited'} packets, {args.duration or 'unlimited'} s")
+
+    t0 = time.perf_counter()
+    last_t, last_received = t0, 0
+    try:
+        while True:
+            try:
+                pipeline.process_batch(data_relay.recv_batch())
+            except socket.timeout:
+                pass
+            now = time.perf_counter()
+            if now - last_t >= args.stats_interval:
+                print_stats(now - t0, pipeline, data_relay, writer,
+                            (pipeline.received_packets - last_received) / (now - last_t))
+                last_t, last_received = now, pipeline.received_packets
+            if args.packets and pipeline.received_packets >= args.packets:
+                break
+            if args.duration and now - t0 >= args.duration:
+                break
+    except KeyboardInterrupt:
+        pass
+
+    packets_sent = commands.stop_sampling()
+    # packety odeslané před potvrzením stopu ještě dočteme
+    try:
+        while True:
+            pipeline.process_batch(data_relay.recv_batch())
+    except socket.timeout:
+        pass
+    pipeline.flush_packet_buffer()
+    elapsed = time.perf_counter() - t0
+    print_stats(elapsed, pipeline, data_relay, writer, pipeline.received_packets / elapsed)
+    if packets_sent is not None and packets_sent != pipeline.received_packets:
+        print(f"[WARN] packet from device ({packets_sent}) not equal to recv packets ({pipeline.received_packets})")
+    gaps = pipeline.gap_histogram()
+    if gaps:
+        print("[INFO] Lost packet gaps (length: count): " + ", ".join(f"{n}: {c}" for n, c in gaps.items()))
+
+    writer.close()
+    if pipeline.journal is not None:
+        print(pipeline.journal.close())
+    data_relay.close()
+    cmd_relay.close()
+
+
+def print_stats(elapsed, pipeline, relay, writer, rate):
+    kernel_drops = relay.get_kernel_drops()
+    print(f"{elapsed:8.1f} s: recv {pipeline.received_packets:9} ({rate:7.0f} packets/s, "
+          f"{rate * SAMPLES_PER_PACKET * 2 * writer.channels_count / 1e6:5.2f} MB/s), "
+          f"lost {pipeline.lost_packets_counter}, crc {pipeline.crc_error_counter}, "
+          f"overflow {relay.get_overflow_count()}, kernel drops {'-' if kernel_drops is None else kernel_drops}, "
+          f"written {writer.samples_written} samples/ch")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless recorder - příjem dat bez GUI a zápis na disk")
+    parser.add_argument('--device', default=UDP_DEVICE, help="IP:port příkazového portu zařízení")
+    parser.add_argument('--cmd-port', type=int, default=UDP_PORT_RECV, help="lokální port pro ACK")
+    parser.add_argument('--data-port', type=int, default=UDP_PORT_DATA, help="lokální port pro data")
+    parser.add_argument('--receiver', help="IP:port registrovaný v zařízení (výchozí vlastní IP a data port)")
+    parser.add_argument('--listen-all', action='store_true', help="poslouchat na 0.0.0.0")
+    parser.add_argument('--packets', type=int, default=0, help="počet packetů (0 = do zastavení)")
+    parser.add_argument('--duration', type=float, default=0, help="délka nahrávání v s (0 = do Ctrl+C)")
+    parser.add_argument('--out', default="capture", help="cesta výstupu bez přípony (.i16 + .json)")
+    parser.add_argument('--journal', help="navíc žurnál přijatých packetů, jméno dostane další volný index (capture.pkj -> capture_001.pkj)")
+    parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL, help="perioda výpisu statistik v s")
+    parser.add_argument('--rcvbuf', type=int, default=UDP_RCVBUF, help="SO_RCVBUF datového socketu")
+    args = parser.parse_args()
+
+    print(f"[INFO] startup: imports {_IMPORT_TIME * 1000:.0f} ms, {len(sys.modules)} modules loaded, "
+          f"Qt loaded: {'PyQt5' in sys.modules}")
+    record(args)
@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from protocol import SAMPLES_PER_PACKET, PACKET_RATE_HZ
+from packet_decoder import DataPacketDecoder
+from journal import JournalReader, INDEX_DTYPE, JOURNAL_EXT
+from decimation import bucket_for, reduce_envelope
+
+# ---------------------- Min/max LOD index ----------------------
+# Vedlejší adresář name.lod/ vedle záznamu:
+#   level_BBBBBBBB.npy   [2, kanál, koš] int16 - min a max každého koše o BBBBBBBB vzorcích
+#   packets.npy          (jen u žurnálu) seřazený index platných packetů (pořadí, offset) - bez řazení při otevření
+#   lod.json             velikost a čas změny zdroje; při nesouhlasu se index postaví znovu
+# Úrovně mají koše LOD_BASE, LOD_BASE*LOD_STEP, ... dokud nejhrubší nemá méně než LOD_MIN_BUCKETS košů.
+# Index zabírá ~1/30 velikosti dat (LOD_BASE=64), staví se jednou v blocích po BUILD_BLOCK vzorcích.
+# Stavba čte celý záznam (u desítek GB minuty) - s background=True běží ve vlákně a do jejího dokončení
+# view() vrací jen navzorkované body (jeden vzorek na koš), aby se záznam dal prohlížet hned.
+LOD_BASE = 64
+LOD_STEP = 8
+LOD_MIN_BUCKETS = 4096
+LOD_EXT = ".lod"
+LOD_VERSION = 1
+BUILD_BLOCK = 1 << 20       # vzorků na kanál v jednom bloku při stavbě (4 kanály = 8 MB)
+
+
+# ---------------------- Zdroje dat ----------------------
+# Oba zdroje adresují vzorky pozicí v proudu (0 .. length) - stejně jako kruhový buffer;
+# x_at() převádí pozici na absolutní index vzorku (osa x), position_of_x() naopak.
+class SampleFileSource:
+    # výstup recorder.py: .i16 (int16 prokládaně po kanálech, mezery doplněné nulami) + .json
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.splitext(path)[0] + ".json") as f:
+            meta = json.load(f)
+        self.channels_count = meta['channels_count']
+        self.sample_rate = meta.get('sample_rate', SAMPLES_PER_PACKET * PACKET_RATE_HZ)
+        self.info = meta.get('id') or {}
+        self.first_sample_index = meta.get('first_sample_index') or 0
+        if os.path.getsize(path) == 0:
+            raise ValueError(f"[ERR]: empty recording {path}")
+        self.length = os.path.getsize(path) // (2 * self.channels_count)
+        self._frames = None
+
+    def read(self, start, stop):
+        # samples[kanál, n] pro pozice [start, stop)
+        if self._frames is None:
+            self._frames = np.memmap(self.path, dtype='<i2', mode='r', shape=(self.length, self.channels_count))
+        return np.ascontiguousarray(self._frames[start:stop].T)
+
+    def sample_at(self, positions):
+        # samples[kanál, n] jednotlivých pozic (náhled bez LOD indexu)
+        if self._frames is None:
+            self._frames = np.memmap(self.path, dtype='<i2', mode='r', shape=(self.length, self.channels_count))
+        return np.ascontiguousarray(self._frames[np.asarray(positions, dtype=np.int64)].T)
+
+    def x_at(self, positions):
+        return self.first_sample_index + np.asarray(positions, dtype=np.int64)
+
+    def position_of_x(self, x):
+        return int(min(self.length, max(0, int(x) - self.first_sample_index)))
+
+    def release(self):
+        # zahodí mapování souboru; načtené stránky se tím uvolní z paměti procesu
+        self._frames = None
+
+    def close(self):
+        self.release()
+
+
+class JournalSource:
+    # žurnál .pkj; čtou se jen platné packety (bez duplicit a chyb CRC) seřazené podle pořadí, mezery v ose x
+    def __init__(self, path, packets=None):
+        self.path = path
+        self.reader = JournalReader(path, load_index=packets is None)
+        self.channels_count = self.reader.channels_count
+        self.samples_per_packet = self.reader.samples_per_packet
+        self.info = self.reader.info
+        self.sample_rate = self.samples_per_packet * PACKET_RATE_HZ
+        self.decoder = DataPacketDecoder(self.channels_count, self.samples_per_packet)
+        self.packet_size = self.decoder.packet_size + 2     # v žurnálu je packet i s CRC
+        self.packets = self.reader.valid_index() if packets is None else packets
+        self.reader.index = None
+        self.packet_x = self.packets['order'] * self.samples_per_packet
+        self.length = len(self.packets) * self.samples_per_packet
+
+    def read(self, start, stop):
+        spp = self.samples_per_packet
+        first, last = start // spp, -(-stop // spp)
+        raw = self.reader.read_packets(self.packets['offset'][first:last], self.packet_size)
+        _, samples, _ = self.decoder.decode_buffer(np.ascontiguousarray(raw[:, :-2]))
+        offset = start - first * spp
+        return samples[:, offset:offset + stop - start]
+
+    def sample_at(self, positions):
+        # samples[kanál, n] jednotlivých pozic - čte se jen jeden packet na pozici
+        positions = np.asarray(positions, dtype=np.int64)
+        spp = self.samples_per_packet
+        raw = self.reader.read_packets(self.packets['offset'][positions // spp], self.packet_size)
+        _, samples, _ = self.decoder.decode_buffer(np.ascontiguousarray(raw[:, :-2]))
+        return samples[:, np.arange(len(positions)) * spp + positions % spp]
+
+    def x_at(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        spp = self.samples_per_packet
+        return self.packet_x[positions // spp] + positions % spp
+
+    def position_of_x(self, x):
+        # první pozice s indexem vzorku >= x
+        spp = self.samples_per_packet
+        i = int(np.searchsorted(self.packet_x + spp, x, side='right'))
+        if i >= len(self.packet_x):
+            return self.length
+        return i * spp + int(min(spp, max(0, int(x) - int(self.packet_x[i]))))
+
+    def release(self):
+        self.reader._mm = None
+
+    def close(self):
+        self.release()
+        self.packets = self.packet_x = None
+
+
+# ---------------------- Otevření záznamu ----------------------
+class Recording:
+    def __init__(self, path, lod_dir=None, log=print, background=False):
+        self.path = path
+        self.log = log
+        self.lod_dir = lod_dir or path + LOD_EXT
+        self.levels = {}        # velikost koše -> memmap [2, kanál, koš]
+        self.source = None
+        self.ready = True       # LOD index je k dispozici (při stavbě na pozadí False)
+        self.progress = 1.0     # podíl záznamu zpracovaný stavbou indexu
+        self.build_thread = None
+        self._stop = threading.Event()
+        cached = self._load_meta()
+        is_journal = path.endswith(JOURNAL_EXT)
+        if cached:
+            packets = np.load(os.path.join(self.lod_dir, "packets.npy"), mmap_mode='r') if is_journal else None
+            self.source = JournalSource(path, packets) if is_journal else SampleFileSource(path)
+            for bucket in cached['levels']:
+                self.levels[bucket] = np.load(self._level_path(bucket), mmap_mode='r')
+        else:
+            self.source = JournalSource(path) if is_journal else SampleFileSource(path)
+            if background:
+                # stavba čte přes vlastní zdroj (vlastní memmap), self.source zůstává pro view()
+                self.ready = False
+                self.progress = 0.0
+                builder = JournalSource(path, self.source.packets) if is_journal else SampleFileSource(path)
+                self.build_thread = threading.Thread(target=self.build, args=(builder,), name="lod-build", daemon=True)
+                self.build_thread.start()
+            else:
+                self.build()
+        self.channels_count = self.source.channels_count
+        self.length = self.source.length
+        self.info = self.source.info
+        self.sample_rate = self.source.sample_rate
+
+    def _stamp(self):
+        st = os.stat(self.path)
+        return {'version': LOD_VERSION, 'size': st.st_size, 'mtime': st.st_mtime,
+                'lod_base': LOD_BASE, 'lod_step': LOD_STEP}
+
+    def _load_meta(self):
+        try:
+            with open(os.path.join(self.lod_dir, "lod.json")) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        stamp = self._stamp()
+        return meta if all(meta.get(k) == v for k, v in stamp.items()) else None
+
+    def _level_path(self, bucket):
+        return os.path.join(self.lod_dir, f"level_{bucket:08d}.npy")
+
+    def build(self, src=None):
+        # jeden průchod daty pro nejjemnější úroveň, každá další se počítá z předchozí;
+        # úrovně se zveřejní najednou až na konci (view() při stavbě na pozadí nevidí rozpracované)
+        t0 = time.perf_counter()
+        src = src or self.source
+        ch, length = src.channels_count, src.length
+        os.makedirs(self.lod_dir, exist_ok=True)
+        if isinstance(src, JournalSource):
+            np.save(os.path.join(self.lod_dir, "packets.npy"), np.asarray(src.packets, dtype=INDEX_DTYPE))
+
+        buckets = [LOD_BASE]
+        while -(-length // buckets[-1]) >= LOD_MIN_BUCKETS * LOD_STEP:
+            buckets.append(buckets[-1] * LOD_STEP)
+
+        levels = {}
+        prev = None
+        for bucket in buckets:
+            n = -(-length // bucket)
+            level = np.lib.format.open_memmap(self._level_path(bucket), mode='w+', dtype=np.int16, shape=(2, ch, n))
+            if prev is None:
+                block = BUILD_BLOCK // bucket * bucket
+                for start in range(0, length, block):
+                    if self._stop.is_set():
+                        return self._abort_build(src)
+                    samples = src.read(start, min(length, start + block))
+                    lo, hi = reduce_envelope(samples, samples, bucket)
+                    k = start // bucket
+                    level[0, :, k:k + lo.shape[1]] = lo
+                    level[1, :, k:k + hi.shape[1]] = hi
+                    src.release()   # paměť zůstane omezená i u záznamu většího než RAM
+                    self.progress = min(length, start + block) / length
+            else:
+                block = BUILD_BLOCK // LOD_STEP * LOD_STEP
+                for start in range(0, prev.shape[2], block):
+                    lo, hi = reduce_envelope(prev[0, :, start:start + block], prev[1, :, start:start + block], LOD_STEP)
+                    k = start // LOD_STEP
+                    level[0, :, k:k + lo.shape[1]] = lo
+                    level[1, :, k:k + hi.shape[1]] = hi
+            level.flush()
+            prev = levels[bucket] = np.load(self._level_path(bucket), mmap_mode='r')
+
+        stamp = self._stamp()
+        stamp['levels'] = buckets
+        with open(os.path.join(self.lod_dir, "lod.json"), "w") as f:
+            json.dump(stamp, f, indent=1)
+        if src is not self.source:
+            src.close()
+        self.levels = levels
+        self.ready = True
+        dt = time.perf_counter() - t0
+        self.log(f"[OK] LOD index for {self.path}: {len(buckets)} levels ({', '.join(map(str, buckets))}), "
+                 f"{length} samples/ch in {dt:.2f} s ({length * ch * 2 / 1e6 / max(dt, 1e-9):.0f} MB/s)")
+
+    def _abort_build(self, src):
+        # close() během stavby - bez lod.json se index při dalším otevření postaví znovu
+        if src is not self.source:
+            src.close()
+        self.log(f"[INFO] LOD index for {self.path} not finished ({self.progress:.0%})")
+
+    def view(self, x_min, x_max, width_px):
+        # (x[n], y[kanál, n], bucket) pro rozsah osy x; čte se úměrně šířce v pixelech, ne délce rozsahu.
+        # bucket == 1: surové vzorky, jinak x a y z interleave_envelope (2 body na koš);
+        # než je index postavený (ready False), jen jeden vzorek na koš.
+        src = self.source
+        start = max(0, src.position_of_x(x_min) - 1)
+        stop = min(self.length, src.position_of_x(x_max) + 1)
+        if stop <= start:
+            return np.zeros(0, dtype=np.int64), np.zeros((self.channels_count, 0), dtype=np.int16), 1
+        bucket = bucket_for(stop - start, width_px)
+        if bucket > 1 and not self.ready:
+            positions = np.arange(start, stop, bucket, dtype=np.int64)
+            return src.x_at(positions), src.sample_at(positions), bucket
+        levels = [b for b in self.levels if b <= bucket]
+        if bucket == 1 or not levels:
+            return src.x_at(np.arange(start, stop)), src.read(start, stop), 1
+        level_bucket = max(levels)
+        level = self.levels[level_bucket]
+        first, last = start // bucket * bucket // level_bucket, -(-stop // bucket) * bucket // level_bucket
+        lo, hi = level[0, :, first:last], level[1, :, first:last]
+        if bucket > level_bucket:
+            lo, hi = reduce_envelope(lo, hi, bucket // level_bucket)
+        x = src.x_at(np.minimum(np.arange(lo.shape[1], dtype=np.int64) * bucket + first * level_bucket,
+                                self.length - 1))
+        y = np.empty((self.channels_count, 2 * lo.shape[1]), dtype=lo.dtype)
+        y[:, 0::2] = lo
+        y[:, 1::2] = hi
+        return np.repeat(x, 2), y, bucket
+
+    def x_limits(self):
+        return int(self.source.x_at(0)), int(self.source.x_at(self.length - 1))
+
+    def close(self):
+        self._stop.set()
+        if self.build_thread:
+            self.build_thread.join()
+        self.levels = {}
+        self.source.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Postavení min/max LOD indexu záznamu (.pkj nebo .i16)")
+    parser.add_argument('path', help="žurnál .pkj nebo výstup recorder.py .i16")
+    parser.add_argument('--bench', type=int, default=0, metavar="N", help="N náhodných pohledů, vypíše čas")
+    args = parser.parse_args()
+    t = time.perf_counter()
+    rec = Recording(args.path)
+    print(f"opened in {(time.perf_counter() - t) * 1000:.1f} ms: {rec.channels_count} channels, "
+          f"{rec.length} samples/ch, levels {', '.join(map(str, rec.levels))}")
+    if args.bench:
+        rng = np.random.default_rng(0)
+        lo, hi = rec.x_limits()
+        t = time.perf_counter()
+        for _ in range(args.bench):
+            a, b = np.sort(rng.integers(lo, hi, 2))
+            rec.view(a, b, 2000)
+        print(f"view: {(time.perf_counter() - t) / args.bench * 1000:.2f} ms per frame (2000 px)")
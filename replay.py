@@ -0,0 +1,135 @@
+import argparse
+import threading
+import time
+
+from buffered_socket import UDPRelay, BATCH_SIZE, RING_SLOTS, SLOT_SIZE, OVERFLOW_BLOCK
+from journal import JournalReader, FLAG_CRC_ERROR
+
+REPLAY_AS_FAST_AS_POSSIBLE = 0
+
+
+# ---------------------- Přehrávání žurnálu ----------------------
+# Stejné rozhraní jako UDPRelay (bind/recv_batch/recvfrom/...), packety ale místo socketu čte ze žurnálu
+# v původním pořadí příjmu - včetně přeházení, mezer a packetů s chybou CRC. speed=1 reálný čas,
+# N = N× rychleji, 0 = co nejrychleji. Plný kruh přehrávání pozdrží (nic se nezahazuje), takže
+# výsledek zpracování je pro stejný žurnál vždy stejný.
+class ReplayRelay(UDPRelay):
+    def __init__(self, journal_path, speed=1.0, batch_mode: bool = True, batch_size: int = BATCH_SIZE,
+                 ring_slots: int = RING_SLOTS, slot_size: int = SLOT_SIZE, rcvbuf: int = None):
+        super().__init__(batch_mode, batch_size, ring_slots, slot_size, OVERFLOW_BLOCK, rcvbuf)
+        self.reader = JournalReader(journal_path)
+        self.speed = speed
+        self.finished = threading.Event()
+        self.replayed_packets = 0
+
+    def bind(self, port: int = 0, use_my_ip: bool = False, device_ip: str = "192.168.1.100", device_port: int = "9999"):
+        # žádný socket, přehrávání začne hned
+        self.stop()
+        self.start()
+
+    def start(self):
+        self.running = True
+        if self.listener_thread is None or not self.listener_thread.is_alive():
+            self.finished.clear()
+            self.listener_thread = threading.Thread(target=self.listen_loop, name="replay", daemon=True)
+            self.listener_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.listener_thread and self.listener_thread.is_alive():
+            self.listener_thread.join(timeout=2)
+
+    def listen_loop(self):
+        ring = self.receive_buffer
+        slots, lengths, addrs, timestamps, mask = ring.slots, ring.lengths, ring.addrs, ring.timestamps, ring.mask
+        speed = self.speed
+        t_start = t0 = None
+        for order, timestamp, flags, packet in self.reader.records():
+            if not self.running:
+                break
+            if speed:
+                now = time.perf_counter()
+                if t_start is None:
+                    t_start, t0 = now, timestamp
+                delay = t_start + (timestamp - t0) / speed - now
+                if delay > 0:
+                    time.sleep(delay)
+            while ring.head - ring.tail >= ring.size:
+                # plný kruh - počkat na čtenáře
+                if not self.running:
+                    return
+                ring.overflow_count += 1
+                time.sleep(0.0005)
+            i = ring.head & mask
+            n = min(len(packet), ring.slot_size)
+            slots[i][:n] = packet[:n]
+            lengths[i] = n
+            addrs[i] = None
+            timestamps[i] = time.time()
+            ring.head += 1
+            self._received_count += 1
+            self.replayed_packets += 1
+            ring.readable.set()     # po každém packetu, jako UDPRelay.listen_loop (čtenář mohl kruh vyprázdnit a usnout)
+        self.finished.set()
+
+    def sendto(self, data: bytes, addr):
+        pass    # zařízení neexistuje (např. Trigger ACK)
+
+    def send_loop(self):
+        pass
+
+
+if __name__ == '__main__':
+    # deterministický běh zpracování (CRC, řazení, dekódování, zápis do bufferu) nad žurnálem
+    import cProfile
+    import pstats
+    import socket
+    from protocol import SAMPLES_PER_PACKET, PACKET_RATE_HZ
+    from ring_buffer import SignalRingBuffer
+    from ingest import IngestPipeline
+
+    parser = argparse.ArgumentParser(description="Přehrání žurnálu packetů přes ingest pipeline bez GUI")
+    parser.add_argument('journal', help="soubor .pkj")
+    parser.add_argument('--speed', type=float, default=REPLAY_AS_FAST_AS_POSSIBLE,
+                        help="1 = reálný čas, N = N× rychleji, 0 = co nejrychleji (výchozí)")
+    parser.add_argument('--buffer', type=float, default=10, help="délka bufferu v s")
+    parser.add_argument('--profile', action='store_true', help="cProfile zpracování, vypíše 20 nejdražších funkcí")
+    args = parser.parse_args()
+
+    relay = ReplayRelay(args.journal, args.speed)
+    relay.settimeout(0.2)
+    ch = relay.reader.channels_count
+    ring = SignalRingBuffer(ch, args.buffer * SAMPLES_PER_PACKET * PACKET_RATE_HZ)
+    messages = []
+    pipeline = IngestPipeline(ch, ring, log=messages.append)
+
+    def run():
+        relay.bind()
+        while not (relay.finished.is_set() and relay.get_received_count() == 0):
+            try:
+                pipeline.process_batch(relay.recv_batch())
+            except socket.timeout:
+                pass
+        pipeline.flush_packet_buffer()
+
+    profiler = cProfile.Profile() if args.profile else None
+    t = time.perf_counter()
+    if profiler:
+        profiler.runcall(run)
+    else:
+        run()
+    dt = time.perf_counter() - t
+    relay.close()
+
+    crc_records = sum(1 for _, _, flags, _ in relay.reader.records() if flags & FLAG_CRC_ERROR)
+    print(f"{relay.replayed_packets} packets in {dt:.3f} s ({relay.replayed_packets / dt:.0f} packets/s, "
+          f"{relay.replayed_packets / dt / PACKET_RATE_HZ:.1f}x real time)")
+    print(f"received {pipeline.received_packets}, lost {pipeline.lost_packets_counter}, "
+          f"crc {pipeline.crc_error_counter} (journal {crc_records}), late/duplicate "
+          f"{pipeline.reorder.late_packets}/{pipeline.reorder.duplicate_packets}, buffer {ring.total_packets} packets, "
+          f"ring waits {relay.get_overflow_count()}")
+    gaps = pipeline.gap_histogram()
+    if gaps:
+        print("gaps (length: count): " + ", ".join(f"{n}: {c}" for n, c in gaps.items()))
+    if profiler:
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
@@ -0,0 +1,344 @@
+import numpy as np
+
+from protocol import SAMPLES_PER_PACKET
+from decimation import reduce_envelope
+
+SIGNAL_TYPE = np.int16
+# min/max pyramida nad bufferem: koše o 16, 256 a 4096 vzorcích (mocniny dvou kvůli bucket_for)
+PYRAMID_FACTORS = (16, 256, 4096)
+
+
+# ---------------------- Kruhový buffer signálu ----------------------
+# Data jsou uložená po celých packetech: vzorky int16 [kanál, vzorek],
+# počty chybných vzorků uint8 [kanál, packet] a absolutní index prvního vzorku každého packetu.
+# Při zápisu se průběžně počítá min/max pyramida (PYRAMID_FACTORS) - také kruhová, koše jsou zarovnané
+# na pozici v proudu vzorků, pyramid_end[úroveň] = konec posledního spočítaného koše. Koš je platný,
+# dokud jeho vzorky neopustí buffer (pozice >= oldest_position), takže zahazování starých dat nic nerozbije.
+class SignalRingBuffer:
+    def __init__(self, channels_count, capacity, samples_per_packet=SAMPLES_PER_PACKET):
+        self.samples_per_packet = samples_per_packet
+        self.reset(channels_count, capacity)
+
+    def reset(self, channels_count=None, capacity=None):
+        if channels_count is not None:
+            self.channels_count = channels_count
+        if capacity is not None:
+            # kapacita ve vzorcích, zaokrouhlená nahoru na celé packety
+            self.packets_capacity = max(1, -(-int(capacity) // self.samples_per_packet))
+        self.capacity = self.packets_capacity * self.samples_per_packet
+        self.samples = np.zeros((self.channels_count, self.capacity), dtype=SIGNAL_TYPE)
+        self.errors = np.zeros((self.channels_count, self.packets_capacity), dtype=np.uint8)
+        self.packet_index = np.zeros(self.packets_capacity, dtype=np.int64)
+        self.pyramid_slots = pyramid_slots(self.capacity)
+        self.pyramid_min = [np.zeros((self.channels_count, n), dtype=SIGNAL_TYPE) for n in self.pyramid_slots]
+        self.pyramid_max = [np.zeros((self.channels_count, n), dtype=SIGNAL_TYPE) for n in self.pyramid_slots]
+        self.pyramid_end = np.zeros(len(PYRAMID_FACTORS), dtype=np.int64)
+        self.total_packets = 0    # celkem zapsaných packetů od resetu
+        self.generation = getattr(self, 'generation', 0) + 1  # mění se při každém smazání obsahu
+
+    def clear(self):
+        self.total_packets = 0
+        self.pyramid_end[:] = 0
+        self.generation += 1
+
+    @property
+    def write_pos(self):
+        # další zapisovaný packet; odvozený jen z total_packets, aby čtenář viděl konzistentní stav
+        return self.total_packets % self.packets_capacity
+
+    def __len__(self):
+        return self.packets_count() * self.samples_per_packet
+
+    def packets_count(self):
+        return min(self.total_packets, self.packets_capacity)
+
+    def nbytes_per_channel(self):
+        return self.samples[0].nbytes + self.errors[0].nbytes if self.channels_count else 0
+
+    def nbytes(self):
+        return (self.samples.nbytes + self.errors.nbytes + self.packet_index.nbytes
+                + sum(a.nbytes for a in self.pyramid_min + self.pyramid_max))
+
+    def append(self, first_index, samples, errors):
+        # first_index[N]: absolutní index prvního vzorku packetu
+        # samples[kanál, N*vzorků], errors[kanál, N] - výstup DataPacketDecoder
+        n = len(first_index)
+        if n == 0:
+            return
+        if samples.shape[0] != self.channels_count:
+            raise ValueError(f"[ERR]: {samples.shape[0]} channels appended to buffer for {self.channels_count} channels")
+        if n > self.packets_capacity:
+            skip = n - self.packets_capacity
+            first_index = first_index[skip:]
+            samples = samples[:, skip * self.samples_per_packet:]
+            errors = errors[:, skip:]
+            self.total_packets += skip
+            n = self.packets_capacity
+
+        spp = self.samples_per_packet
+        start = self.write_pos
+        first = min(n, self.packets_capacity - start)
+        self.packet_index[start:start + first] = first_index[:first]
+        self.errors[:, start:start + first] = errors[:, :first]
+        self.samples[:, start * spp:(start + first) * spp] = samples[:, :first * spp]
+        if first < n:
+            rest = n - first
+            self.packet_index[:rest] = first_index[first:]
+            self.errors[:, :rest] = errors[:, first:]
+            self.samples[:, :rest * spp] = samples[:, first * spp:]
+
+        self.total_packets += n
+        self._update_pyramid()
+
+    # ------ Min/max pyramida ------
+    def _level_slices(self, level, start, stop):
+        # sloty košů úrovně pro pozice [start, stop) zarovnané na faktor úrovně
+        factor, n = PYRAMID_FACTORS[level], self.pyramid_slots[level]
+        a = start // factor % n
+        b = a + (stop - start) // factor
+        if b <= n:
+            return [(a, b)]
+        return [(a, n), (0, b - n)]
+
+    def _level_between(self, level, start, stop):
+        slices = self._level_slices(level, start, stop)
+        return (self._join([self.pyramid_min[level][:, a:b] for a, b in slices]),
+                self._join([self.pyramid_max[level][:, a:b] for a, b in slices]))
+
+    def _update_pyramid(self):
+        # dopočítá nové celé koše každé úrovně z předchozí (první z nových vzorků), O(nových vzorků)
+        oldest = self.oldest_position()
+        source_end = self.total_samples()
+        for level, factor in enumerate(PYRAMID_FACTORS):
+            # koše, jejichž vzorky mezitím vypadly z bufferu, se přeskočí
+            end = max(int(self.pyramid_end[level]), -(-oldest // factor) * factor)
+            stop = source_end // factor * factor
+            if stop > end:
+                if level == 0:
+                    y = self.samples_between(end, stop)
+                    lo, hi = reduce_envelope(y, y, factor)
+                else:
+                    lo, hi = reduce_envelope(*self._level_between(level - 1, end, stop),
+                                             factor // PYRAMID_FACTORS[level - 1])
+                done = 0
+                for a, b in self._level_slices(level, end, stop):
+                    self.pyramid_min[level][:, a:b] = lo[:, done:done + b - a]
+                    self.pyramid_max[level][:, a:b] = hi[:, done:done + b - a]
+                    done += b - a
+                end = stop
+            self.pyramid_end[level] = end
+            source_end = end
+
+    def envelope(self, n_visible, bucket):
+        # (x[koš], min[kanál, koš], max[kanál, koš]) posledních n_visible vzorků po koších o velikosti bucket
+        # (mocnina dvou). Celé koše se skládají z nejhrubší úrovně pyramidy s faktorem <= bucket, ze surových
+        # vzorků se počítá jen konec, který úroveň ještě nepokrývá - cena je O(n_visible / faktor), ne O(n_visible).
+        total = self.total_samples()
+        first = -(-(total - min(n_visible, len(self))) // bucket) * bucket
+        levels = [level for level, factor in enumerate(PYRAMID_FACTORS) if factor <= bucket]
+        split = first
+        parts = []
+        if levels:
+            level = levels[-1]
+            split = max(first, min(int(self.pyramid_end[level]), total) // bucket * bucket)
+            if split > first:
+                parts.append(reduce_envelope(*self._level_between(level, first, split),
+                                             bucket // PYRAMID_FACTORS[level]))
+        if total > split:
+            y = self.samples_between(split, total)
+            parts.append(reduce_envelope(y, y, bucket))
+        x = self.x_at(np.arange(first, total, bucket, dtype=np.int64))
+        if not parts:
+            empty = self.samples[:, :0]
+            return x, empty, empty
+        return x, self._join([p[0] for p in parts]), self._join([p[1] for p in parts])
+
+    def _packet_slices(self, n_packets):
+        # rozsahy posledních n_packets packetů v poli (1 nebo 2 kvůli přetočení)
+        total = self.total_packets
+        n_packets = min(n_packets, total, self.packets_capacity)
+        if n_packets <= 0:
+            return []
+        return self._slot_slices(total - n_packets, total)
+
+    def _slot_slices(self, first_packet, stop_packet):
+        # sloty pro packety [first_packet, stop_packet) počítané od resetu
+        cap = self.packets_capacity
+        start = first_packet % cap
+        stop = start + (stop_packet - first_packet)
+        if stop <= cap:
+            return [(start, stop)]
+        return [(start, cap), (0, stop - cap)]
+
+    def _join(self, parts, axis=-1):
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts, axis=axis)
+
+    def latest_samples(self, n, copy=False):
+        # posledních n vzorků všech kanálů [kanál, n]; bez přetočení je to pohled (view) do bufferu,
+        # jinak kopie - pohled je platný jen pod zámkem bufferu
+        n = min(n, len(self))
+        spp = self.samples_per_packet
+        slices = self._packet_slices(-(-n // spp))
+        if not slices:
+            return self.samples[:, :0].copy() if copy else self.samples[:, :0]
+        parts = [self.samples[:, a * spp:b * spp] for a, b in slices]
+        out = self._join(parts)
+        out = out[:, out.shape[1] - n:]
+        return out.copy() if copy and len(parts) == 1 else out
+
+    def latest_errors(self, n_packets):
+        slices = self._packet_slices(n_packets)
+        if not slices:
+            return self.errors[:, :0]
+        return self._join([self.errors[:, a:b] for a, b in slices])
+
+    def latest_packet_index(self, n_packets):
+        slices = self._packet_slices(n_packets)
+        if not slices:
+            return self.packet_index[:0]
+        return self._join([self.packet_index[a:b] for a, b in slices])
+
+    def total_samples(self):
+        # pozice konce zapsaných dat v proudu vzorků (počítáno od resetu)
+        return self.total_packets * self.samples_per_packet
+
+    def samples_between(self, start, stop, copy=False):
+        # vzorky z rozsahu pozic [start, stop) v proudu vzorků, rozsah musí být ještě v bufferu;
+        # nezávisí na aktuálním konci zápisu, takže funguje i při souběžném zápisu z jiného procesu
+        spp = self.samples_per_packet
+        first = start // spp
+        slices = self._slot_slices(first, -(-stop // spp))
+        out = self._join([self.samples[:, a * spp:b * spp] for a, b in slices])
+        out = out[:, start - first * spp:stop - first * spp]
+        return out.copy() if copy and len(slices) == 1 else out
+
+    def oldest_position(self):
+        # první pozice v proudu vzorků, která je ještě v bufferu
+        return (self.total_packets - self.packets_count()) * self.samples_per_packet
+
+    def position_of(self, sample_index):
+        # pozice v proudu vzorků pro absolutní index vzorku; leží-li index v chybějícím packetu,
+        # vrací začátek následujícího packetu, None pokud vzorek ještě nedorazil
+        spp = self.samples_per_packet
+        cap = self.packets_capacity
+        total = self.total_packets
+        lo, hi = total - self.packets_count(), total
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.packet_index[mid % cap] + spp <= sample_index:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == total:
+            return None
+        return lo * spp + min(spp - 1, max(0, sample_index - int(self.packet_index[lo % cap])))
+
+    def x_at(self, positions):
+        # absolutní index vzorku (osa x) pro pozice v proudu vzorků
+        positions = np.asarray(positions, dtype=np.int64)
+        spp = self.samples_per_packet
+        return self.packet_index[(positions // spp) % self.packets_capacity] + positions % spp
+
+    def latest_x(self, n):
+        # absolutní indexy posledních n vzorků (int64)
+        n = min(n, len(self))
+        spp = self.samples_per_packet
+        first = self.latest_packet_index(-(-n // spp))
+        x = (first[:, None] + np.arange(spp, dtype=np.int64)).ravel()
+        return x[len(x) - n:]
+
+
+def pyramid_slots(capacity):
+    # počet košů každé úrovně v kruhu; +2 pokryje koše přesahující začátek a konec bufferu
+    return [capacity // factor + 2 for factor in PYRAMID_FACTORS]
+
+
+# ---------------------- Buffer ve sdílené paměti ----------------------
+# Stejný buffer, ale pole (včetně stavu) leží v multiprocessing.shared_memory. Zapisuje ingest proces,
+# GUI si stejný blok namapuje jen pro čtení. Velikost je pevná, při změně počtu kanálů se vytvoří nový blok.
+_STATE_TOTAL = 0
+_STATE_GENERATION = 1
+_STATE_PYRAMID = 2      # konce úrovní pyramidy (len(PYRAMID_FACTORS) položek)
+_STATE_SIZE = 8
+
+
+def _align(n):
+    return (n + 63) // 64 * 64
+
+
+class SharedSignalRingBuffer(SignalRingBuffer):
+    def __init__(self, channels_count, capacity, samples_per_packet=SAMPLES_PER_PACKET, name=None, readonly=False):
+        self.samples_per_packet = samples_per_packet
+        self.channels_count = channels_count
+        self.packets_capacity = max(1, -(-int(capacity) // samples_per_packet))
+        self.capacity = self.packets_capacity * samples_per_packet
+
+        pc = self.packets_capacity
+        o_index = _align(8 * _STATE_SIZE)
+        o_errors = o_index + _align(8 * pc)
+        o_samples = o_errors + _align(channels_count * pc)
+        o_pyramid = o_samples + _align(2 * channels_count * self.capacity)
+        self.pyramid_slots = pyramid_slots(self.capacity)
+        size = o_pyramid + sum(2 * _align(2 * channels_count * n) for n in self.pyramid_slots)
+
+        self.owner = name is None
+        self.shm = open_shared_memory(name, max(size, 1))
+        self.name = self.shm.name
+        buf = self.shm.buf
+        self.state = np.ndarray((_STATE_SIZE,), dtype=np.int64, buffer=buf, offset=0)
+        self.packet_index = np.ndarray((pc,), dtype=np.int64, buffer=buf, offset=o_index)
+        self.errors = np.ndarray((channels_count, pc), dtype=np.uint8, buffer=buf, offset=o_errors)
+        self.samples = np.ndarray((channels_count, self.capacity), dtype=SIGNAL_TYPE, buffer=buf, offset=o_samples)
+        self.pyramid_end = self.state[_STATE_PYRAMID:_STATE_PYRAMID + len(PYRAMID_FACTORS)]
+        self.pyramid_min, self.pyramid_max = [], []
+        for n in self.pyramid_slots:
+            for levels in (self.pyramid_min, self.pyramid_max):
+                levels.append(np.ndarray((channels_count, n), dtype=SIGNAL_TYPE, buffer=buf, offset=o_pyramid))
+                o_pyramid += _align(2 * channels_count * n)
+        if readonly:
+            for a in [self.state, self.packet_index, self.errors, self.samples] + self.pyramid_min + self.pyramid_max:
+                a.setflags(write=False)
+
+    @property
+    def total_packets(self):
+        return int(self.state[_STATE_TOTAL])
+
+    @total_packets.setter
+    def total_packets(self, value):
+        self.state[_STATE_TOTAL] = value
+
+    @property
+    def generation(self):
+        return int(self.state[_STATE_GENERATION])
+
+    @generation.setter
+    def generation(self, value):
+        self.state[_STATE_GENERATION] = value
+
+    def reset(self, channels_count=None, capacity=None):
+        if (channels_count not in (None, self.channels_count)
+                or (capacity is not None and -(-int(capacity) // self.samples_per_packet) != self.packets_capacity)):
+            raise ValueError("[ERR]: shared buffer cannot be resized, create a new one")
+        self.clear()
+
+    def close(self):
+        # pohledy do sdílené paměti je nutné uvolnit před zavřením bloku
+        self.state = self.packet_index = self.errors = self.samples = self.pyramid_end = None
+        self.pyramid_min = self.pyramid_max = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def open_shared_memory(name, size):
+    # name=None vytvoří nový blok, jinak se připojí k existujícímu. Ingest proces je spuštěný
+    # z GUI a sdílí jeho resource tracker, takže jeho registrace bloku nic nesmaže.
+    from multiprocessing import shared_memory
+    if name is None:
+        return shared_memory.SharedMemory(create=True, size=size)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
@@ -0,0 +1,39 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from ring_buffer import SIGNAL_TYPE
+
+DEFAULT_CHANNEL = {'unit': "", 'offset': 0.0, 'gain': 1.0}
+
+
+# ---------------------- Převod kanálů ----------------------
+# hodnota = vzorek * gain + offset podle záznamů kanálů z ID packetu (protocol.parse_channel_records).
+# Buffer zůstává int16, na float32 se převádí jen vykreslovaný rozsah (pro všechny kanály jedna operace).
+class ChannelScaling:
+    def __init__(self, channels, channels_count):
+        channels = list(channels or [])[:channels_count]
+        channels += [DEFAULT_CHANNEL] * (channels_count - len(channels))
+        self.units = [c['unit'] for c in channels]
+        self.gain = np.array([c['gain'] for c in channels], dtype=np.float32)[:, None]
+        self.offset = np.array([c['offset'] for c in channels], dtype=np.float32)[:, None]
+
+    def apply(self, y, channels=None):
+        # y[kanál, n] int16 -> float32; channels = vybrané kanály, pokud y neobsahuje všechny
+        gain, offset = (self.gain, self.offset) if channels is None else (self.gain[channels], self.offset[channels])
+        out = np.multiply(y, gain, dtype=np.float32)
+        out += offset
+        return out
+
+    def groups(self):
+        # [(jednotka, [kanály])] v pořadí prvního výskytu - jedna osa Y pro každou jednotku
+        groups = OrderedDict()
+        for channel, unit in enumerate(self.units):
+            groups.setdefault(unit, []).append(channel)
+        return list(groups.items())
+
+    def full_scale(self, channels):
+        # (min, max) převedeného rozsahu int16 pro dané kanály - výchozí rozsah osy
+        info = np.iinfo(SIGNAL_TYPE)
+        values = np.array([info.min, info.max], dtype=np.float32) * self.gain[channels] + self.offset[channels]
+        return float(values.min()), float(values.max())
@@ -0,0 +1,136 @@
+# ---------------------- Řazení packetů ----------------------
+# Okno pevné velikosti indexované pořadovým číslem packetu modulo velikost okna.
+# Vložení, výdej v pořadí i počítání ztracených packetů je O(1) na packet.
+class ReorderWindow:
+    def __init__(self, size=256, min_buffer_size=90):
+        if size & (size - 1) or size <= min_buffer_size:
+            raise ValueError("[ERR]: reorder window size must be a power of two larger than min_buffer_size")
+        self.size = size
+        self.mask = size - 1
+        self.min_buffer_size = min_buffer_size
+        self.slots = [None] * size
+        self.occupied = bytearray(size)   # bitmapa obsazených slotů
+        self.gaps = [0] * (size + 1)      # histogram délek mezer, poslední položka = size a víc
+        self.reset()
+        self.clear_stats()
+
+    def reset(self):
+        # zahodí obsah okna, další packet začne nové pořadí
+        for i in range(self.size):
+            self.slots[i] = None
+            self.occupied[i] = 0
+        self.count = 0
+        self.next_seq = None    # nejstarší ještě nevydané pořadové číslo
+        self._gap = 0           # délka právě otevřené mezery
+        self._forced = []       # packety vytlačené příchodem packetu mimo okno
+
+    def clear_stats(self):
+        self.lost_packets = 0
+        self._reported_lost = 0     # ztracené packety už vrácené z flush()
+        self.late_packets = 0
+        self.duplicate_packets = 0
+        for i in range(len(self.gaps)):
+            self.gaps[i] = 0
+
+    def __len__(self):
+        return self.count + len(self._forced)
+
+    def insert(self, seq, data):
+        # vrací False pro packet starší než poslední vydaný nebo pro duplicitu
+        if self.next_seq is None:
+            self.next_seq = seq
+        d = seq - self.next_seq
+        if d < 0:
+            self.late_packets += 1
+            return False
+        if d >= self.size:
+            # packet je mimo okno - vydáme nejstarší packety, aby se vešel
+            self._forced.extend(self._advance(seq - self.size + 1))
+        i = seq & self.mask
+        if self.occupied[i]:
+            self.duplicate_packets += 1
+            return False
+        self.slots[i] = (seq, data)
+        self.occupied[i] = 1
+        self.count += 1
+        return True
+
+    def ready(self):
+        return self.count >= self.min_buffer_size or bool(self._forced)
+
+    def flush(self, max_packets=None):
+        # vydá až max_packets packetů v pořadí (None = vše), vrací (pořadí, data, ztracené od minulého výdeje);
+        # ztracené zahrnují i mezeru přeskočenou při vložení packetu mimo okno
+        out = self._forced
+        self._forced = []
+        limit = self.count if max_packets is None else max(0, max_packets - len(out))
+        out.extend(self._take(limit))
+        lost = self.lost_packets - self._reported_lost
+        self._reported_lost = self.lost_packets
+        return [s for s, _ in out], [d for _, d in out], lost
+
+    def _close_gap(self):
+        if self._gap:
+            self.gaps[min(self._gap, self.size)] += 1
+            self._gap = 0
+
+    def _take(self, limit, target=None):
+        # projde okno od next_seq, prázdné sloty počítá jako ztracené packety
+        out = []
+        slots, occupied, mask = self.slots, self.occupied, self.mask
+        while len(out) < limit and self.count and (target is None or self.next_seq < target):
+            i = self.next_seq & mask
+            if occupied[i]:
+                self._close_gap()
+                out.append(slots[i])
+                slots[i] = None
+                occupied[i] = 0
+                self.count -= 1
+            else:
+                self.lost_packets += 1
+                self._gap += 1
+            self.next_seq += 1
+        return out
+
+    def _advance(self, target):
+        # posune začátek okna na target, vše starší vydá
+        out = self._take(self.size, target)
+        if self.next_seq < target:
+            # okno je prázdné, zbytek mezery se přeskočí najednou
+            skipped = target - self.next_seq
+            self.lost_packets += skipped
+            self._gap += skipped
+            self.next_seq = target
+        return out
+
+    def gap_histogram(self):
+        # {délka mezery: počet}, délky >= size jsou sloučené pod klíčem size
+        return {length: n for length, n in enumerate(self.gaps) if n}
+
+
+# ---------------------- Rozbalení pořadí ----------------------
+# Pořadí packetu má 16 bitů a přetéká každých 65536 packetů. Rozbalením vznikne
+# monotónní 64bitové absolutní pořadí, takže řazení i osa x fungují i přes přetečení.
+class SequenceUnwrapper:
+    def __init__(self, modulo=65536):
+        self.modulo = modulo
+        self.half = modulo // 2
+        self.reset()
+
+    def reset(self):
+        self.last = None    # nejvyšší dosud viděné absolutní pořadí
+
+    def unwrap(self, seq):
+        absolute = self.resolve(seq)
+        if self.last is None or absolute > self.last:
+            self.last = absolute
+        return absolute
+
+    def resolve(self, seq):
+        # jako unwrap, ale nemění stav (např. pořadí packetu z trigger packetu)
+        if self.last is None:
+            return seq
+        d = (seq - self.last) % self.modulo
+        if d >= self.half:
+            d -= self.modulo    # opožděný packet (i přes hranici přetečení)
+        return self.last + d
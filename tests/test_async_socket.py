@@ -0,0 +1,18 @@
+import socket
+
+from async_socket import AsyncUDPRelay
+
+
+def test_rebind_same_port(free_udp_port):
+    # stop() v bind() čeká na zavření transportu, port jde hned znovu obsadit
+    port = free_udp_port()
+    relay = AsyncUDPRelay(batch_mode=True)
+    try:
+        for _ in range(20):
+            relay.bind(port=port)
+        relay.settimeout(1.0)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(b'abcd', ('127.0.0.1', port))
+        assert [bytes(p) for p in relay.recv_batch()] == [b'abcd']
+    finally:
+        relay.close()
@@ -0,0 +1,48 @@
+import random
+import struct
+
+from crc16 import crc16_ccitt, crc16_ccitt_bitwise, verify_crc, verify_crc_batch
+
+
+def with_crc(data):
+    return data + struct.pack('<H', crc16_ccitt_bitwise(data))
+
+
+def test_known_value():
+    # CRC-16/CCITT-FALSE
+    assert crc16_ccitt(b"123456789") == 0x29B1
+    assert crc16_ccitt_bitwise(b"123456789") == 0x29B1
+
+
+def test_table_and_bitwise_agree():
+    rng = random.Random(0)
+    for n in (0, 1, 2, 7, 64, 808):
+        data = bytes(rng.randrange(256) for _ in range(n))
+        assert crc16_ccitt(data) == crc16_ccitt_bitwise(data)
+        # jiný polynom jde přes tabulku
+        assert crc16_ccitt(data, poly=0x8005) == crc16_ccitt_bitwise(data, poly=0x8005)
+        assert crc16_ccitt(data, crc=0) == crc16_ccitt_bitwise(data, crc=0)
+
+
+def test_batch_matches_single_packet_check():
+    rng = random.Random(1)
+    packets = []
+    corrupted = 0
+    for i in range(200):
+        pkt = bytearray(with_crc(bytes(rng.randrange(256) for _ in range(rng.randrange(0, 100)))))
+        if i % 7 == 0 and len(pkt) > 2:
+            pkt[rng.randrange(len(pkt))] ^= 1 << rng.randrange(8)     # jednobitová chyba CRC vždy odhalí
+            corrupted += 1
+        packets.append(bytes(pkt))
+    packets += [b'', b'\x01']
+    batch = verify_crc_batch(packets)
+    single = [verify_crc(p) for p in packets]
+    assert [None if d is None else bytes(d) for d in batch] == [None if d is None else bytes(d) for d in single]
+    assert sum(d is None for d in batch) == corrupted + 2
+
+
+def test_batch_accepts_memoryviews():
+    data = with_crc(b"abcdef")
+    buf = bytearray(data * 3)
+    views = [memoryview(buf)[i * len(data):(i + 1) * len(data)] for i in range(3)]
+    assert [bytes(d) for d in verify_crc_batch(views)] == [b"abcdef"] * 3
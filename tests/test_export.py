@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+from Generator import PacketTable
+from export import export_journal, ColumnarReader, CODECS, MANIFEST, _read_column
+from journal import JournalWriter, FLAG_CRC_ERROR
+from packet_decoder import DataPacketDecoder
+from protocol import SAMPLES_PER_PACKET as SPP
+
+CHANNELS = [{'unit': "V", 'offset': 0.5, 'gain': 0.001}, {'unit': "A", 'offset': 0.0, 'gain': 2.0}]
+MISSING = {3, 4, 20}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    # přeházené pořadí, mezery, duplikát a packet s chybou CRC
+    table = PacketTable(2)
+    orders = [o for o in range(40) if o not in MISSING]
+    received = orders[:10] + [orders[11], orders[10]] + orders[12:] + [orders[5]]
+    path = str(tmp_path / "run.pkj")
+    writer = JournalWriter(path, 2, info={'channels': CHANNELS})
+    for k, order in enumerate(received):
+        writer.append(order, 1.0 + k * 0.001, bytes(table.packet(order)))
+    writer.append(-1, 2.0, b'\0' * (len(table.packet(0))), FLAG_CRC_ERROR)
+    writer.close()
+    decoded = DataPacketDecoder(2).decode([bytes(table.packet(o))[:-2] for o in orders])
+    return path, np.array(orders), decoded
+
+
+@pytest.mark.parametrize('codec', list(CODECS))
+def test_round_trip_every_codec(tmp_path, journal, codec):
+    path, orders, (_, samples, errors) = journal
+    out = export_journal(path, str(tmp_path / f"out_{codec}"), codec=codec, chunk_packets=7, workers=2,
+                         log=lambda msg: None)
+    reader = ColumnarReader(out)
+    assert reader.codec == codec
+    assert len(reader.chunks) == -(-len(orders) // 7)
+
+    # každý sloupec po dekompresi bajt po bajtu shodný s dekódovanými vzorky
+    for k, chunk in enumerate(reader.chunks):
+        part = slice(7 * k, 7 * k + chunk['packets'])
+        assert chunk['first_order'] == orders[part][0] and chunk['last_order'] == orders[part][-1]
+        for c in range(2):
+            column = _read_column(os.path.join(out, chunk['samples'][c]), codec)
+            assert np.asarray(column).tobytes() == samples[c, part.start * SPP:part.stop * SPP].tobytes()
+        x, chunk_samples, chunk_errors = reader.read_chunk(k)
+        assert np.array_equal(chunk_errors, errors[:, part])
+        assert chunk['error_samples'] == errors[:, part].sum(axis=1).tolist()
+
+    x_all = (orders[:, None] * SPP + np.arange(SPP)).ravel()
+    x, y = reader.read(0, 40 * SPP)
+    assert np.array_equal(x, x_all)
+    assert np.array_equal(y, samples)
+
+    # výřez přes hranici bloků a přes mezeru, jen kanál 1, převedený na jednotky
+    start, stop = 15 * SPP + 7, 27 * SPP + 3
+    x, y = reader.read(start, stop, channels=[1], scaled=True)
+    keep = (x_all >= start) & (x_all < stop)
+    assert np.array_equal(x, x_all[keep])
+    assert np.allclose(y[0], samples[1, keep] * 2.0)
+
+
+def test_manifest_keeps_channel_scaling(tmp_path, journal):
+    path = journal[0]
+    out = export_journal(path, str(tmp_path / "out"), chunk_packets=100, log=lambda msg: None)
+    reader = ColumnarReader(out)
+    assert reader.manifest['channels'] == CHANNELS
+    assert os.path.exists(os.path.join(out, MANIFEST))
+
+
+def test_unknown_codec(tmp_path, journal):
+    with pytest.raises(ValueError):
+        export_journal(journal[0], str(tmp_path / "out"), codec='zip')
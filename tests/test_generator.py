@@ -0,0 +1,62 @@
+from Generator import Impairment
+
+
+def packet(i):
+    return i.to_bytes(4, 'little')
+
+
+def run(impairment, n, first_only=False):
+    # indexy odeslaných packetů v pořadí odeslání
+    out = []
+    for i in range(n):
+        out.extend(impairment.process(packet(i)))
+        if first_only:
+            impairment.reorder = 0.0
+    out.extend(impairment.flush())
+    return [int.from_bytes(p, 'little') for p in out]
+
+
+def test_reorder_depth_one_swaps_neighbours():
+    imp = Impairment(1, reorder=1.0, reorder_depth=1)
+    assert run(imp, 4, first_only=True) == [1, 0, 2, 3]
+    assert imp.stats['reordered'] == 1
+
+
+def test_reorder_depth_counts_later_packets():
+    imp = Impairment(1, reorder=1.0, reorder_depth=1)
+    imp.rng.randint = lambda a, b: 3     # pozdržení přesně o 3 packety
+    assert run(imp, 6, first_only=True) == [1, 2, 3, 0, 4, 5]
+    assert imp.stats['reordered'] == 1
+
+
+def test_delaying_every_packet_equally_does_not_reorder():
+    imp = Impairment(1, reorder=1.0, reorder_depth=1)
+    assert run(imp, 5) == [0, 1, 2, 3, 4]
+    assert imp.stats['reordered'] == 0
+
+
+def test_reorder_stats_match_output():
+    depth = 4
+    imp = Impairment(1, seed=3, reorder=0.3, reorder_depth=depth)
+    out = run(imp, 2000)
+    assert sorted(out) == list(range(2000))
+    sent_max, reordered = -1, 0
+    for position, index in enumerate(out):
+        assert position - index <= depth
+        if index < sent_max:
+            reordered += 1
+        sent_max = max(sent_max, index)
+    assert reordered == imp.stats['reordered'] > 0
+
+
+def test_loss_and_duplicates_counted():
+    imp = Impairment(1, seed=1, drop=0.1, duplicate=0.1)
+    out = run(imp, 1000)
+    assert len(out) == 1000 - imp.stats['dropped'] + imp.stats['duplicated']
+    assert len(set(out)) == 1000 - imp.stats['dropped']
+
+
+def test_same_seed_same_stream():
+    params = dict(seed=7, drop=0.05, loss_burst_rate=0.01, reorder=0.1, duplicate=0.05)
+    assert run(Impairment(1, **params), 1000) == run(Impairment(1, **params), 1000)
+    assert run(Impairment(1, **params), 1000) != run(Impairment(1, **dict(params, seed=8)), 1000)
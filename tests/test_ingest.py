@@ -0,0 +1,55 @@
+import numpy as np
+
+from Generator import PacketTable
+from crc16 import verify_crc_batch
+from ingest import IngestPipeline
+from protocol import SAMPLES_PER_PACKET
+from ring_buffer import SignalRingBuffer
+
+
+def pipeline_for(channels, capacity_packets=200):
+    messages = []
+    pipeline = IngestPipeline(channels, SignalRingBuffer(channels, capacity_packets * SAMPLES_PER_PACKET),
+                              log=messages.append)
+    return pipeline, messages
+
+
+def feed(pipeline, packets):
+    for pkt, data in zip(packets, verify_crc_batch(packets)):
+        pipeline.handle_packet(pkt, data)
+    pipeline.flush_packet_buffer()
+
+
+def test_wrong_size_packet_does_not_drop_chunk():
+    # packet s platným CRC, ale pro jiný počet kanálů - vyřadí se jen on, zbytek dávky se zapíše
+    table, other = PacketTable(2), PacketTable(1)
+    packets = [bytes((other if i == 10 else table).packet(i)) for i in range(40)]
+    pipeline, messages = pipeline_for(2)
+    feed(pipeline, packets)
+    buf = pipeline.signal_buffer
+    assert buf.total_packets == 39
+    assert pipeline.lost_packets_counter == 1
+    assert pipeline.crc_error_counter == 0
+    assert any("wrong size" in m for m in messages)
+    expected = np.concatenate([np.arange(i * SAMPLES_PER_PACKET, (i + 1) * SAMPLES_PER_PACKET)
+                               for i in range(40) if i != 10])
+    assert np.array_equal(buf.latest_x(39 * SAMPLES_PER_PACKET), expected)
+
+
+def test_packet_errors_are_rate_limited():
+    # 500 chybných CRC a 500 duplikátů: první zpráva hned, zbytek jako souhrn s počtem
+    table = PacketTable(2)
+    good = [bytes(table.packet(i)) for i in range(100)]
+    corrupted = []
+    for i in range(500):
+        pkt = bytearray(good[i % 100])
+        pkt[-1] ^= 0xFF
+        corrupted.append(bytes(pkt))
+    pipeline, messages = pipeline_for(2)
+    feed(pipeline, good[:10] + corrupted + good[:10] * 50)
+    assert pipeline.crc_error_counter == 500
+    assert pipeline.reorder.duplicate_packets == 500
+    invalid = [m for m in messages if "Invalid packet" in m]
+    dropped = [m for m in messages if "[DROP]" in m]
+    assert len(invalid) == 2 and "499 more" in invalid[-1]
+    assert len(dropped) == 2 and "499 more" in dropped[-1]
@@ -0,0 +1,36 @@
+import time
+
+from Generator import PacketTable
+from ingest_process import IngestProcess
+from journal import JournalWriter
+from protocol import SAMPLES_PER_PACKET
+
+MISSING = {100, 101, 102, 300}
+
+
+def test_flush_acknowledged_before_gaps_are_read(tmp_path):
+    # žurnál s mezerami 3 a 1 packet přehraný přes ingest proces; po flush_packet_buffer
+    # musí počítadla a histogram mezer obsahovat i packety, které zůstaly v okně pro řazení
+    path = str(tmp_path / "gaps.pkj")
+    table = PacketTable(2)
+    journal = JournalWriter(path, 2)
+    orders = [order for order in range(500) if order not in MISSING]
+    for order in orders:
+        journal.append(order, 1.0 + order * 0.001, table.packet(order))
+    journal.close()
+
+    ingest = IngestProcess(2, 1000 * SAMPLES_PER_PACKET, SAMPLES_PER_PACKET, '127.0.0.1', 0, 0, False,
+                           replay=(path, 0))
+    ingest.start()
+    try:
+        deadline = time.monotonic() + 10
+        while ingest.received_packets < len(orders) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert ingest.received_packets == len(orders)
+        ingest.flush_packet_buffer()
+        assert ingest.get_packet_buffer_size() == 0
+        assert ingest.lost_packets_counter == len(MISSING)
+        assert ingest.gap_histogram() == {1: 1, 3: 1}
+        assert ingest.signal_buffer.total_packets == len(orders)
+    finally:
+        ingest.stop()
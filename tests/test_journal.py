@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pytest
+
+from journal import (JournalWriter, JournalReader, JOURNAL_HEADER, JOURNAL_MAGIC, JOURNAL_VERSION, RECORD_HEADER,
+                     INDEX_DTYPE, FLAG_CRC_ERROR, next_free_path)
+from protocol import SAMPLES_PER_PACKET
+
+PACKET_SIZE = 16
+
+
+def make_records():
+    # pořadí příjmu: přeházení, duplikát, chyba CRC
+    orders = [0, 2, 1, 3, 3, -1, 5, 4]
+    records = []
+    for k, order in enumerate(orders):
+        flags = FLAG_CRC_ERROR if order < 0 else 0
+        packet = bytes([k]) * PACKET_SIZE
+        records.append((order, 1000.0 + k * 0.001, flags, packet))
+    return records
+
+
+def write(path, records, **kwargs):
+    journal = JournalWriter(path, 2, **kwargs)
+    for order, timestamp, flags, packet in records:
+        journal.append(order, timestamp, packet, flags)
+    journal.close()
+    return journal
+
+
+def test_round_trip_byte_for_byte(tmp_path):
+    path = str(tmp_path / "run.pkj")
+    records = make_records()
+    write(path, records, info={'channels': ['a', 'b']})
+
+    reader = JournalReader(path)
+    assert list(reader.records()) == records
+    assert reader.channels_count == 2
+    assert reader.samples_per_packet == SAMPLES_PER_PACKET
+    assert reader.info == {'channels': ['a', 'b']}
+
+    # soubor i .idx přesně podle formátu
+    expected = bytearray(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, 2, SAMPLES_PER_PACKET, 0,
+                                             reader.header['created']))
+    index = []
+    for order, timestamp, flags, packet in records:
+        index.append((order, len(expected)))
+        expected += RECORD_HEADER.pack(order, timestamp, flags, len(packet)) + packet
+    with open(path, "rb") as f:
+        assert f.read() == bytes(expected)
+    with open(path + ".idx", "rb") as f:
+        assert f.read() == np.array(index, dtype=INDEX_DTYPE).tobytes()
+
+
+def test_valid_index_and_packet_access(tmp_path):
+    path = str(tmp_path / "run.pkj")
+    records = make_records()
+    write(path, records)
+    reader = JournalReader(path)
+    valid = reader.valid_index()
+    assert valid['order'].tolist() == [0, 1, 2, 3, 4, 5]
+    packets = reader.read_packets(valid['offset'], PACKET_SIZE)
+    # duplikát pořadí 3 -> první přijatý (záznam 3)
+    assert [int(p[0]) for p in packets] == [0, 2, 1, 3, 7, 6]
+    assert reader.offset_of(3) in valid['offset']
+    assert reader.offset_of(6) is None
+
+
+def test_truncated_last_record_is_skipped(tmp_path):
+    path = str(tmp_path / "run.pkj")
+    records = make_records()
+    write(path, records)
+    os.truncate(path, os.path.getsize(path) - 3)
+    assert list(JournalReader(path).records()) == records[:-1]
+
+
+def test_existing_file_is_not_overwritten(tmp_path):
+    path = str(tmp_path / "run.pkj")
+    write(path, make_records())
+    with pytest.raises(FileExistsError):
+        JournalWriter(path, 2)
+
+
+def test_backlog_limit_drops_instead_of_blocking(tmp_path):
+    path = str(tmp_path / "run.pkj")
+    journal = JournalWriter(path, 2, max_backlog=0)
+    journal.append(0, 1.0, b'x')
+    journal.close()
+    assert journal.dropped_packets == 1
+    assert list(JournalReader(path).records()) == []
+
+
+def test_next_free_path(tmp_path):
+    base = str(tmp_path / "capture.pkj")
+    assert next_free_path(base) == str(tmp_path / "capture_001.pkj")
+    for name in ("capture_001.pkj", "capture_007.pkj", "other_009.pkj", "capture_008.txt"):
+        open(tmp_path / name, "w").close()
+    assert next_free_path(base) == str(tmp_path / "capture_008.pkj")
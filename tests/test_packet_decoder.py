@@ -0,0 +1,56 @@
+import struct
+
+import numpy as np
+import pytest
+
+from packet_decoder import DataPacketDecoder, data_packet_dtype
+from protocol import DATA_packet
+
+SPP = 20
+
+
+def build_packet(order, samples, errors):
+    # packet bez CRC po polích, jak ho posílá zařízení
+    channels = len(errors)
+    raw = struct.pack('<HH', DATA_packet, order)
+    raw += struct.pack(f'<{channels * SPP}h', *samples.ravel())
+    raw += bytes(errors)
+    if channels % 2:
+        raw += b'\0'
+    return raw
+
+
+@pytest.mark.parametrize('channels', [1, 2, 3, 8])
+def test_decode_matches_per_packet_unpack(channels):
+    rng = np.random.default_rng(channels)
+    n = 13
+    samples = rng.integers(-32768, 32767, (n, channels, SPP), dtype=np.int16)
+    errors = rng.integers(0, 255, (n, channels), dtype=np.uint8)
+    orders = rng.integers(0, 65535, n)
+    packets = [build_packet(int(orders[i]), samples[i], errors[i]) for i in range(n)]
+    decoder = DataPacketDecoder(channels, SPP)
+    assert decoder.packet_size == len(packets[0]) == data_packet_dtype(channels, SPP).itemsize
+
+    out_orders, out_samples, out_errors = decoder.decode(packets)
+    assert np.array_equal(out_orders, orders)
+    assert out_samples.shape == (channels, n * SPP)
+    for c in range(channels):
+        assert np.array_equal(out_samples[c], samples[:, c, :].ravel())
+    assert np.array_equal(out_errors, errors.T)
+
+
+def test_decode_memoryviews():
+    samples = np.arange(2 * SPP, dtype=np.int16).reshape(2, SPP)
+    raw = build_packet(7, samples, [1, 2]) + b'\xAA\xBB'
+    view = memoryview(raw)[:-2]     # jako výstup verify_crc_batch
+    orders, out, errors = DataPacketDecoder(2, SPP).decode([view, view])
+    assert list(orders) == [7, 7]
+    assert np.array_equal(out[1], np.concatenate([samples[1], samples[1]]))
+    assert errors.tolist() == [[1, 1], [2, 2]]
+
+
+def test_decode_rejects_wrong_size():
+    decoder = DataPacketDecoder(2, SPP)
+    good = build_packet(0, np.zeros((2, SPP), np.int16), [0, 0])
+    with pytest.raises(ValueError):
+        decoder.decode([good, good[:-1]])
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from ring_buffer import SignalRingBuffer, PYRAMID_FACTORS
+
+SPP = 8
+BUCKETS = [1, 2, 8, 16, 32, 256, 1024, 4096, 8192]
+
+
+def reference_envelope(samples, x_all, total, n_kept, n_visible, bucket):
+    # min/max po koších zarovnaných na pozici v proudu, jako SignalRingBuffer.envelope
+    first = -(-(total - min(n_visible, n_kept)) // bucket) * bucket
+    starts = np.arange(first, total, bucket)
+    if not len(starts):
+        empty = samples[:, :0]
+        return x_all[:0], empty, empty
+    lo = np.minimum.reduceat(samples[:, first:total], starts - first, axis=1)
+    hi = np.maximum.reduceat(samples[:, first:total], starts - first, axis=1)
+    return x_all[starts], lo, hi
+
+
+def stream(rng, channels, n_chunks, max_chunk):
+    order = 0
+    for _ in range(n_chunks):
+        n = int(rng.integers(1, max_chunk + 1))
+        orders = order + np.cumsum(rng.integers(1, 3, n))
+        order = int(orders[-1])
+        # pomalý průběh + šum, aby se min/max košů lišily
+        base = rng.integers(-20000, 20000)
+        samples = (base + rng.integers(-5000, 5000, (channels, n * SPP))).astype(np.int16)
+        yield orders * SPP, samples, np.zeros((channels, n), np.uint8)
+
+
+@pytest.mark.parametrize('capacity_packets, max_chunk', [(3000, 50), (1100, 400), (700, 3)])
+def test_envelope_matches_brute_force(capacity_packets, max_chunk):
+    rng = np.random.default_rng(capacity_packets)
+    buf = SignalRingBuffer(2, capacity_packets * SPP, SPP)
+    first_index, samples = [], []
+    n_chunks = 4 * capacity_packets // max_chunk + 5
+    for k, chunk in enumerate(stream(rng, 2, n_chunks, max_chunk)):
+        buf.append(*chunk)
+        first_index.append(chunk[0])
+        samples.append(chunk[1])
+        if k % max(1, n_chunks // 12):
+            continue
+        all_samples = np.concatenate(samples, axis=1)
+        all_index = np.concatenate(first_index)
+        x_all = (all_index[:, None] + np.arange(SPP)).ravel()
+        total = buf.total_samples()
+        for level, factor in enumerate(PYRAMID_FACTORS):
+            assert buf.pyramid_end[level] <= total // factor * factor
+        for n_visible in (len(buf), len(buf) // 3, 5000):
+            for bucket in BUCKETS:
+                x, lo, hi = buf.envelope(n_visible, bucket)
+                rx, rlo, rhi = reference_envelope(all_samples, x_all, total, len(buf), n_visible, bucket)
+                assert np.array_equal(x, rx), (n_visible, bucket)
+                assert np.array_equal(lo, rlo), (n_visible, bucket)
+                assert np.array_equal(hi, rhi), (n_visible, bucket)
+
+
+def test_pyramid_levels_complete_after_appends():
+    # všechny celé koše každé úrovně jsou spočítané hned po zápisu
+    buf = SignalRingBuffer(1, 20000 * SPP, SPP)
+    rng = np.random.default_rng(1)
+    for chunk in stream(rng, 1, 300, 30):
+        buf.append(*chunk)
+    total = buf.total_samples()
+    assert list(buf.pyramid_end) == [total // f * f for f in PYRAMID_FACTORS]
+
+
+def test_envelope_after_clear():
+    buf = SignalRingBuffer(1, 1000 * SPP, SPP)
+    rng = np.random.default_rng(2)
+    for chunk in stream(rng, 1, 50, 30):
+        buf.append(*chunk)
+    buf.clear()
+    chunk = next(stream(rng, 1, 1, 20))
+    buf.append(*chunk)
+    x, lo, hi = buf.envelope(len(buf), 16)
+    rx, rlo, rhi = reference_envelope(chunk[1], (chunk[0][:, None] + np.arange(SPP)).ravel(),
+                                      buf.total_samples(), len(buf), len(buf), 16)
+    assert np.array_equal(x, rx) and np.array_equal(lo, rlo) and np.array_equal(hi, rhi)
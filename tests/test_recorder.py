@@ -0,0 +1,32 @@
+import argparse
+import json
+
+import numpy as np
+
+import recorder
+from Generator import MultiSignalTestGenerator
+from protocol import SAMPLES_PER_PACKET
+
+
+def test_record_from_generator(tmp_path, free_udp_port):
+    # krátké nahrávání ze simulovaného zařízení přes celou pipeline do SampleFileWriter
+    device_port, cmd_port, data_port = free_udp_port(), free_udp_port(), free_udp_port()
+    gen = MultiSignalTestGenerator(port=device_port, num_signals=2)
+    gen.start()
+    out = str(tmp_path / "capture")
+    args = argparse.Namespace(device=f"127.0.0.1:{device_port}", cmd_port=cmd_port, data_port=data_port,
+                              receiver=f"127.0.0.1:{data_port}", listen_all=True, packets=0, duration=1.0,
+                              out=out, journal=None, stats_interval=recorder.STATS_INTERVAL,
+                              rcvbuf=recorder.UDP_RCVBUF)
+    try:
+        recorder.record(args)
+    finally:
+        gen.stop()
+
+    with open(out + ".json") as f:
+        meta = json.load(f)
+    assert meta['channels_count'] == 2
+    assert meta['samples_per_channel'] >= 500 * SAMPLES_PER_PACKET
+    assert meta['gap_samples'] == 0
+    samples = np.fromfile(out + ".i16", dtype='<i2')
+    assert len(samples) == meta['samples_per_channel'] * 2
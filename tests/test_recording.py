@@ -0,0 +1,78 @@
+import os
+import threading
+
+import numpy as np
+
+import recording
+from Generator import PacketTable
+from journal import JournalWriter
+from packet_decoder import DataPacketDecoder
+from protocol import SAMPLES_PER_PACKET as SPP
+from recording import Recording
+
+MISSING = {7, 8, 30}
+
+
+def write_journal(path, count=60):
+    table = PacketTable(2)
+    orders = [o for o in range(count) if o not in MISSING]
+    writer = JournalWriter(path, 2)
+    for k, order in enumerate(orders):
+        writer.append(order, 1.0 + k * 0.001, bytes(table.packet(order)))
+    writer.close()
+    _, samples, _ = DataPacketDecoder(2).decode([bytes(table.packet(o))[:-2] for o in orders])
+    x = (np.array(orders)[:, None] * SPP + np.arange(SPP)).ravel()
+    return x, samples
+
+
+def test_background_build_matches_foreground(tmp_path):
+    path = str(tmp_path / "run.pkj")
+    x_all, samples = write_journal(path)
+    rec = Recording(path, lod_dir=str(tmp_path / "fg.lod"), log=lambda msg: None)
+    expected = rec.view(x_all[0], x_all[-1], 100)
+    rec.close()
+
+    rec = Recording(path, lod_dir=str(tmp_path / "bg.lod"), log=lambda msg: None, background=True)
+    rec.build_thread.join()
+    assert rec.ready and rec.progress == 1.0
+    for a, b in zip(rec.view(x_all[0], x_all[-1], 100), expected):
+        assert np.array_equal(a, b)
+    rec.close()
+
+    # další otevření jen namapuje hotový index
+    rec = Recording(path, lod_dir=str(tmp_path / "bg.lod"), log=lambda msg: None, background=True)
+    assert rec.ready and rec.build_thread is None
+    rec.close()
+
+
+def test_view_samples_points_until_index_is_ready(tmp_path, monkeypatch):
+    path = str(tmp_path / "run.pkj")
+    x_all, samples = write_journal(path)
+    gate = threading.Event()
+    reduce_envelope = recording.reduce_envelope
+
+    def blocked(lo, hi, factor):
+        gate.wait()
+        return reduce_envelope(lo, hi, factor)
+
+    monkeypatch.setattr(recording, "reduce_envelope", blocked)
+    monkeypatch.setattr(recording, "BUILD_BLOCK", 2 * SPP)
+    rec = Recording(path, log=lambda msg: None, background=True)
+    assert not rec.ready
+
+    # rozpracovaný index se nepoužije - jeden vzorek na koš přímo ze záznamu
+    x, y, bucket = rec.view(x_all[0], x_all[-1], 100)
+    assert bucket > 1 and len(x) == -(-len(x_all) // bucket)
+    positions = np.arange(0, len(x_all), bucket)
+    assert np.array_equal(x, x_all[positions])
+    assert np.array_equal(y, samples[:, positions])
+    # surové vzorky malého rozsahu se čtou i během stavby
+    x, y, bucket = rec.view(x_all[10], x_all[60], 100)
+    assert bucket == 1 and x[0] <= x_all[10] and x[-1] >= x_all[60]
+    assert np.array_equal(y, samples[:, np.searchsorted(x_all, x)])
+
+    # close() během stavby ji přeruší, bez lod.json se index příště postaví znovu
+    threading.Timer(0.05, gate.set).start()
+    rec.close()
+    assert not rec.ready and not rec.build_thread.is_alive()
+    assert not os.path.exists(os.path.join(rec.lod_dir, "lod.json"))
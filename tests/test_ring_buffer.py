@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from ring_buffer import SignalRingBuffer, SharedSignalRingBuffer
+
+SPP = 4
+
+
+class Reference:
+    # celý proud zapsaných packetů; buffer má odpovídat posledním packets_capacity packetům
+    def __init__(self, channels):
+        self.first_index = np.zeros(0, dtype=np.int64)
+        self.samples = np.zeros((channels, 0), dtype=np.int16)
+        self.errors = np.zeros((channels, 0), dtype=np.uint8)
+
+    def append(self, first_index, samples, errors):
+        self.first_index = np.concatenate((self.first_index, first_index))
+        self.samples = np.concatenate((self.samples, samples), axis=1)
+        self.errors = np.concatenate((self.errors, errors), axis=1)
+
+
+def random_chunks(rng, channels, n_chunks, max_chunk):
+    # dávky packetů s rostoucím pořadím a náhodnými mezerami
+    order = 0
+    for _ in range(n_chunks):
+        n = int(rng.integers(1, max_chunk + 1))
+        orders = order + np.cumsum(rng.integers(1, 3, n))
+        order = int(orders[-1])
+        samples = rng.integers(-32768, 32767, (channels, n * SPP), dtype=np.int16)
+        errors = rng.integers(0, 255, (channels, n), dtype=np.uint8)
+        yield orders * SPP, samples, errors
+
+
+def check(buf, ref):
+    cap = buf.packets_capacity
+    kept = min(len(ref.first_index), cap)
+    assert len(buf) == kept * SPP
+    assert buf.total_packets == len(ref.first_index)
+    x_all = (ref.first_index[:, None] + np.arange(SPP)).ravel()
+    for n in {1, SPP - 1, SPP, SPP + 1, len(buf) // 2, len(buf), len(buf) + 10}:
+        m = min(n, len(buf))
+        assert np.array_equal(buf.latest_samples(n), ref.samples[:, ref.samples.shape[1] - m:])
+        assert np.array_equal(buf.latest_x(n), x_all[len(x_all) - m:])
+    for n_packets in (1, kept // 2, kept, kept + 3):
+        m = min(n_packets, kept)
+        assert np.array_equal(buf.latest_errors(n_packets), ref.errors[:, ref.errors.shape[1] - m:])
+        assert np.array_equal(buf.latest_packet_index(n_packets), ref.first_index[len(ref.first_index) - m:])
+    total, oldest = buf.total_samples(), buf.oldest_position()
+    assert oldest == (len(ref.first_index) - kept) * SPP
+    if total > oldest:
+        a, b = oldest + 1, total - 1
+        assert np.array_equal(buf.samples_between(a, b), ref.samples[:, a:b])
+        positions = np.arange(oldest, total)
+        assert np.array_equal(buf.x_at(positions), x_all[oldest:total])
+        # position_of: index vzorku -> pozice; index v mezeře -> začátek dalšího packetu
+        for p in positions[::3]:
+            assert buf.position_of(x_all[p]) == p
+        assert buf.position_of(x_all[total - 1] + 1) is None
+
+
+@pytest.mark.parametrize('max_chunk', [1, 7, 40])
+def test_matches_reference_across_wraparound(max_chunk):
+    rng = np.random.default_rng(max_chunk)
+    buf = SignalRingBuffer(2, 25 * SPP, SPP)
+    ref = Reference(2)
+    for chunk in random_chunks(rng, 2, 60, max_chunk):
+        buf.append(*chunk)
+        ref.append(*chunk)
+        check(buf, ref)
+
+
+def test_capacity_rounds_up_to_packets():
+    buf = SignalRingBuffer(1, 10, SPP)
+    assert buf.packets_capacity == 3
+    assert buf.capacity == 12
+
+
+def test_empty_buffer():
+    buf = SignalRingBuffer(2, 10 * SPP, SPP)
+    assert len(buf) == 0
+    assert buf.latest_samples(5).shape == (2, 0)
+    assert buf.latest_x(5).shape == (0,)
+    assert buf.position_of(0) is None
+
+
+def test_latest_samples_view_and_copy():
+    buf = SignalRingBuffer(1, 4 * SPP, SPP)
+    buf.append(np.array([0, SPP]), np.arange(2 * SPP, dtype=np.int16)[None, :], np.zeros((1, 2), np.uint8))
+    view = buf.latest_samples(SPP)
+    copy = buf.latest_samples(SPP, copy=True)
+    buf.samples[:] = 0
+    assert not view.any()
+    assert np.array_equal(copy[0], np.arange(SPP, 2 * SPP))
+
+
+def test_clear_and_reset():
+    buf = SignalRingBuffer(2, 10 * SPP, SPP)
+    rng = np.random.default_rng(0)
+    for chunk in random_chunks(rng, 2, 3, 5):
+        buf.append(*chunk)
+    generation = buf.generation
+    buf.clear()
+    assert len(buf) == 0 and buf.generation == generation + 1
+    buf.reset(channels_count=3, capacity=5 * SPP)
+    assert buf.samples.shape == (3, 5 * SPP)
+    with pytest.raises(ValueError):
+        buf.append(np.array([0]), np.zeros((2, SPP), np.int16), np.zeros((2, 1), np.uint8))
+
+
+def test_shared_buffer_matches_reference():
+    rng = np.random.default_rng(5)
+    buf = SharedSignalRingBuffer(2, 25 * SPP, SPP)
+    reader = SharedSignalRingBuffer(2, 25 * SPP, SPP, name=buf.name, readonly=True)
+    ref = Reference(2)
+    try:
+        for chunk in random_chunks(rng, 2, 40, 9):
+            buf.append(*chunk)
+            ref.append(*chunk)
+            check(reader, ref)
+    finally:
+        reader.close()
+        buf.close()
@@ -0,0 +1,44 @@
+import numpy as np
+
+from scaling import ChannelScaling, DEFAULT_CHANNEL
+
+CHANNELS = [{'unit': "V", 'offset': 1.5, 'gain': 0.01},
+            {'unit': "A", 'offset': -2.0, 'gain': 0.5},
+            {'unit': "V", 'offset': 0.0, 'gain': -1.0}]
+
+
+def test_apply_matches_per_channel_formula():
+    rng = np.random.default_rng(0)
+    y = rng.integers(-32768, 32767, (3, 100), dtype=np.int16)
+    out = ChannelScaling(CHANNELS, 3).apply(y)
+    assert out.dtype == np.float32
+    for c, ch in enumerate(CHANNELS):
+        assert np.allclose(out[c], y[c].astype(np.float64) * ch['gain'] + ch['offset'], rtol=1e-6, atol=1e-4)
+
+
+def test_apply_selected_channels():
+    y = np.array([[100, -100]], dtype=np.int16)
+    scaling = ChannelScaling(CHANNELS, 3)
+    assert np.allclose(scaling.apply(y, [1]), [[48.0, -52.0]])
+    assert np.allclose(scaling.apply(np.vstack([y, y]), [2, 0]), [[-100, 100], [2.5, 0.5]])
+
+
+def test_missing_channels_use_default():
+    scaling = ChannelScaling(CHANNELS[:1], 3)
+    assert scaling.units == ["V", DEFAULT_CHANNEL['unit'], DEFAULT_CHANNEL['unit']]
+    y = np.full((3, 2), 7, dtype=np.int16)
+    assert np.allclose(scaling.apply(y)[1:], 7.0)
+    assert np.allclose(ChannelScaling(None, 2).apply(y[:2]), 7.0)
+    # více záznamů než kanálů
+    assert ChannelScaling(CHANNELS, 2).units == ["V", "A"]
+
+
+def test_groups_by_unit_in_first_seen_order():
+    assert ChannelScaling(CHANNELS, 3).groups() == [("V", [0, 2]), ("A", [1])]
+
+
+def test_full_scale_covers_int16_range():
+    scaling = ChannelScaling(CHANNELS, 3)
+    assert np.allclose(scaling.full_scale([0]), (-32768 * 0.01 + 1.5, 32767 * 0.01 + 1.5))
+    # záporný zisk převrací rozsah, více kanálů = obálka
+    assert np.allclose(scaling.full_scale([0, 2]), (-32767.0, 32768.0))
@@ -0,0 +1,191 @@
+import pytest
+
+from Generator import PacketTable
+from crc16 import verify_crc_batch
+from ingest import IngestPipeline
+from journal import FLAG_CRC_ERROR, FLAG_BEFORE_START
+from protocol import MAX_ORDER, SAMPLES_PER_PACKET
+from ring_buffer import SignalRingBuffer
+from sequencing import ReorderWindow, SequenceUnwrapper
+
+
+def window(*orders, size=8, min_buffer_size=4):
+    w = ReorderWindow(size, min_buffer_size)
+    for order in orders:
+        assert w.insert(order, order)
+    return w
+
+
+# ---------------------- ReorderWindow ----------------------
+def test_in_order_with_gaps():
+    w = window(0, 1, 3, 4, 7)
+    assert w.ready()
+    orders, data, lost = w.flush()
+    assert orders == [0, 1, 3, 4, 7]
+    assert data == orders
+    assert lost == 3
+    assert w.lost_packets == 3
+    assert w.gap_histogram() == {1: 1, 2: 1}
+    assert len(w) == 0
+
+
+def test_reordered_packets_come_out_sorted():
+    w = window(0, 2, 1, 3)
+    assert w.flush() == ([0, 1, 2, 3], [0, 1, 2, 3], 0)
+    assert w.gap_histogram() == {}
+
+
+def test_partial_flush_keeps_rest():
+    w = window(0, 1, 2, 3, 4)
+    assert w.flush(2) == ([0, 1], [0, 1], 0)
+    assert len(w) == 3
+    assert not w.ready()
+    assert w.flush() == ([2, 3, 4], [2, 3, 4], 0)
+
+
+def test_gap_left_open_is_not_counted_until_closed():
+    # mezera 1 na konci výdeje se uzavře až dalším vydaným packetem
+    w = window(0, 2)
+    assert w.flush(1) == ([0], [0], 0)
+    assert w.gap_histogram() == {}
+    assert w.flush() == ([2], [2], 1)
+    assert w.gap_histogram() == {1: 1}
+
+
+def test_late_packet_is_rejected():
+    w = window(0, 1, 2, 3)
+    w.flush()
+    assert not w.insert(2, 2)
+    assert not w.insert(0, 0)
+    assert w.late_packets == 2
+    assert w.duplicate_packets == 0
+    assert len(w) == 0
+
+
+def test_late_packet_fills_gap_before_flush():
+    # packet přijde pozdě, ale ještě v okně - mezera nevznikne
+    w = window(0, 1, 3)
+    assert w.insert(2, 2)
+    assert w.flush() == ([0, 1, 2, 3], [0, 1, 2, 3], 0)
+    assert w.late_packets == 0
+
+
+def test_duplicate_is_rejected():
+    w = window(0, 1)
+    assert not w.insert(1, 'again')
+    assert w.duplicate_packets == 1
+    assert w.flush() == ([0, 1], [0, 1], 0)
+
+
+def test_packet_beyond_window_forces_flush():
+    # packet o >= size dál vytlačí starší packety a zbytek mezery se přeskočí najednou
+    w = window(0, 1)
+    assert w.insert(20, 20)
+    assert w.ready()
+    orders, _, lost = w.flush()
+    assert orders == [0, 1, 20]
+    assert lost == 18
+    assert w.gap_histogram() == {8: 1}     # délky >= size pod klíčem size
+    assert not w.insert(19, 19)
+    assert w.late_packets == 1
+
+
+def test_loss_counted_once_across_flushes():
+    w = window(0, 5, 6, 7)
+    _, _, lost1 = w.flush(2)
+    assert w.insert(9, 9)
+    _, _, lost2 = w.flush()
+    assert lost1 + lost2 == w.lost_packets == 5
+    assert w.gap_histogram() == {4: 1, 1: 1}
+
+
+def test_clear_stats_and_reset():
+    w = window(0, 2)
+    w.insert(2, 2)
+    w.flush()
+    w.insert(0, 0)
+    w.clear_stats()
+    assert (w.lost_packets, w.late_packets, w.duplicate_packets) == (0, 0, 0)
+    assert w.gap_histogram() == {}
+    w.reset()
+    assert w.insert(100, 100)      # nový začátek pořadí
+    assert w.flush() == ([100], [100], 0)
+
+
+def test_size_must_be_power_of_two_above_min_buffer():
+    with pytest.raises(ValueError):
+        ReorderWindow(100, 90)
+    with pytest.raises(ValueError):
+        ReorderWindow(64, 90)
+
+
+# ---------------------- SequenceUnwrapper ----------------------
+def unwrap_all(seqs, modulo=MAX_ORDER):
+    u = SequenceUnwrapper(modulo)
+    return [u.unwrap(seq) for seq in seqs]
+
+
+def test_unwrap_across_wrap():
+    assert unwrap_all([65534, 65535, 0, 1]) == [65534, 65535, 65536, 65537]
+
+
+def test_unwrap_many_wraps_is_monotonic():
+    absolute = list(range(0, 5 * MAX_ORDER, 1000))
+    assert unwrap_all([a % MAX_ORDER for a in absolute]) == absolute
+
+
+def test_late_packet_across_wrap():
+    # 65534 přijde až po přetečení, patří před něj
+    u = SequenceUnwrapper(MAX_ORDER)
+    assert [u.unwrap(s) for s in (65535, 0, 1)] == [65535, 65536, 65537]
+    assert u.unwrap(65534) == 65534
+    assert u.last == 65537
+    assert u.unwrap(2) == 65538
+
+
+def test_early_packet_before_wrap_then_late_one_after():
+    # 0 (nové kolo) přijde dřív než 65535 z předchozího
+    assert unwrap_all([65533, 0, 65535, 1]) == [65533, 65536, 65535, 65537]
+
+
+def test_resolve_does_not_change_state():
+    u = SequenceUnwrapper(MAX_ORDER)
+    u.unwrap(65535)
+    assert u.resolve(3) == 65539
+    assert u.resolve(65530) == 65530
+    assert u.last == 65535
+
+
+def test_late_packet_across_wrap_at_stream_start_is_negative():
+    assert unwrap_all([5, 65530]) == [5, -6]
+
+
+# ---------------------- IngestPipeline ----------------------
+class ListJournal:
+    record_invalid = True
+
+    def __init__(self):
+        self.records = []
+
+    def append(self, order, timestamp, packet, flags=0):
+        self.records.append((order, flags))
+
+
+def test_pipeline_marks_packet_before_stream_start():
+    # záporné rozbalené pořadí se do žurnálu nezapíše jako -6 ani jako chyba CRC, okno ho zahodí
+    table = PacketTable(2)
+    packets = [bytes(table.packet(seq)) for seq in (5, 65530, 6)]
+    corrupted = bytearray(packets[2])
+    corrupted[-1] ^= 0xFF
+    packets.append(bytes(corrupted))
+    pipeline = IngestPipeline(2, SignalRingBuffer(2, 100 * SAMPLES_PER_PACKET), log=lambda msg: None)
+    pipeline.journal = ListJournal()
+    for pkt, data in zip(packets, verify_crc_batch(packets)):
+        pipeline.handle_packet(pkt, data)
+    pipeline.flush_packet_buffer()
+
+    assert pipeline.journal.records == [(5, 0), (-1, FLAG_BEFORE_START), (6, 0), (-1, FLAG_CRC_ERROR)]
+    assert pipeline.reorder.late_packets == 1
+    assert pipeline.crc_error_counter == 1
+    assert pipeline.lost_packets_counter == 0
+    assert pipeline.signal_buffer.total_packets == 2
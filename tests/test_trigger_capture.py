@@ -0,0 +1,102 @@
+import glob
+
+import numpy as np
+import pytest
+
+from protocol import SAMPLES_PER_PACKET as SPP
+from ring_buffer import SignalRingBuffer
+from trigger_capture import TriggerCapture, trigger_base_path
+
+
+def packets(orders):
+    # vzorek = absolutní index (mod 30000), kanál 1 záporně
+    orders = np.asarray(orders, dtype=np.int64)
+    x = (orders[:, None] * SPP + np.arange(SPP)).ravel()
+    y = (x % 30000).astype(np.int16)
+    return orders * SPP, np.stack([y, -y]), np.zeros((2, len(orders)), np.uint8)
+
+
+def capture(tmp_path, pre, post):
+    messages = []
+    cap = TriggerCapture(trigger_base_path(str(tmp_path / "run.pkj")), pre, post, log=messages.append)
+    return cap, messages
+
+
+def append(ring, cap, orders):
+    ring.append(*packets(orders))
+    cap.update(ring)
+
+
+def snapshots(tmp_path):
+    return [np.load(path) for path in sorted(glob.glob(str(tmp_path / "run_trigger_*.npz")))]
+
+
+@pytest.mark.parametrize('trigger', [5 * SPP, 5 * SPP + 1, 6 * SPP - 1])
+def test_snapshot_at_pre_post_boundaries(tmp_path, trigger):
+    pre, post = SPP + 3, 2 * SPP - 5
+    ring = SignalRingBuffer(2, 50 * SPP)
+    cap, _ = capture(tmp_path, pre, post)
+    append(ring, cap, range(0, 5))
+    cap.arm(trigger)
+    # post okno končí na trigger + post; snímek vznikne až po zápisu packetu, který ho dokončí
+    last_needed = (trigger + post - 1) // SPP
+    append(ring, cap, range(5, last_needed))
+    assert cap.pending and not snapshots(tmp_path)
+    append(ring, cap, [last_needed])
+    assert not cap.pending
+    cap.close()
+    [snap] = snapshots(tmp_path)
+    expected_x = np.arange(trigger - pre, trigger + post)
+    assert np.array_equal(snap['x'], expected_x)
+    assert np.array_equal(snap['samples'][0], expected_x % 30000)
+    assert np.array_equal(snap['samples'][1], -(expected_x % 30000))
+    assert int(snap['trigger_index']) == trigger
+    assert int(snap['pre_samples']) == pre
+
+
+def test_pre_window_clipped_to_buffer(tmp_path):
+    ring = SignalRingBuffer(2, 4 * SPP)
+    cap, messages = capture(tmp_path, 10 * SPP, SPP)
+    append(ring, cap, range(0, 10))
+    cap.arm(9 * SPP)
+    append(ring, cap, [10])
+    cap.close()
+    [snap] = snapshots(tmp_path)
+    # v bufferu zůstaly packety 7..10
+    assert snap['x'][0] == 7 * SPP
+    assert int(snap['pre_samples']) == 2 * SPP
+    assert any("pre-trigger" in m for m in messages)
+
+
+def test_trigger_before_its_data_and_in_gap(tmp_path):
+    ring = SignalRingBuffer(2, 50 * SPP)
+    cap, _ = capture(tmp_path, 10, 10)
+    cap.arm(3 * SPP + 50)         # packet 3 chybí -> začátek packetu 4
+    append(ring, cap, [0, 1, 2])
+    assert cap.pending
+    append(ring, cap, [4, 5])
+    cap.close()
+    [snap] = snapshots(tmp_path)
+    assert np.array_equal(snap['x'], np.concatenate([np.arange(3 * SPP - 10, 3 * SPP), np.arange(4 * SPP, 4 * SPP + 10)]))
+    assert int(snap['pre_samples']) == 10
+
+
+def test_repeated_trigger_packet_armed_once(tmp_path):
+    ring = SignalRingBuffer(2, 50 * SPP)
+    cap, _ = capture(tmp_path, 0, 5)
+    cap.arm(SPP)
+    cap.arm(SPP)
+    append(ring, cap, [0, 1])
+    cap.close()
+    assert len(snapshots(tmp_path)) == 1
+
+
+def test_close_drops_incomplete(tmp_path):
+    ring = SignalRingBuffer(2, 50 * SPP)
+    cap, messages = capture(tmp_path, 0, 10 * SPP)
+    append(ring, cap, [0])
+    cap.arm(10)
+    append(ring, cap, [1])
+    cap.close()
+    assert not snapshots(tmp_path)
+    assert any("dropped" in m for m in messages)
@@ -0,0 +1,118 @@
+import os
+import queue
+import threading
+
+import numpy as np
+
+from protocol import SAMPLES_PER_PACKET, PACKET_RATE_HZ
+from journal import next_free_path
+
+SNAPSHOT_EXT = ".npz"
+
+
+# ---------------------- Snímek okolí triggeru ----------------------
+# Jediná kopie rozsahu z kruhového bufferu (jeden nebo dva souvislé bloky), pole jsou jen pro čtení.
+# Osa x se ukládá jen jako index prvního vzorku každého packetu, rozbalí se až ve vlákně zápisu.
+class TriggerSnapshot:
+    def __init__(self, trigger_index, samples, packet_x, x_offset, pre_samples):
+        samples.setflags(write=False)
+        packet_x.setflags(write=False)
+        self.trigger_index = trigger_index      # absolutní index vzorku triggeru
+        self.samples = samples                  # [kanál, vzorek] int16
+        self.packet_x = packet_x                # absolutní index prvního vzorku packetů v rozsahu
+        self.x_offset = x_offset                # první vzorek snímku v prvním packetu
+        self.pre_samples = pre_samples          # skutečný počet vzorků před triggerem
+
+    def x(self, samples_per_packet=SAMPLES_PER_PACKET):
+        # absolutní indexy vzorků (mezery = ztracené packety)
+        x = (self.packet_x[:, None] + np.arange(samples_per_packet, dtype=np.int64)).ravel()
+        return x[self.x_offset:self.x_offset + self.samples.shape[1]]
+
+
+# ---------------------- Zachytávání na trigger ----------------------
+# arm() při trigger packetu, update() po každém zápisu do bufferu (pod jeho zámkem, ve vlákně zápisu).
+# Po příchodu post-trigger okna se vytvoří snímek a předá se vláknu zápisu - příjem nikdy nečeká na disk.
+class TriggerCapture:
+    def __init__(self, base_path, pre_samples, post_samples, log=print):
+        self.log = log
+        self.configure(base_path, pre_samples, post_samples)
+        self.pending = []            # [absolutní index triggeru, pozice v proudu vzorků nebo None]
+        self.last_trigger = None     # zařízení posílá trigger packet znovu, dokud nedostane ACK
+        self.generation = None
+        self.written = 0
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="trigger-writer", daemon=True)
+        self.thread.start()
+
+    def configure(self, base_path, pre_samples, post_samples):
+        # base_path bez indexu, např. .../capture_trigger.npz -> capture_trigger_001.npz
+        self.base_path = base_path
+        self.pre_samples = max(0, int(pre_samples))
+        self.post_samples = max(1, int(post_samples))
+
+    def arm(self, trigger_index):
+        if trigger_index == self.last_trigger:
+            return
+        self.last_trigger = trigger_index
+        self.pending.append([trigger_index, None])
+        self.log(f"[TRIGGER] Capture armed at sample {trigger_index}, "
+                 f"{self.pre_samples} before / {self.post_samples} after")
+
+    def update(self, ring):
+        if not self.pending:
+            return
+        if ring.generation != self.generation:
+            # buffer byl vymazán - už spočítané pozice neplatí
+            self.generation = ring.generation
+            for p in self.pending:
+                p[1] = None
+        end = ring.total_samples()
+        done = []
+        for p in self.pending:
+            trigger_index, pos = p
+            if pos is None:
+                pos = p[1] = ring.position_of(trigger_index)
+                if pos is None:
+                    continue    # data triggeru ještě nejsou v bufferu (čekají v okně řazení)
+            if end < pos + self.post_samples:
+                continue
+            start = max(pos - self.pre_samples, ring.oldest_position())
+            stop = pos + self.post_samples
+            spp = ring.samples_per_packet
+            samples = ring.samples_between(start, stop, copy=True)
+            packet_x = ring.x_at(np.arange(start // spp, -(-stop // spp), dtype=np.int64) * spp)
+            if pos - start < self.pre_samples:
+                self.log(f"[WARN] Trigger capture: only {pos - start} pre-trigger samples left in buffer")
+            self.queue.put((self.base_path, TriggerSnapshot(trigger_index, samples, packet_x, start % spp, pos - start)))
+            done.append(p)
+        for p in done:
+            self.pending.remove(p)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            base_path, snap = item
+            try:
+                path = next_free_path(base_path, SNAPSHOT_EXT)
+                with open(path, "xb") as f:
+                    np.savez(f, samples=snap.samples, x=snap.x(), trigger_index=snap.trigger_index,
+                             pre_samples=snap.pre_samples, sample_rate=SAMPLES_PER_PACKET * PACKET_RATE_HZ)
+                self.written += 1
+                self.log(f"[OK] Trigger capture saved to {path} ({snap.samples.shape[1]} samples)")
+            except OSError as e:
+                self.log(f"[ERR] Trigger capture: {e}")
+
+    def close(self):
+        # dopíše rozepsané snímky; triggery čekající na post-trigger okno se zahodí
+        if self.pending:
+            self.log(f"[WARN] Trigger capture: {len(self.pending)} trigger(s) without complete post-trigger window dropped")
+            self.pending = []
+        self.queue.put(None)
+        self.thread.join()
+
+
+def trigger_base_path(save_path):
+    # capture.pkj -> capture_trigger.npz
+    return os.path.splitext(save_path)[0] + "_trigger" + SNAPSHOT_EXT
@@ -0,0 +1,129 @@
+import argparse
+import sys
+
+import pyqtgraph as pg
+from PyQt5.QtWidgets import QFileDialog, QLabel, QVBoxLayout, QHBoxLayout, QWidget, QPushButton, QApplication, QDesktopWidget
+from PyQt5.QtCore import Qt, QTimer
+
+from recording import Recording
+
+
+# ---------------------- Prohlížeč záznamu ----------------------
+# Záznam (.pkj nebo .i16) je namapovaný v paměti, při každé změně rozsahu se čte jen tolik košů
+# min/max LOD indexu, kolik je pixelů na šířku grafu - posun i zoom nezávisí na délce záznamu.
+class OfflineViewer(QWidget):
+    def __init__(self, path=None):
+        super().__init__()
+        self.recording = None
+        self.curves = []
+
+        self.setWindowTitle("Offline viewer")
+        screen_geometry = QDesktopWidget().availableGeometry()
+        self.resize(int(screen_geometry.width() * 0.9), int(screen_geometry.height() * 0.9))
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        self.plot_widget = pg.GraphicsLayoutWidget()
+        self.plot = self.plot_widget.addPlot(title="Recording")
+        self.plot.setLabel('bottom', 'Time', units='s')
+        self.plot.setLabel('left', 'Amplitude', units='')
+        self.plot.showGrid(x=True, y=True, alpha=0.5)
+        self.plot.setMouseEnabled(x=True, y=True)
+        self.layout.addWidget(self.plot_widget)
+
+        row = QHBoxLayout()
+        self.open_button = QPushButton("Open")
+        self.open_button.clicked.connect(self.open_dialog)
+        row.addWidget(self.open_button)
+        self.full_button = QPushButton("Full range")
+        self.full_button.clicked.connect(self.show_all)
+        row.addWidget(self.full_button)
+        self.status_label = QLabel("")
+        row.addWidget(self.status_label, 1)
+        self.layout.addLayout(row)
+
+        # změny rozsahu se sloučí do jednoho čtení na snímek
+        self.redraw_timer = QTimer()
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.setInterval(15)
+        self.redraw_timer.timeout.connect(self.redraw)
+        self.plot.getViewBox().sigXRangeChanged.connect(lambda *args: self.redraw_timer.start())
+
+        # při stavbě LOD indexu na pozadí se zobrazuje průběh, po dokončení se překreslí z indexu
+        self.build_timer = QTimer()
+        self.build_timer.setInterval(250)
+        self.build_timer.timeout.connect(self.check_build)
+
+        if path:
+            self.open(path)
+
+    def open_dialog(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open recording", "", "Recordings (*.pkj *.i16)")
+        if path:
+            self.open(path)
+
+    def open(self, path):
+        if self.recording:
+            self.recording.close()
+        # log stavby jde z vlákna indexu - do konzole, stav ukazuje check_build()
+        self.recording = Recording(path, background=True)
+        rec = self.recording
+        self.setWindowTitle(f"Offline viewer - {path}")
+        self.plot.clear()
+        self.curves = [self.plot.plot(pen=pg.intColor(i, hues=rec.channels_count)) for i in range(rec.channels_count)]
+        self.show_all()
+        if not rec.ready:
+            self.build_timer.start()
+
+    def check_build(self):
+        if not self.recording or self.recording.ready:
+            self.build_timer.stop()
+        self.redraw()
+
+    def show_all(self):
+        if not self.recording or not self.recording.length:
+            return
+        lo, hi = self.recording.x_limits()
+        period = 1 / self.recording.sample_rate
+        vb = self.plot.getViewBox()
+        vb.setLimits(xMin=lo * period, xMax=hi * period)
+        vb.disableAutoRange(axis=vb.XAxis)
+        vb.setXRange(lo * period, hi * period, padding=0)
+        self.redraw()
+        vb.enableAutoRange(axis=vb.YAxis)
+
+    def redraw(self):
+        rec = self.recording
+        if not rec or not rec.length:
+            return
+        period = 1 / rec.sample_rate
+        vb = self.plot.getViewBox()
+        (x_min, x_max), _ = vb.viewRange()
+        x, y, bucket = rec.view(x_min / period, x_max / period, max(100, int(vb.width())))
+        x = x * period
+        for i, curve in enumerate(self.curves):
+            curve.setData(x, y[i])
+        if bucket == 1:
+            detail = "raw samples"
+        elif rec.ready:
+            detail = f"min/max per {bucket} samples"
+        else:
+            detail = f"every {bucket}th sample (building LOD index {rec.progress:.0%})"
+        self.status_label.setText(f"{rec.length} samples/ch, {rec.sample_rate} Sa/s; {detail}, {len(x)} points/ch")
+
+    def closeEvent(self, event):
+        self.build_timer.stop()
+        if self.recording:
+            self.recording.close()
+        event.accept()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Prohlížeč záznamu .pkj / .i16 libovolné délky")
+    parser.add_argument('path', nargs='?', help="žurnál .pkj nebo výstup recorder.py .i16")
+    args, qt_args = parser.parse_known_args()
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
+    app = QApplication(sys.argv[:1] + qt_args)
+    viewer = OfflineViewer(args.path)
+    viewer.show()
+    sys.exit(app.exec_())